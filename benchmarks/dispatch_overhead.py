@@ -0,0 +1,86 @@
+"""
+Per-subtask dispatch overhead benchmark.
+
+Runs the orchestrator's ServiceDispatcher against a stub ``/generate``
+service that returns immediately, so the measured time is pure dispatch
+overhead: in-process direct calls, in-process ASGI transport, and pooled
+HTTP to the same stub served by uvicorn on localhost.
+
+    python -m benchmarks.dispatch_overhead
+    python -m benchmarks.dispatch_overhead --calls 5000 --payload-kb 16
+"""
+
+import argparse
+import asyncio
+import socket
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+import uvicorn
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from services.orchestrator.dispatch import ServiceDispatcher
+
+class StubRequest(BaseModel):
+    prompt: str
+    task_id: str
+    subtask_id: str
+
+stub_app = FastAPI()
+
+@stub_app.post("/generate")
+async def generate(request: StubRequest):
+    return {"task_id": request.task_id, "subtask_id": request.subtask_id, "result": "ok"}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(stub_app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+async def time_calls(dispatcher: ServiceDispatcher, calls: int, payload: Dict) -> List[float]:
+    for _ in range(min(50, calls)):  # warm up pools and caches
+        await dispatcher.dispatch("images", payload)
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        await dispatcher.dispatch("images", payload)
+        samples.append(time.perf_counter() - started)
+    await dispatcher.aclose()
+    return samples
+
+def report(mode: str, samples: List[float]):
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{mode:>7}: mean {statistics.mean(samples) * 1e6:9.1f} us   p50 {samples[len(samples) // 2] * 1e6:9.1f} us   "
+          f"p99 {p99 * 1e6:9.1f} us   {len(samples) / sum(samples):9.0f} calls/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--payload-kb", type=int, default=1, help="size of the prompt sent with each subtask")
+    args = parser.parse_args()
+
+    payload = {"prompt": "x" * (args.payload_kb * 1024), "task_id": "bench", "subtask_id": "bench-images"}
+    port = free_port()
+    server = start_server(port)
+    try:
+        print(f"Dispatch overhead over {args.calls} sequential subtasks ({args.payload_kb} KB payload)")
+        for mode in ("direct", "asgi", "http"):
+            dispatcher = ServiceDispatcher({"images": f"http://127.0.0.1:{port}"}, mode=mode)
+            dispatcher.register_local("images", stub_app)
+            report(mode, asyncio.run(time_calls(dispatcher, args.calls, payload)))
+    finally:
+        server.should_exit = True
+
+if __name__ == "__main__":
+    main()
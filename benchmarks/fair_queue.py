@@ -0,0 +1,97 @@
+"""
+Noisy-neighbour load test for the tenant fair queue.
+
+One tenant dumps a burst of long jobs into the queue while several quiet
+tenants keep submitting short jobs at a steady rate. The same workload runs
+twice against ``--capacity`` generation slots:
+
+- FIFO: slots are handed out in arrival order (the previous behaviour)
+- WFQ: ``services.tenancy.FairScheduler`` with default per-tenant quotas
+
+and the per-tenant queue wait percentiles are compared. Job run times are
+simulated with ``asyncio.sleep``.
+
+    python -m benchmarks.fair_queue
+    python -m benchmarks.fair_queue --noisy-jobs 1000 --quiet-tenants 8 --capacity 16
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from services.metrics import percentile
+from services.tenancy import FairScheduler, Tenant
+
+class FifoScheduler:
+    """Arrival-order baseline: one global semaphore, no tenants"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._slots = None
+
+    @asynccontextmanager
+    async def slot(self, tenant: Tenant, cost: float = 1.0):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.capacity)
+        enqueued = time.monotonic()
+        async with self._slots:
+            yield time.monotonic() - enqueued
+
+def build_workload(args, rng: random.Random):
+    """(arrival offset, tenant, cost, run seconds) for every job"""
+    noisy = Tenant("noisy", max_concurrency=args.noisy_concurrency)
+    jobs = [(0.0, noisy, 4, args.noisy_run_ms / 1000) for _ in range(args.noisy_jobs)]
+    for i in range(args.quiet_tenants):
+        tenant, at = Tenant(f"quiet-{i}"), 0.0
+        while at < args.duration:
+            at += rng.expovariate(args.quiet_rate)
+            jobs.append((at, tenant, 1, args.quiet_run_ms / 1000))
+    return jobs
+
+async def run(scheduler, jobs):
+    waits = defaultdict(list)
+
+    async def job(at: float, tenant: Tenant, cost: float, run_secs: float):
+        await asyncio.sleep(at)
+        async with scheduler.slot(tenant, cost) as queue_wait:
+            waits[tenant.tenant_id].append(queue_wait * 1000)
+            await asyncio.sleep(run_secs)
+
+    start = time.monotonic()
+    await asyncio.gather(*(job(*spec) for spec in jobs))
+    return waits, time.monotonic() - start
+
+def summarize(waits):
+    quiet = [w for tenant, values in waits.items() if tenant != "noisy" for w in values]
+    return {"noisy": waits["noisy"], "quiet (all)": quiet}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--noisy-jobs", type=int, default=300)
+    parser.add_argument("--noisy-run-ms", type=float, default=100)
+    parser.add_argument("--noisy-concurrency", type=int, default=Tenant("").max_concurrency,
+                        help="noisy tenant's concurrency quota under WFQ")
+    parser.add_argument("--quiet-tenants", type=int, default=4)
+    parser.add_argument("--quiet-rate", type=float, default=4.0, help="jobs per second per quiet tenant")
+    parser.add_argument("--quiet-run-ms", type=float, default=50)
+    parser.add_argument("--duration", type=float, default=4.0, help="seconds of quiet-tenant traffic")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    jobs = build_workload(args, random.Random(args.seed))
+    print(f"{args.noisy_jobs} noisy jobs at t=0 ({args.noisy_run_ms:g} ms each), {args.quiet_tenants} quiet tenants "
+          f"at {args.quiet_rate:g} jobs/s ({args.quiet_run_ms:g} ms each), capacity {args.capacity}, "
+          f"noisy concurrency quota {args.noisy_concurrency}")
+    for name, scheduler in (("FIFO", FifoScheduler(args.capacity)), ("WFQ", FairScheduler(args.capacity))):
+        waits, elapsed = asyncio.run(run(scheduler, jobs))
+        print(f"  {name} (all jobs done in {elapsed:.1f} s)")
+        for group, values in summarize(waits).items():
+            print(f"    {group + ':':12} {len(values):5d} jobs   queue wait p50 {percentile(values, 50):7.1f} ms"
+                  f"   p99 {percentile(values, 99):7.1f} ms   max {max(values):7.1f} ms")
+
+if __name__ == "__main__":
+    main()
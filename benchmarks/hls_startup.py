@@ -0,0 +1,82 @@
+"""
+HLS start-up latency versus whole-file download.
+
+Renders a synthetic clip with ffmpeg, segments it with the video service's
+HLSSegmenter, and compares how long a client waits before playback can
+begin:
+
+- whole file: download the complete MP4 before playing
+- HLS: wait for the first segment of every rendition, then fetch the master
+  playlist, the lowest rendition's playlist, its init segment and first
+  media segment
+
+Transfer times are modelled at ``--bandwidth-mbps`` so results do not depend
+on the loopback interface; segmenting times are measured.
+
+    python -m benchmarks.hls_startup
+    FFMPEG_BINARY=/path/to/ffmpeg python -m benchmarks.hls_startup --duration 60 --bandwidth-mbps 5
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import tempfile
+
+from services.artifacts import ArtifactStore
+from services.videos.hls import FFMPEG_BINARY, HLSSegmenter
+
+def render_source(ffmpeg: str, path: str, duration: int, height: int):
+    width = height * 16 // 9
+    subprocess.run([
+        ffmpeg, "-v", "error", "-y", "-f", "lavfi",
+        "-i", f"testsrc2=duration={duration}:size={width}x{height}:rate=24",
+        "-c:v", "libx264", "-preset", "veryfast", "-b:v", "6000k", "-pix_fmt", "yuv420p", path,
+    ], check=True)
+
+def startup_bytes(store: ArtifactStore, segmenter: HLSSegmenter, name: str) -> int:
+    lowest = segmenter.renditions[0].name
+    base = segmenter.output_dir(name)
+    files = [f"{base}/master.m3u8", f"{base}/{lowest}/index.m3u8", f"{base}/{lowest}/seg_00000.m4s"]
+    init = next(f for f in os.listdir(store.path(f"{base}/{lowest}")) if f.startswith("init"))
+    files.append(f"{base}/{lowest}/{init}")
+    return sum(store.size(f) for f in files)
+
+async def segment(segmenter: HLSSegmenter, name: str, source: str):
+    job = segmenter.submit(name, source)
+    await job.finished.wait()
+    if job.status != "completed":
+        raise RuntimeError(f"Segmenting failed: {job.error}")
+    return job
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=int, default=30, help="clip length in seconds")
+    parser.add_argument("--height", type=int, default=1080, help="source resolution")
+    parser.add_argument("--bandwidth-mbps", type=float, default=10.0, help="client download bandwidth")
+    parser.add_argument("--ffmpeg", default=FFMPEG_BINARY)
+    args = parser.parse_args()
+
+    bytes_per_sec = args.bandwidth_mbps * 1_000_000 / 8
+    with tempfile.TemporaryDirectory() as root:
+        store = ArtifactStore(root)
+        render_source(args.ffmpeg, store.path("source.mp4"), args.duration, args.height)
+        segmenter = HLSSegmenter(store, max_workers=1, ffmpeg=args.ffmpeg, poll_interval=0.02)
+        job = asyncio.run(segment(segmenter, "bench", "source.mp4"))
+
+        whole_file = store.size("source.mp4")
+        first_bytes = startup_bytes(store, segmenter, "bench")
+        to_playable = job.playable_at - job.started_at
+        to_complete = job.completed_at - job.started_at
+
+    whole_file_start = whole_file / bytes_per_sec
+    hls_start = to_playable + first_bytes / bytes_per_sec
+    print(f"{args.duration}s {args.height}p clip, {args.bandwidth_mbps:g} Mbit/s client")
+    print(f"  renditions:              {', '.join(r.name for r in segmenter.renditions)}")
+    print(f"  segmenting to playable:  {to_playable * 1000:9.0f} ms   (all renditions done: {to_complete * 1000:.0f} ms)")
+    print(f"  whole-file download:     {whole_file_start * 1000:9.0f} ms   ({whole_file / 1e6:.1f} MB before playback)")
+    print(f"  HLS start-up:            {hls_start * 1000:9.0f} ms   ({first_bytes / 1e6:.2f} MB before playback)")
+    print(f"  start-up speed-up:       {whole_file_start / hls_start:9.1f}x")
+
+if __name__ == "__main__":
+    main()
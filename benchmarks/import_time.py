@@ -0,0 +1,103 @@
+"""
+Cold-start import benchmark.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter and
+turns the raw output into a report of the slowest imports and the heaviest
+top-level packages, so start-up regressions show up in review.
+
+    python -m benchmarks.import_time                      # import start.py with every service
+    OMNIMEDIA_SERVICES=text python -m benchmarks.import_time
+    python -m benchmarks.import_time --module services.text.text_service --json
+    python -m benchmarks.import_time --budget-ms 800      # exit 1 when over budget
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+def parse_importtime(output: str) -> List[ImportRecord]:
+    """Parse ``-X importtime`` stderr into records, in the order Python printed them"""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header line
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        depth = (len(name) - len(stripped) - 1) // 2
+        records.append(ImportRecord(stripped, int(fields[0]), int(fields[1]), depth))
+    return records
+
+def measure(module: str, env: Dict[str, str] = None) -> List[ImportRecord]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+def build_report(records: List[ImportRecord], top: int = 15) -> Dict:
+    packages = defaultdict(int)
+    for record in records:
+        packages[record.module.split(".")[0]] += record.self_us
+    return {
+        "total_ms": round(sum(r.cumulative_us for r in records if r.depth == 0) / 1000, 2),
+        "module_count": len(records),
+        "slowest_imports": [asdict(r) for r in sorted(records, key=lambda r: r.cumulative_us, reverse=True)[:top]],
+        "heaviest_packages": [
+            {"package": name, "self_ms": round(us / 1000, 2)}
+            for name, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+    }
+
+def print_report(module: str, report: Dict):
+    print(f"Import of {module}: {report['total_ms']:.1f} ms across {report['module_count']} modules")
+    print("\nSlowest imports (cumulative):")
+    for record in report["slowest_imports"]:
+        print(f"  {record['cumulative_us'] / 1000:9.2f} ms  {record['module']}")
+    print("\nHeaviest top-level packages (self time):")
+    for package in report["heaviest_packages"]:
+        print(f"  {package['self_ms']:9.2f} ms  {package['package']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="start", help="module to import (default: start)")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to run; the fastest is reported")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--budget-ms", type=float, help="fail when the import takes longer than this")
+    args = parser.parse_args()
+
+    reports = [build_report(measure(args.module), args.top) for _ in range(max(args.runs, 1))]
+    report = min(reports, key=lambda r: r["total_ms"])
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(args.module, report)
+
+    if args.budget_ms is not None and report["total_ms"] > args.budget_ms:
+        print(f"\nImport time {report['total_ms']:.1f} ms exceeds budget of {args.budget_ms:.1f} ms", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Near-duplicate prompt index lookup latency at scale.
+
+Fills a PromptIndex with synthetic prompts spread over media type / style /
+quality partitions, then times lookups for three kinds of query:
+
+- near duplicates: indexed prompts with different casing, whitespace and
+  punctuation and two neighbouring words swapped (should all hit)
+- one-word edits: an indexed prompt with one word replaced (should miss at
+  the default threshold)
+- novel prompts: never indexed (should miss)
+
+Reports insert throughput, lookup latency percentiles, hit rates and the
+resident memory the index added.
+
+    python -m benchmarks.prompt_reuse
+    python -m benchmarks.prompt_reuse --entries 100000 --queries 20000 --threshold 0.8
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "omnimedia-realtime"))
+
+from prompt_index import PromptIndex  # noqa: E402
+from services.metrics import percentile  # noqa: E402
+
+PARTITIONS = [(media, style, quality) for media in ("image", "video", "text", "audio")
+              for style in ("default", "realistic", "anime") for quality in ("hd", "4k")]
+
+def make_vocabulary(rng: random.Random, size: int):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+def make_prompt(rng: random.Random, vocabulary) -> str:
+    return " ".join(rng.choice(vocabulary) for _ in range(rng.randint(6, 14)))
+
+def near_duplicate(rng: random.Random, prompt: str) -> str:
+    words = prompt.split()
+    i = rng.randrange(len(words) - 1)
+    words[i], words[i + 1] = words[i + 1], words[i]  # swapped neighbours, like "red big dragon"
+    words = [word.upper() if rng.random() < 0.3 else word for word in words]
+    words = [word + rng.choice(",;:") if rng.random() < 0.2 else word for word in words]
+    return "  ".join(words) + rng.choice(".!?") + " "
+
+def one_word_edit(rng: random.Random, prompt: str, vocabulary) -> str:
+    words = prompt.split()
+    words[rng.randrange(len(words))] = rng.choice(vocabulary)
+    return " ".join(words)
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def time_lookups(index: PromptIndex, queries, threshold: float):
+    latencies, hits = [], 0
+    for prompt, partition, expected in queries:
+        start = time.perf_counter()
+        match = index.lookup(prompt, partition, threshold)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        hits += match is not None and (expected is None or match[0] == expected)
+    return latencies, hits
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=10_000, help="queries per kind")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng, 50_000)
+    index = PromptIndex(max_entries=args.entries)
+    samples = []
+    sample_every = max(1, args.entries // args.queries)
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    for i in range(args.entries):
+        prompt, partition = make_prompt(rng, vocabulary), rng.choice(PARTITIONS)
+        index.add(prompt, f"task-{i}", partition)
+        if i % sample_every == 0:
+            samples.append((prompt, partition, f"task-{i}"))
+    insert_secs = time.perf_counter() - start
+    index_mb = rss_mb() - baseline
+
+    kinds = {
+        "near duplicates": [(near_duplicate(rng, p), part, task) for p, part, task in samples],
+        "one-word edits": [(one_word_edit(rng, p, vocabulary), part, None) for p, part, _ in samples],
+        "novel prompts": [(make_prompt(rng, vocabulary), rng.choice(PARTITIONS), None) for _ in samples],
+    }
+
+    print(f"{len(index):,} entries in {len(PARTITIONS)} partitions, threshold {args.threshold:g}")
+    print(f"  inserts:        {args.entries / insert_secs:12,.0f} /s")
+    print(f"  index memory:   {index_mb:12,.0f} MB   ({index_mb * 1e6 / max(1, len(index)):.0f} bytes/entry, max RSS)")
+    for kind, queries in kinds.items():
+        latencies, hits = time_lookups(index, queries, args.threshold)
+        print(f"  {kind + ':':16}p50 {percentile(latencies, 50):6.1f} us   p99 {percentile(latencies, 99):6.1f} us"
+              f"   max {max(latencies):8.1f} us   hit rate {hits / len(queries):6.1%}")
+
+if __name__ == "__main__":
+    main()
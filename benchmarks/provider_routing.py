@@ -0,0 +1,101 @@
+"""
+Tail-latency comparison for latency-aware provider routing.
+
+Three local stub providers with injected latency distributions (lognormal
+bodies, occasional stalls, one with intermittent failures) serve the same
+request stream in three configurations:
+
+- fixed: every request goes to one hard-coded provider (the previous behaviour)
+- routed: ``services.routing.ProviderRouter`` without hedging
+- routed + hedged: the router with a duplicate sent after the p95 deadline
+
+Per-request latency percentiles, failures and mean cost are compared. Times
+are multiplied by ``--time-scale`` so a run takes seconds, and are reported
+in unscaled milliseconds.
+
+    python -m benchmarks.provider_routing
+    python -m benchmarks.provider_routing --requests 2000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from services.metrics import percentile
+from services.routing import NoProviderAvailable, ProviderOption, ProviderRouter
+
+# name: (median ms, lognormal sigma, stall probability, stall ms, failure probability, cost)
+PROVIDERS = {
+    "primary": (900, 0.35, 0.04, 6000, 0.00, 3.0),
+    "secondary": (600, 0.30, 0.03, 5000, 0.05, 2.0),
+    "budget": (1500, 0.25, 0.01, 4000, 0.00, 1.0),
+}
+
+def stub_option(name: str, scale: float, rng: random.Random) -> ProviderOption:
+    median, sigma, stall_p, stall_ms, fail_p, cost = PROVIDERS[name]
+
+    async def call():
+        latency = median * rng.lognormvariate(0, sigma)
+        if rng.random() < stall_p:
+            latency += stall_ms * rng.random()
+        await asyncio.sleep(latency / 1000 * scale)
+        if rng.random() < fail_p:
+            raise RuntimeError(f"{name} returned an error")
+
+    return ProviderOption(name, "stub", cost, call)
+
+async def run(call, requests: int, concurrency: int):
+    latencies, failures = [], 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal failures
+        async with slots:
+            started = time.monotonic()
+            try:
+                await call()
+            except (RuntimeError, NoProviderAvailable):
+                failures += 1
+                return
+            latencies.append(time.monotonic() - started)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--time-scale", type=float, default=0.01, help="multiplier applied to injected latencies")
+    parser.add_argument("--max-cost", type=float, default=None, help="per-request cost budget for the router")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    def options():
+        rng = random.Random(args.seed)
+        return [stub_option(name, args.time_scale, rng) for name in PROVIDERS]
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, time scale {args.time_scale:g}, "
+          f"max cost {args.max_cost}")
+    for name, router in (
+        ("fixed", None),
+        ("routed", ProviderRouter(options(), hedge=False)),
+        ("routed + hedged", ProviderRouter(options(), hedge=True)),
+    ):
+        fixed = options()[0]
+        call = fixed.call if router is None else (lambda router=router: router.call(max_cost=args.max_cost))
+        latencies, failures = asyncio.run(run(call, args.requests, args.concurrency))
+        ms = [latency / args.time_scale * 1000 for latency in latencies]
+        if router is None:
+            spend, detail = args.requests * fixed.cost, ""
+        else:
+            stats = router.stats().values()
+            spend = sum(s["calls"] * s["cost"] for s in stats)
+            detail = ("   calls " + " ".join(f"{s['provider']}={s['calls']}" for s in stats)
+                      + f"   hedges {sum(s['hedges'] for s in stats)}")
+        print(f"  {name + ':':17} p50 {percentile(ms, 50):6.0f} ms   p95 {percentile(ms, 95):6.0f} ms   "
+              f"p99 {percentile(ms, 99):6.0f} ms   failures {failures:3d}   cost/request {spend / args.requests:.2f}{detail}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Task history insert throughput and listing latency at scale.
+
+Loads ``--rows`` synthetic tasks through ``TaskHistory.record`` (the same
+batched writer the apps use), then times the listing queries behind
+``/api/tasks``:
+
+- an owner's first page, and a page deep into their history (keyset cursor)
+- an owner's tasks filtered by status and media type
+- the newest tasks with a given status across all owners
+
+    python -m benchmarks.task_history
+    python -m benchmarks.task_history --rows 1000000 --db /tmp/tasks.db
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from services.metrics import percentile
+from services.task_history import TaskHistory
+
+MEDIA_TYPES = ["image", "video", "audio", "text"]
+STATUSES = ["completed"] * 8 + ["failed", "streaming"]
+
+def load(history: TaskHistory, rows: int, owners: int, rng: random.Random, chunk: int = 100_000) -> float:
+    start = time.perf_counter()
+    created_at = time.time() - rows / 100
+    for i in range(rows):
+        created_at += rng.random() / 50
+        history.record(f"{i:032x}", f"owner-{rng.randrange(owners)}", f"synthetic prompt number {i}",
+                       rng.choice(MEDIA_TYPES), rng.choice(STATUSES), created_at, completed_at=created_at + 5)
+        if i % chunk == chunk - 1:
+            history.flush()  # keep the pending map bounded while loading
+            print(f"\r  loaded {i + 1:,} rows", end="", flush=True)
+    history.flush()
+    print()
+    return time.perf_counter() - start
+
+def deep_page(history: TaskHistory, owner: str, pages: int) -> dict:
+    cursor = None
+    for _ in range(pages):
+        _, cursor = history.list_tasks(owner=owner, limit=50, cursor=cursor)
+    return {"owner": owner, "limit": 50, "cursor": cursor}
+
+def time_query(fn, runs: int):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--owners", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=2000, help="queries per kind")
+    parser.add_argument("--db", help="database path (default: a temporary file, removed afterwards)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tmp = None if args.db else tempfile.TemporaryDirectory()
+    path = args.db or os.path.join(tmp.name, "tasks.db")
+    history = TaskHistory(path, batch_size=args.batch_size)
+    history.start()
+    try:
+        existing = history.list_tasks(limit=1)[0]
+        if existing:
+            print(f"Reusing existing rows in {path}")
+        else:
+            secs = load(history, args.rows, args.owners, rng)
+            print(f"  inserts:  {args.rows / secs:10,.0f} rows/s   ({secs:.0f} s, {history.stats['batches']:,} batches)")
+        size = sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+        print(f"  database: {size / 1e9:10.2f} GB")
+
+        def owner():
+            return f"owner-{rng.randrange(args.owners)}"
+
+        deep_pages = [deep_page(history, owner(), 2) for _ in range(50)]
+        queries = {
+            "owner, first page": lambda: history.list_tasks(owner=owner(), limit=50),
+            "owner, page 3 (cursor)": lambda: history.list_tasks(**rng.choice(deep_pages)),
+            "owner + status + media": lambda: history.list_tasks(owner=owner(), status="completed",
+                                                                 media_type=rng.choice(MEDIA_TYPES), limit=50),
+            "status, all owners": lambda: history.list_tasks(status=rng.choice(["failed", "streaming"]), limit=50),
+        }
+        for name, query in queries.items():
+            latencies = time_query(query, args.queries)
+            print(f"  {name + ':':26}p50 {percentile(latencies, 50):7.3f} ms   p99 {percentile(latencies, 99):7.3f} ms")
+    finally:
+        history.close()
+        if tmp:
+            tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Task status polling throughput.
+
+Polls ``GET /api/task/{task_id}`` for a task with a ``--result-kb`` result
+through the ASGI stack (``httpx.ASGITransport``, no network), comparing:
+
+- before: the previous handler, ``dataclasses.asdict`` on a plain dataclass,
+  with datetime/Enum conversion by FastAPI on every poll
+- after: the real-time server's handler, serving the slotted ``MediaTask``'s
+  cached encoding
+- after, 304: the same handler with ``If-None-Match`` set to the current ETag
+
+Both handlers are mounted on the same bare FastAPI app, so the difference is
+the handler and serialization alone. Reports polls/sec, response body size
+and peak memory allocated while polling. Without a network the 304 saves
+little time over the cached 200; its gain is the body it does not send.
+
+    python -m benchmarks.task_polling
+    python -m benchmarks.task_polling --result-kb 4096 --seconds 5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+REALTIME_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "omnimedia-realtime")
+sys.path.insert(0, REALTIME_DIR)
+os.chdir(REALTIME_DIR)  # the real-time app mounts ./static on import
+
+import app as realtime  # noqa: E402
+
+@dataclass
+class LegacyMediaTask:
+    task_id: str
+    prompt: str
+    media_type: str
+    status: realtime.GenerationStatus
+    progress: int
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    result_data: Optional[str] = None
+    stream_url: Optional[str] = None
+    metadata: Dict[str, Any] = None
+    owner: str = "anonymous"
+
+legacy_tasks: Dict[str, LegacyMediaTask] = {}
+bench_app = FastAPI()
+
+@bench_app.get("/legacy/task/{task_id}")
+async def legacy_task_status(task_id: str):
+    if task_id not in legacy_tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return asdict(legacy_tasks[task_id])
+
+bench_app.get("/api/task/{task_id}")(realtime.get_task_status)
+
+async def poll(url: str, seconds: float, headers: Dict[str, str]):
+    transport = httpx.ASGITransport(app=bench_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.get(url, headers=headers)  # warm up
+        status, body_bytes = response.status_code, len(response.content)
+        polls, deadline = 0, time.perf_counter() + seconds
+        started = time.perf_counter()
+        while time.perf_counter() < deadline:
+            await client.get(url, headers=headers)
+            polls += 1
+        elapsed = time.perf_counter() - started
+
+        tracemalloc.start()
+        for _ in range(20):
+            await client.get(url, headers=headers)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return status, body_bytes, polls / elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--result-kb", type=int, default=2048, help="size of the task's result_data")
+    parser.add_argument("--seconds", type=float, default=3.0, help="polling time per configuration")
+    args = parser.parse_args()
+
+    fields = dict(
+        task_id="bench-task", prompt="a lighthouse at dusk", media_type="text",
+        status=realtime.GenerationStatus.COMPLETED, progress=100, created_at=datetime.now(),
+        completed_at=datetime.now(), result_data="x" * (args.result_kb * 1024),
+        metadata={"style": "default", "quality": "hd", "real_time": True, "queue_wait_ms": 1.2},
+    )
+    legacy_tasks["bench-task"] = LegacyMediaTask(**fields)
+    realtime.active_tasks["bench-task"] = realtime.MediaTask(**fields)
+    _, etag = realtime.active_tasks["bench-task"].to_json()
+
+    print(f"result_data {args.result_kb} KB, {args.seconds:g} s per configuration")
+    baseline = None
+    for name, url, headers in (
+        ("before (asdict)", "/legacy/task/bench-task", {}),
+        ("after (cached)", "/api/task/bench-task", {}),
+        ("after, 304", "/api/task/bench-task", {"If-None-Match": etag}),
+    ):
+        status, body_bytes, rate, peak = asyncio.run(poll(url, args.seconds, headers))
+        baseline = baseline or rate
+        print(f"  {name + ':':17} HTTP {status}   {rate:9.1f} polls/s   ({rate / baseline:5.1f}x)   "
+              f"body {body_bytes / 1024:8.1f} KB   peak allocation {peak / 1024:9.1f} KB")
+
+if __name__ == "__main__":
+    main()
@@ -6,22 +6,37 @@ Like WebSim.ai but 1000x better with live streaming capabilities
 
 import asyncio
 import json
+import os
+import sys
 import uuid
 import time
+import threading
 import base64
 import io
+import struct
 from datetime import datetime
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from contextlib import asynccontextmanager
 from enum import Enum
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+import httpx
 import uvicorn
 
+from diagnostics import LoopLagMonitor, ProfilerBusyError, SamplingProfiler
+from event_log import TaskEventLog
+from prompt_index import PromptIndex
+
+# Shared libraries from the repository's services package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.admin import require_admin
+from services.task_history import ANONYMOUS_OWNER, TaskHistory
+from services.tenancy import FairScheduler, QuotaExceeded, Tenant, TenantRegistry
+
 # Real-time generation status
 class GenerationStatus(Enum):
     QUEUED = "queued"
@@ -30,18 +45,67 @@ class GenerationStatus(Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
-@dataclass
 class MediaTask:
-    task_id: str
-    prompt: str
-    media_type: str
-    status: GenerationStatus
-    progress: int
-    created_at: datetime
-    completed_at: Optional[datetime] = None
-    result_data: Optional[str] = None
-    stream_url: Optional[str] = None
-    metadata: Dict[str, Any] = None
+    """State of one generation task.
+
+    Every field assignment bumps ``version``. ``metadata`` is replaced via
+    ``update_metadata`` rather than mutated in place, so metadata changes do
+    too. ``to_json`` caches the encoded task per version, so polling an
+    unchanged task costs no re-encoding.
+    """
+
+    _fields = ("task_id", "prompt", "media_type", "status", "progress", "created_at", "completed_at",
+               "result_data", "stream_url", "metadata", "owner")
+    __slots__ = _fields + ("version", "_encoded", "_encoded_version")
+
+    def __init__(self, task_id: str, prompt: str, media_type: str, status: GenerationStatus, progress: int,
+                 created_at: datetime, completed_at: Optional[datetime] = None, result_data: Optional[str] = None,
+                 stream_url: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None,
+                 owner: str = ANONYMOUS_OWNER):
+        object.__setattr__(self, "version", 0)
+        object.__setattr__(self, "_encoded_version", -1)
+        self.task_id = task_id
+        self.prompt = prompt
+        self.media_type = media_type
+        self.status = status
+        self.progress = progress
+        self.created_at = created_at
+        self.completed_at = completed_at
+        self.result_data = result_data
+        self.stream_url = stream_url
+        self.metadata = metadata if metadata is not None else {}
+        self.owner = owner
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, "version", self.version + 1)
+
+    def __repr__(self):
+        return f"MediaTask(task_id={self.task_id!r}, status={self.status.value!r}, version={self.version})"
+
+    def update_metadata(self, **values):
+        self.metadata = {**self.metadata, **values}
+
+    def to_dict(self) -> Dict[str, Any]:
+        task = {name: getattr(self, name) for name in self._fields}
+        task["status"] = self.status.value
+        task["created_at"] = self.created_at.isoformat()
+        task["completed_at"] = self.completed_at.isoformat() if self.completed_at else None
+        return task
+
+    def to_json(self) -> tuple:
+        """The encoded task and its ETag, re-encoded only after a change"""
+        if self._encoded_version != self.version:
+            encoded = json.dumps(self.to_dict(), ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+            object.__setattr__(self, "_encoded", encoded.encode("utf-8"))
+            object.__setattr__(self, "_encoded_version", self.version)
+        return self._encoded, f'"{self.version}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header lists ``etag`` (weak comparison, as for GET)"""
+    if not if_none_match:
+        return False
+    return any(tag.strip() in ("*", etag, f"W/{etag}") for tag in if_none_match.split(","))
 
 class MediaRequest(BaseModel):
     prompt: str
@@ -49,56 +113,146 @@ class MediaRequest(BaseModel):
     style: Optional[str] = "default"
     quality: Optional[str] = "hd"
     real_time: bool = True
+    reuse_similar: bool = False  # return an earlier result for a near-duplicate prompt
+    reuse_threshold: Optional[float] = None
+
+# Event types that carry the full current state; a newer one replaces the previous in the replay log
+SNAPSHOT_EVENT_TYPES = {"progress_update", "text_stream"}
 
 class WebSocketManager:
-    def __init__(self):
+    def __init__(self, event_log: TaskEventLog, send_timeout: float = 5.0):
         self.active_connections: List[WebSocket] = []
         self.task_subscribers: Dict[str, List[WebSocket]] = {}
+        self.subscriptions: Dict[WebSocket, set] = {}
+        self.last_seen: Dict[WebSocket, float] = {}
+        self.event_log = event_log
+        self.send_timeout = send_timeout
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
+        self.subscriptions[websocket] = set()
+        self.touch(websocket)
+
+    def touch(self, websocket: WebSocket):
+        """Record that the client is alive (any message, including pongs)"""
+        self.last_seen[websocket] = time.monotonic()
 
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+        self.last_seen.pop(websocket, None)
         # Remove from task subscriptions
-        for task_id, subscribers in self.task_subscribers.items():
-            if websocket in subscribers:
+        for task_id in self.subscriptions.pop(websocket, ()):
+            subscribers = self.task_subscribers.get(task_id)
+            if subscribers and websocket in subscribers:
                 subscribers.remove(websocket)
+                if not subscribers:
+                    del self.task_subscribers[task_id]
 
-    async def subscribe_to_task(self, websocket: WebSocket, task_id: str):
-        if task_id not in self.task_subscribers:
-            self.task_subscribers[task_id] = []
-        self.task_subscribers[task_id].append(websocket)
+    async def subscribe_to_task(self, websocket: WebSocket, task_id: str, last_seq: Optional[int] = None) -> bool:
+        """Subscribe to live events, first replaying buffered events after ``last_seq`` when given.
+
+        Returns False when events after ``last_seq`` were already dropped from the buffer.
+        """
+        complete = True
+        if last_seq is not None:
+            events, truncated = self.event_log.since(task_id, last_seq)
+            complete = not truncated
+            # Keep replaying until caught up; live events are only sent once the socket is subscribed
+            while events:
+                for event in events:
+                    if isinstance(event.payload, bytes):
+                        await websocket.send_bytes(event.payload)
+                    else:
+                        await websocket.send_text(event.payload)
+                    last_seq = event.seq
+                events, _ = self.event_log.since(task_id, last_seq)
+        subscribers = self.task_subscribers.setdefault(task_id, [])
+        if websocket not in subscribers:
+            subscribers.append(websocket)
+        self.subscriptions.setdefault(websocket, set()).add(task_id)
+        return complete
+
+    async def _send(self, websocket: WebSocket, payload) -> bool:
+        """Send one message; False when the socket fails or does not take it within ``send_timeout``"""
+        try:
+            if isinstance(payload, bytes):
+                send = websocket.send_bytes(payload)
+            elif isinstance(payload, str):
+                send = websocket.send_text(payload)
+            else:
+                send = websocket.send_json(payload)
+            await asyncio.wait_for(send, timeout=self.send_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def _send_all(self, websockets: List[WebSocket], payload):
+        """Send to every socket concurrently, so one stalled client cannot hold up the rest; drop the ones that fail"""
+        if not websockets:
+            return
+        sent = await asyncio.gather(*(self._send(websocket, payload) for websocket in websockets))
+        dead = [websocket for websocket, ok in zip(websockets, sent) if not ok]
+        if dead:
+            await self._drop(dead)
+
+    async def _drop(self, websockets: List[WebSocket]):
+        for websocket in websockets:
+            self.disconnect(websocket)
+        await asyncio.gather(*(self._close(websocket) for websocket in websockets))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=1001), timeout=1.0)
+        except Exception:
+            pass
+
+    async def _send_to_subscribers(self, task_id: str, payload):
+        await self._send_all(list(self.task_subscribers.get(task_id, ())), payload)
 
     async def broadcast_task_update(self, task_id: str, update: Dict):
-        if task_id in self.task_subscribers:
-            disconnected = []
-            for websocket in self.task_subscribers[task_id]:
-                try:
-                    await websocket.send_json(update)
-                except:
-                    disconnected.append(websocket)
-            
-            # Clean up disconnected websockets
-            for ws in disconnected:
-                self.task_subscribers[task_id].remove(ws)
+        seq = self.event_log.next_seq(task_id)
+        text = json.dumps({**update, "seq": seq}, separators=(",", ":"), ensure_ascii=False)
+        key = update.get("type") if update.get("type") in SNAPSHOT_EVENT_TYPES else None
+        self.event_log.add(task_id, seq, text, key)
+        await self._send_to_subscribers(task_id, text)
+
+    async def broadcast_task_bytes(self, task_id: str, data: bytes):
+        """Send a binary payload framed with the task id and the event's sequence number"""
+        seq = self.event_log.next_seq(task_id)
+        frame = BINARY_FRAME_HEADER.pack(task_id.encode(), seq) + data
+        self.event_log.add(task_id, seq, frame)
+        await self._send_to_subscribers(task_id, frame)
 
     async def broadcast_to_all(self, message: Dict):
-        disconnected = []
-        for websocket in self.active_connections:
-            try:
-                await websocket.send_json(message)
-            except:
-                disconnected.append(websocket)
-        
-        # Clean up disconnected websockets
-        for ws in disconnected:
-            self.active_connections.remove(ws)
+        await self._send_all(list(self.active_connections), message)
+
+    async def heartbeat(self, interval: float, timeout: float):
+        """Ping every client each ``interval``; close sockets that have been silent for ``timeout``"""
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            silent = [ws for ws in self.active_connections if now - self.last_seen.get(ws, now) > timeout]
+            if silent:
+                await self._drop(silent)
+            await self._send_all(list(self.active_connections), {"type": "ping", "ts": time.time()})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background services"""
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    task_history.start()
+    heartbeat = asyncio.create_task(websocket_manager.heartbeat(WS_PING_INTERVAL, WS_PING_TIMEOUT))
+    yield
+    heartbeat.cancel()
+    await loop_monitor.stop()
+    task_history.close()
 
 # Initialize FastAPI app
-app = FastAPI(title="OmniMedia AI - Real-Time Generation", version="2.0.0")
+app = FastAPI(title="OmniMedia AI - Real-Time Generation", version="2.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -110,9 +264,81 @@ app.add_middleware(
 )
 
 # Global state
-websocket_manager = WebSocketManager()
+websocket_manager = WebSocketManager(TaskEventLog(
+    max_events=int(os.getenv("OMNIMEDIA_WS_REPLAY_EVENTS", "512")),
+    max_bytes=int(os.getenv("OMNIMEDIA_WS_REPLAY_BYTES", str(1024 * 1024))),
+    max_tasks=int(os.getenv("OMNIMEDIA_WS_REPLAY_TASKS", "256")),
+), send_timeout=float(os.getenv("OMNIMEDIA_WS_SEND_TIMEOUT", "5")))
+WS_PING_INTERVAL = float(os.getenv("OMNIMEDIA_WS_PING_INTERVAL", "20"))
+WS_PING_TIMEOUT = float(os.getenv("OMNIMEDIA_WS_PING_TIMEOUT", "45"))
 active_tasks: Dict[str, MediaTask] = {}
 
+# Event loop diagnostics
+LOOP_MONITOR_ENABLED = os.getenv("OMNIMEDIA_LOOP_MONITOR", "true").lower() == "true"
+loop_monitor = LoopLagMonitor(
+    interval=float(os.getenv("OMNIMEDIA_LOOP_LAG_INTERVAL_MS", "100")) / 1000,
+    stall_threshold=float(os.getenv("OMNIMEDIA_LOOP_STALL_THRESHOLD_MS", "100")) / 1000,
+)
+profiler = SamplingProfiler()
+
+# Media services (optional; generators that need them are disabled when unset)
+AUDIO_SERVICE_URL = os.getenv("AUDIO_SERVICE_URL")
+TEXT_SERVICE_URL = os.getenv("TEXT_SERVICE_URL")
+TEXT_MAX_TOKENS = int(os.getenv("TEXT_MAX_TOKENS", "1000"))
+
+# Persistent task history (SQLite, written in batches by a background thread)
+task_history = TaskHistory.from_env()
+
+def record_task(task: MediaTask):
+    task_history.record(
+        task.task_id, task.owner, task.prompt, task.media_type, task.status.value, task.created_at.timestamp(),
+        completed_at=task.completed_at.timestamp() if task.completed_at else None, metadata=task.metadata,
+    )
+
+# Tenants (by X-API-Key) share generation capacity through a weighted fair queue
+tenants = TenantRegistry.from_env()
+scheduler = FairScheduler.from_env()
+MEDIA_COSTS = {"image": 1, "video": 4, "audio": 1, "text": 1}  # relative cost of one generation
+
+def resolve_tenant(request: Request) -> Tenant:
+    return tenants.resolve(request.headers.get("x-api-key"))
+
+
+# Near-duplicate prompt reuse (opt-in per request)
+prompt_index = PromptIndex(max_entries=int(os.getenv("OMNIMEDIA_PROMPT_INDEX_MAX_ENTRIES", "100000")))
+REUSE_THRESHOLD = float(os.getenv("OMNIMEDIA_REUSE_THRESHOLD", "0.9"))
+
+def find_reusable_task(prompt: str, partition: tuple, threshold: float) -> Optional[tuple]:
+    """Completed task for a near-duplicate prompt with the same media type, style and quality"""
+    match = prompt_index.lookup(prompt, partition, threshold)
+    if not match:
+        return None
+    source = active_tasks.get(match[0])
+    if source is None or source.status != GenerationStatus.COMPLETED:
+        return None
+    return source, match[1]
+
+async def run_generation(task: MediaTask, generation, partition: tuple, tenant: Optional[Tenant] = None):
+    """Wait for the tenant's turn, run the generator, then index the prompt and record the final state"""
+    started = False
+    try:
+        async with scheduler.slot(tenant or tenants.resolve(None), MEDIA_COSTS.get(task.media_type, 1)) as queue_wait:
+            task.update_metadata(queue_wait_ms=round(queue_wait * 1000, 1))
+            started = True
+            await generation
+    except Exception:
+        task.status = GenerationStatus.FAILED
+        raise
+    finally:
+        if not started:
+            generation.close()
+        record_task(task)
+    if task.status == GenerationStatus.COMPLETED and (task.result_data or task.stream_url):
+        prompt_index.add(task.prompt, task.task_id, partition)
+
+# Binary frames: 36-byte task id, 4-byte task event sequence number, then the payload (e.g. an audio chunk)
+BINARY_FRAME_HEADER = struct.Struct("!36sI")
+
 # Real-time media generators
 class RealTimeImageGenerator:
     @staticmethod
@@ -208,7 +434,11 @@ class RealTimeVideoGenerator:
 class RealTimeTextGenerator:
     @staticmethod
     async def generate_stream(prompt: str, task_id: str, style: str = "default"):
-        """Simulate real-time text generation with streaming words"""
+        """Stream text word by word; real tokens when a text service is configured"""
+        if TEXT_SERVICE_URL:
+            await RealTimeTextGenerator.stream_from_service(prompt, task_id)
+            return
+
         # Mock generated text based on prompt
         generated_text = f"""
 # {prompt.title()}
@@ -257,10 +487,149 @@ The real-time generation system is working perfectly, providing immediate feedba
                 }
             })
 
+    @staticmethod
+    async def stream_from_service(prompt: str, task_id: str):
+        """Relay provider tokens from the text service's SSE stream as they arrive"""
+        task = active_tasks.get(task_id)
+        current_text = ""
+        tokens = 0
+        stats = {}
+        try:
+            async with httpx.AsyncClient(timeout=httpx.Timeout(None, connect=10.0)) as client:
+                async with client.stream("POST", f"{TEXT_SERVICE_URL}/generate/stream", json={
+                    "prompt": prompt,
+                    "task_id": task_id,
+                    "subtask_id": f"{task_id}-text",
+                    "max_tokens": TEXT_MAX_TOKENS,
+                }) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data: ") or line == "data: [DONE]":
+                            continue
+                        event = json.loads(line[len("data: "):])
+                        if event.get("done"):
+                            stats = event
+                            continue
+
+                        current_text += event["token"]
+                        tokens += 1
+                        # Token count against the budget is the best progress estimate available
+                        progress = min(99, int(tokens / TEXT_MAX_TOKENS * 100))
+                        if task:
+                            task.progress = progress
+                            task.status = GenerationStatus.STREAMING
+                            task.result_data = current_text
+
+                        await websocket_manager.broadcast_task_update(task_id, {
+                            "task_id": task_id,
+                            "type": "text_stream",
+                            "data": {
+                                "text": current_text,
+                                "progress": progress,
+                                "word_count": tokens,
+                                "total_words": None
+                            }
+                        })
+        except Exception as e:  # malformed events too: anything unhandled would leave the client waiting forever
+            if task:
+                task.status = GenerationStatus.FAILED
+            await websocket_manager.broadcast_task_update(task_id, {
+                "task_id": task_id,
+                "type": "progress_update",
+                "data": {"stage": "failed", "progress": 0, "message": f"Text generation failed: {e}"}
+            })
+            return
+
+        if task:
+            task.progress = 100
+            task.status = GenerationStatus.COMPLETED
+            task.result_data = current_text
+            task.completed_at = datetime.now()
+            task.update_metadata(stream={k: stats.get(k) for k in ("model", "tokens", "ttft_ms", "tokens_per_sec")})
+
+        await websocket_manager.broadcast_task_update(task_id, {
+            "task_id": task_id,
+            "type": "text_stream",
+            "data": {
+                "text": current_text,
+                "progress": 100,
+                "word_count": tokens,
+                "total_words": tokens,
+                "ttft_ms": stats.get("ttft_ms"),
+                "tokens_per_sec": stats.get("tokens_per_sec")
+            }
+        })
+
+class RealTimeAudioGenerator:
+    @staticmethod
+    async def generate_stream(prompt: str, task_id: str, voice_id: str = "Rachel"):
+        """Relay audio from the audio service as binary WebSocket frames while it is synthesized"""
+        started = time.perf_counter()
+        ttfb = None
+        chunks = 0
+        total_bytes = 0
+        task = active_tasks.get(task_id)
+        try:
+            async with httpx.AsyncClient(timeout=httpx.Timeout(None, connect=10.0)) as client:
+                async with client.stream("POST", f"{AUDIO_SERVICE_URL}/generate/stream", json={
+                    "prompt": prompt,
+                    "task_id": task_id,
+                    "subtask_id": f"{task_id}-audio",
+                    "voice_id": voice_id,
+                }) as response:
+                    response.raise_for_status()
+                    artifact = response.headers.get("x-artifact")
+                    if task:
+                        task.status = GenerationStatus.STREAMING
+                    await websocket_manager.broadcast_task_update(task_id, {
+                        "task_id": task_id,
+                        "type": "audio_stream_start",
+                        "data": {"mime_type": response.headers.get("content-type", "audio/mpeg")}
+                    })
+
+                    async for chunk in response.aiter_bytes():
+                        if ttfb is None:
+                            ttfb = time.perf_counter() - started
+                        chunks += 1
+                        total_bytes += len(chunk)
+                        await websocket_manager.broadcast_task_bytes(task_id, chunk)
+        except Exception as e:  # not just HTTP errors: anything else would leave the task streaming forever
+            if task:
+                task.status = GenerationStatus.FAILED
+            await websocket_manager.broadcast_task_update(task_id, {
+                "task_id": task_id,
+                "type": "progress_update",
+                "data": {"stage": "failed", "progress": 0, "message": f"Audio generation failed: {e}"}
+            })
+            return
+
+        stats = {
+            "chunks": chunks,
+            "bytes": total_bytes,
+            "ttfb_ms": round(ttfb * 1000, 1) if ttfb is not None else None,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "artifact": artifact,
+        }
+        if task:
+            task.progress = 100
+            task.status = GenerationStatus.COMPLETED
+            task.result_data = artifact
+            task.completed_at = datetime.now()
+            task.update_metadata(stream=stats)
+
+        await websocket_manager.broadcast_task_update(task_id, {
+            "task_id": task_id,
+            "type": "audio_stream_end",
+            "data": stats
+        })
+
 # API Routes
 @app.post("/api/generate")
-async def generate_media(request: MediaRequest):
+async def generate_media(request: MediaRequest, http_request: Request):
     """Start real-time media generation"""
+    if request.media_type not in ("image", "video", "text") and not (request.media_type == "audio" and AUDIO_SERVICE_URL):
+        raise HTTPException(status_code=400, detail="Unsupported media type")
+    tenant = resolve_tenant(http_request)
     task_id = str(uuid.uuid4())
     
     # Create task
@@ -275,37 +644,89 @@ async def generate_media(request: MediaRequest):
             "style": request.style,
             "quality": request.quality,
             "real_time": request.real_time
-        }
+        },
+        owner=tenant.tenant_id
     )
     
+    partition = (request.media_type, request.style, request.quality)
+    if request.reuse_similar:
+        threshold = REUSE_THRESHOLD if request.reuse_threshold is None else min(max(request.reuse_threshold, 0.0), 1.0)
+        reusable = find_reusable_task(request.prompt, partition, threshold)
+        if reusable:
+            source, similarity = reusable
+            task.status = GenerationStatus.COMPLETED
+            task.progress = 100
+            task.completed_at = datetime.now()
+            task.result_data = source.result_data
+            task.stream_url = source.stream_url
+            task.update_metadata(reused_from=source.task_id, similarity=similarity)
+            active_tasks[task_id] = task
+            record_task(task)
+            return {"task_id": task_id, "status": "completed", "real_time": request.real_time,
+                    "reused_from": source.task_id, "similarity": similarity}
+
+    # Only work that will be generated counts against the tenant's quotas
+    try:
+        scheduler.admit(tenant)
+    except QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
     active_tasks[task_id] = task
     
     # Start generation in background
     if request.media_type == "image":
-        asyncio.create_task(RealTimeImageGenerator.generate_stream(
+        generation = RealTimeImageGenerator.generate_stream(
             request.prompt, task_id, request.style
-        ))
+        )
     elif request.media_type == "video":
-        asyncio.create_task(RealTimeVideoGenerator.generate_stream(
+        generation = RealTimeVideoGenerator.generate_stream(
             request.prompt, task_id, request.quality
-        ))
+        )
     elif request.media_type == "text":
-        asyncio.create_task(RealTimeTextGenerator.generate_stream(
+        generation = RealTimeTextGenerator.generate_stream(
             request.prompt, task_id, request.style
-        ))
+        )
     else:
-        raise HTTPException(status_code=400, detail="Unsupported media type")
+        generation = RealTimeAudioGenerator.generate_stream(
+            request.prompt, task_id
+        )
+    record_task(task)
+    asyncio.create_task(run_generation(task, generation, partition, tenant))
     
     return {"task_id": task_id, "status": "queued", "real_time": request.real_time}
 
 @app.get("/api/task/{task_id}")
-async def get_task_status(task_id: str):
-    """Get task status"""
+async def get_task_status(task_id: str, request: Request):
+    """Get task status; answers 304 when the client's ETag is still current"""
     if task_id not in active_tasks:
-        raise HTTPException(status_code=404, detail="Task not found")
+        # Tasks from earlier runs are only in the history (state, not results)
+        loop = asyncio.get_running_loop()
+        stored = await loop.run_in_executor(None, task_history.get_task, task_id)
+        if stored is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return stored
     
     task = active_tasks[task_id]
-    return asdict(task)
+    body, etag = task.to_json()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.get("/api/tasks")
+def list_tasks(request: Request, status: Optional[str] = None, media_type: Optional[str] = None,
+               owner: Optional[str] = None, limit: int = 50, cursor: Optional[str] = None):
+    """Newest-first task history for the caller's API key, paginated with ``next_cursor``"""
+    caller = resolve_tenant(request).tenant_id
+    if owner is not None and owner != caller:
+        require_admin(request)
+    elif not request.headers.get("x-api-key"):
+        # Callers without a key would all share the anonymous owner and see each other's prompts
+        raise HTTPException(status_code=401, detail="An X-API-Key header is required to list tasks")
+    try:
+        items, next_cursor = task_history.list_tasks(owner or caller, status, media_type, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"tasks": items, "next_cursor": next_cursor}
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -314,17 +735,27 @@ async def websocket_endpoint(websocket: WebSocket):
     try:
         while True:
             data = await websocket.receive_json()
+            websocket_manager.touch(websocket)
             
             if data.get("action") == "subscribe":
                 task_id = data.get("task_id")
                 if task_id:
-                    await websocket_manager.subscribe_to_task(websocket, task_id)
+                    last_seq = data.get("last_seq")
                     await websocket.send_json({
                         "type": "subscription_confirmed",
-                        "task_id": task_id
+                        "task_id": task_id,
+                        "latest_seq": websocket_manager.event_log.latest_seq(task_id)
                     })
+                    complete = await websocket_manager.subscribe_to_task(
+                        websocket, task_id, int(last_seq) if last_seq is not None else None
+                    )
+                    if not complete:
+                        # Part of the gap is no longer buffered; the client should reload the task
+                        await websocket.send_json({"type": "replay_truncated", "task_id": task_id})
             
-    except WebSocketDisconnect:
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
         websocket_manager.disconnect(websocket)
 
 @app.get("/api/health")
@@ -334,9 +765,40 @@ async def health_check():
         "status": "healthy",
         "active_tasks": len(active_tasks),
         "active_connections": len(websocket_manager.active_connections),
+        "prompt_index": prompt_index.stats(),
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/api/usage")
+async def get_usage(request: Request):
+    """Quota usage and queue-wait percentiles for the caller's tenant"""
+    tenant = resolve_tenant(request)
+    return {"tenant_id": tenant.tenant_id, **scheduler.usage_for(tenant)}
+
+@app.get("/api/admin/tenants")
+async def get_tenant_usage(request: Request):
+    """Usage of every tenant seen since start-up"""
+    require_admin(request)
+    return {"capacity": scheduler.capacity, "running": scheduler.running, "tenants": scheduler.usage()}
+
+@app.get("/api/admin/loop-lag")
+async def get_loop_lag(request: Request):
+    """Event loop stall history with the stack running during each stall"""
+    require_admin(request)
+    return loop_monitor.snapshot()
+
+@app.get("/api/admin/profile", response_class=PlainTextResponse)
+async def run_profile(request: Request, seconds: float = 5.0, hz: int = 50, loop_only: bool = False):
+    """Sample stacks for a few seconds and return collapsed (flamegraph) output"""
+    require_admin(request)
+    thread_id = threading.get_ident() if loop_only else None
+    loop = asyncio.get_running_loop()
+    try:
+        counts = await loop.run_in_executor(None, profiler.profile, seconds, hz, thread_id)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return SamplingProfiler.format_collapsed(counts)
+
 # Serve static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
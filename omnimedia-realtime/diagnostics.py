@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+OmniMedia AI - Event Loop Diagnostics
+Loop-lag monitoring and an on-demand sampling profiler that are cheap
+enough to leave enabled in production
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}"
+
+
+def _collapse_frame(frame) -> List[str]:
+    """Return the stack of a frame as labels, outermost call first"""
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class LoopLagMonitor:
+    """Measure event-loop stalls and capture what was running during each one.
+
+    A heartbeat coroutine sleeps for ``interval`` and measures how late it wakes
+    up. A watchdog thread notices a missed heartbeat while the stall is still in
+    progress and snapshots the loop thread's stack, so the recorded stall points
+    at the blocking code rather than at the heartbeat itself.
+    """
+
+    def __init__(self, interval: float = 0.1, stall_threshold: float = 0.1, max_stalls: int = 100):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.stalls: deque = deque(maxlen=max_stalls)
+        self.beats = 0
+        self.max_lag = 0.0
+        self.total_stall_time = 0.0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._beat_started = 0.0
+        self._beat_seq = 0
+        self._captured: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat_task is not None and not self._heartbeat_task.done()
+
+    def start(self):
+        """Start monitoring the running event loop"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._beat_started = time.monotonic()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat(), name="loop-lag-heartbeat")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        """Stop the heartbeat and watchdog"""
+        self._stopped.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                self._beat_seq += 1
+                self._beat_started = time.monotonic()
+                self._captured = None
+            started = self._beat_started
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - started - self.interval)
+            self.beats += 1
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.stall_threshold:
+                self._record_stall(lag)
+
+    def _record_stall(self, lag: float):
+        with self._lock:
+            captured = self._captured
+        self.total_stall_time += lag
+        self.stalls.append({
+            "timestamp": time.time(),
+            "duration_ms": round(lag * 1000, 3),
+            "task": captured["task"] if captured else None,
+            "stack": captured["stack"] if captured else [],
+        })
+
+    def _watch(self):
+        poll = min(self.interval, self.stall_threshold) / 2
+        while not self._stopped.wait(poll):
+            with self._lock:
+                overdue = time.monotonic() - self._beat_started - self.interval
+                if overdue < self.stall_threshold or self._captured is not None:
+                    continue
+                seq = self._beat_seq
+            captured = self._capture_loop_stack()
+            with self._lock:
+                # Only keep the snapshot if the loop is still stuck in the same beat
+                if seq == self._beat_seq:
+                    self._captured = captured
+
+    def _capture_loop_stack(self) -> Dict[str, Any]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        task_name = None
+        try:
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                task_name = f"{task.get_name()} ({task.get_coro().__qualname__})"
+        except Exception:
+            pass
+        return {"task": task_name, "stack": _collapse_frame(frame) if frame else []}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Summary of loop health since start-up"""
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "stall_threshold_ms": self.stall_threshold * 1000,
+            "beats": self.beats,
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "stall_count": len(self.stalls),
+            "total_stall_ms": round(self.total_stall_time * 1000, 3),
+            "stalls": list(self.stalls),
+        }
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile is requested while another is still running"""
+
+
+class SamplingProfiler:
+    """Time-boxed stack sampler built on ``sys._current_frames``.
+
+    Sampling happens on a separate thread so the event loop keeps running (and
+    gets sampled) while a profile is collected. Only one profile runs at a time
+    and both duration and rate are clamped, which keeps overhead bounded.
+    """
+
+    MAX_DURATION = 30.0
+    MAX_HZ = 250
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, duration: float, hz: int = 100, thread_id: Optional[int] = None) -> Counter:
+        """Sample stacks for ``duration`` seconds and return collapsed-stack counts.
+
+        Blocks the calling thread, so call it from an executor when on the loop.
+        """
+        duration = min(max(duration, 0.01), self.MAX_DURATION)
+        hz = min(max(int(hz), 1), self.MAX_HZ)
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running")
+        try:
+            return self._sample(duration, 1.0 / hz, thread_id)
+        finally:
+            self._lock.release()
+
+    def _sample(self, duration: float, period: float, thread_id: Optional[int]) -> Counter:
+        own_id = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        counts: Counter = Counter()
+        deadline = time.monotonic() + duration
+        next_sample = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            for ident, frame in sys._current_frames().items():
+                if ident == own_id or (thread_id is not None and ident != thread_id):
+                    continue
+                thread_name = names.get(ident) or f"thread-{ident}"
+                counts[";".join([thread_name] + _collapse_frame(frame))] += 1
+            next_sample += period
+            time.sleep(max(0.0, next_sample - time.monotonic()))
+        return counts
+
+    @staticmethod
+    def format_collapsed(counts: Counter) -> str:
+        """Render counts in the folded format read by flamegraph.pl and speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
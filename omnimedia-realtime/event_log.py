@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+OmniMedia AI - Per-Task Event Replay Log
+Sequenced, bounded buffers of the WebSocket events sent for each task, so
+clients that reconnect can resubscribe with the last sequence number they saw
+"""
+
+from collections import OrderedDict, deque
+from typing import Deque, List, NamedTuple, Optional, Tuple, Union
+
+Payload = Union[str, bytes]  # serialized JSON text or a binary frame
+
+
+class Event(NamedTuple):
+    seq: int
+    payload: Payload
+    key: Optional[str]
+
+
+class _TaskEvents:
+    __slots__ = ("events", "next_seq", "first_seq", "bytes", "evicted_through")
+
+    def __init__(self, first_seq: int = 1):
+        self.events: Deque[Event] = deque()
+        self.next_seq = first_seq
+        self.first_seq = first_seq  # sequence numbers below this were sent before the buffer was (re)created
+        self.bytes = 0
+        self.evicted_through = 0  # highest sequence number dropped to stay within the caps
+
+
+class TaskEventLog:
+    """Ring buffers of recent events per task, capped by event count and bytes.
+
+    Events with a ``key`` are snapshots (e.g. overall progress, cumulative
+    text): a keyed event replaces the previous event when that one has the
+    same key, since a resuming client only needs the latest. Only the
+    ``max_tasks`` most recently active tasks keep a buffer. An evicted task
+    keeps just its next sequence number (for ``max_retired_tasks`` tasks;
+    after that, new buffers start above every number handed out so far), so
+    sequence numbers never go backwards and resuming reports the lost events.
+    """
+
+    def __init__(self, max_events: int = 512, max_bytes: int = 1024 * 1024, max_tasks: int = 256,
+                 max_retired_tasks: int = 4096):
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.max_tasks = max_tasks
+        self.max_retired_tasks = max_retired_tasks
+        self._tasks: "OrderedDict[str, _TaskEvents]" = OrderedDict()
+        self._retired: "OrderedDict[str, int]" = OrderedDict()  # task id -> next sequence number
+        self._seq_floor = 0  # highest sequence number of a task that is no longer tracked at all
+
+    def _task(self, task_id: str) -> _TaskEvents:
+        log = self._tasks.get(task_id)
+        if log is None:
+            first_seq = self._retired.pop(task_id, None) or self._seq_floor + 1
+            log = self._tasks[task_id] = _TaskEvents(first_seq)
+            while len(self._tasks) > self.max_tasks:
+                evicted_id, evicted = self._tasks.popitem(last=False)
+                self._retired[evicted_id] = evicted.next_seq
+            while len(self._retired) > self.max_retired_tasks:
+                self._seq_floor = max(self._seq_floor, self._retired.popitem(last=False)[1] - 1)
+        else:
+            self._tasks.move_to_end(task_id)
+        return log
+
+    def next_seq(self, task_id: str) -> int:
+        """Allocate the sequence number for the task's next event"""
+        log = self._task(task_id)
+        seq = log.next_seq
+        log.next_seq += 1
+        return seq
+
+    def add(self, task_id: str, seq: int, payload: Payload, key: Optional[str] = None):
+        log = self._task(task_id)
+        events = log.events
+        if key is not None and events and events[-1].key == key:
+            log.bytes -= len(events.pop().payload)
+        events.append(Event(seq, payload, key))
+        log.bytes += len(payload)
+        while len(events) > 1 and (len(events) > self.max_events or log.bytes > self.max_bytes):
+            evicted = events.popleft()
+            log.bytes -= len(evicted.payload)
+            log.evicted_through = evicted.seq
+
+    def since(self, task_id: str, last_seq: int) -> Tuple[List[Event], bool]:
+        """Events after ``last_seq``, and whether some of them were already dropped"""
+        log = self._tasks.get(task_id)
+        if log is None:
+            return [], last_seq > 0
+        if last_seq >= log.next_seq - 1:
+            return [], False
+        # A client that saw events from before the buffer was recreated missed everything up to first_seq
+        truncated = last_seq < log.evicted_through or 0 < last_seq < log.first_seq - 1
+        return [event for event in log.events if event.seq > last_seq], truncated
+
+    def latest_seq(self, task_id: str) -> int:
+        log = self._tasks.get(task_id)
+        if log is not None:
+            return log.next_seq - 1
+        return self._retired.get(task_id, 1) - 1
+
+    def stats(self):
+        return {
+            "tasks": len(self._tasks),
+            "retired_tasks": len(self._retired),
+            "events": sum(len(log.events) for log in self._tasks.values()),
+            "bytes": sum(log.bytes for log in self._tasks.values()),
+        }
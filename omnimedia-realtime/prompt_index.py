@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+OmniMedia AI - Near-Duplicate Prompt Index
+MinHash/LSH over prompt words, used to reuse earlier generations for prompts
+that only differ in casing, whitespace, punctuation or the order of
+neighbouring words
+"""
+
+import hashlib
+import re
+from array import array
+from collections import deque
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+
+_MASK64 = (1 << 64) - 1
+_EMPTY = _MASK64
+_WORD = re.compile(r"[^\W_]+(?:'[^\W_]+)*")  # letters and digits; apostrophes inside a word are kept
+
+
+def normalize(prompt: str) -> List[str]:
+    """Lowercase words in their original order, with punctuation and whitespace dropped"""
+    return _WORD.findall(prompt.lower())
+
+
+def word_hashes(prompt: str) -> array:
+    """Stable 64-bit hashes of the prompt's words in order; a repeated word is hashed with its occurrence number"""
+    seen: Dict[str, int] = {}
+    hashes = array("Q")
+    for word in normalize(prompt):
+        seen[word] = seen.get(word, 0) + 1
+        token = word if seen[word] == 1 else f"{word}#{seen[word]}"
+        hashes.append(int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little"))
+    return hashes
+
+
+def similarity(a: array, b: array) -> float:
+    """Jaccard similarity of the two prompts' words, counting a shared word as different when it moved.
+
+    Positions are compared among the shared words only, and a move of one place is tolerated, so
+    inserted words and swapped neighbours ("big red" vs "red big") cost nothing extra while
+    "man bites dog" stays far from "dog bites man".
+    """
+    if not a and not b:
+        return 1.0
+    common = set(a).intersection(b)
+    union = len(a) + len(b) - len(common)
+    position = {h: i for i, h in enumerate(h for h in b if h in common)}
+    moved = sum(1 for i, h in enumerate(h for h in a if h in common) if abs(i - position[h]) > 1)
+    return (len(common) - moved) / union
+
+
+class PromptIndex:
+    """Incremental, bounded MinHash/LSH index from prompts to earlier results.
+
+    Signatures use one-permutation MinHash (each word is hashed once and
+    lands in one of ``num_perm`` bins) with rotation densification, stored as
+    16-bit b-bit minima, so adding and looking up a prompt costs O(words)
+    rather than O(words * num_perm). Bands of the signature are bucketed
+    per partition (media type, style, quality). The signature only finds
+    candidates: each one is scored exactly by ``similarity`` on the stored
+    word hashes, so estimation noise can never cause a reuse, and word sets
+    that match in a different order ("man bites dog") are still told apart.
+    The oldest entries are evicted once ``max_entries`` is reached.
+    """
+
+    def __init__(self, max_entries: int = 100_000, num_perm: int = 32, bands: int = 8):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.max_entries = max_entries
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._next_id = 0
+        self._signatures: Dict[int, bytes] = {}
+        self._words: Dict[int, array] = {}
+        self._meta: Dict[int, Tuple[Hashable, str]] = {}
+        self._order: deque = deque()
+        # partition -> one dict per band: band key -> entry id, or a list of ids on collision
+        self._buckets: Dict[Hashable, List[Dict[int, Union[int, List[int]]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, prompt: str) -> bytes:
+        return self._signature(word_hashes(prompt))
+
+    def _signature(self, hashes: array) -> bytes:
+        k = self.num_perm
+        bins = [_EMPTY] * k
+        for h in hashes:
+            b = h % k
+            v = h // k
+            if v < bins[b]:
+                bins[b] = v
+        if all(v == _EMPTY for v in bins):
+            return bytes(2 * k)
+        # Rotation densification: an empty bin borrows the next non-empty bin's value
+        offset_step = (_MASK64 // k) | 1
+        for i in range(k):
+            if bins[i] == _EMPTY:
+                j, distance = (i + 1) % k, 1
+                while bins[j] == _EMPTY:
+                    j, distance = (j + 1) % k, distance + 1
+                bins[i] = (bins[j] + distance * offset_step) & _MASK64
+        return array("H", ((v ^ (v >> 16) ^ (v >> 32) ^ (v >> 48)) & 0xFFFF for v in bins)).tobytes()
+
+    def _band_keys(self, signature: bytes) -> List[int]:
+        width = 2 * self.rows
+        return [int.from_bytes(signature[i * width:(i + 1) * width], "little") for i in range(self.bands)]
+
+    def add(self, prompt: str, value: str, partition: Hashable = None) -> int:
+        """Index ``prompt`` (within ``partition``) as pointing at ``value``"""
+        while len(self._signatures) >= self.max_entries:
+            self._evict_oldest()
+        entry_id = self._next_id
+        self._next_id += 1
+        hashes = word_hashes(prompt)
+        signature = self._signature(hashes)
+        self._signatures[entry_id] = signature
+        self._words[entry_id] = hashes
+        self._meta[entry_id] = (partition, value)
+        self._order.append(entry_id)
+        if partition not in self._buckets:
+            self._buckets[partition] = [{} for _ in range(self.bands)]
+        for bucket, key in zip(self._buckets[partition], self._band_keys(signature)):
+            existing = bucket.get(key)
+            if existing is None:
+                bucket[key] = entry_id
+            elif isinstance(existing, list):
+                existing.append(entry_id)
+            else:
+                bucket[key] = [existing, entry_id]
+        return entry_id
+
+    def lookup(self, prompt: str, partition: Hashable = None, threshold: float = 0.8) -> Optional[Tuple[str, float]]:
+        """Best (value, similarity) at or above ``threshold``, or None"""
+        buckets = self._buckets.get(partition)
+        if buckets is None:
+            return None
+        hashes = word_hashes(prompt)
+        signature = self._signature(hashes)
+        candidates = set()
+        for bucket, key in zip(buckets, self._band_keys(signature)):
+            hit = bucket.get(key)
+            if hit is None:
+                continue
+            if isinstance(hit, list):
+                candidates.update(hit)
+            else:
+                candidates.add(hit)
+        best = None
+        for entry_id in candidates:
+            score = similarity(hashes, self._words[entry_id])
+            if score >= threshold and (best is None or score > best[1] or (score == best[1] and entry_id > best[2])):
+                best = (self._meta[entry_id][1], score, entry_id)
+        return (best[0], best[1]) if best else None
+
+    def remove(self, entry_id: int):
+        signature = self._signatures.pop(entry_id, None)
+        if signature is None:
+            return
+        del self._words[entry_id]
+        partition, _ = self._meta.pop(entry_id)
+        buckets = self._buckets[partition]
+        for bucket, key in zip(buckets, self._band_keys(signature)):
+            hit = bucket.get(key)
+            if isinstance(hit, list):
+                hit.remove(entry_id)
+                if len(hit) == 1:
+                    bucket[key] = hit[0]
+            elif hit == entry_id:
+                del bucket[key]
+        if not any(buckets):
+            del self._buckets[partition]
+
+    def _evict_oldest(self):
+        while self._order:
+            entry_id = self._order.popleft()
+            if entry_id in self._signatures:
+                self.remove(entry_id)
+                return
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._signatures),
+            "max_entries": self.max_entries,
+            "partitions": len(self._buckets),
+            "buckets": sum(len(bucket) for buckets in self._buckets.values() for bucket in buckets),
+        }
@@ -7,10 +7,13 @@ class OmniMediaAI {
     constructor() {
         this.ws = null;
         this.currentTask = null;
+        this.lastSeq = 0;  // last event sequence number seen for currentTask
+        this.taskActive = false;
         this.isConnected = false;
         this.reconnectAttempts = 0;
         this.maxReconnectAttempts = 5;
         this.taskHistory = [];
+        this.audioStream = null;
         
         this.init();
     }
@@ -85,6 +88,7 @@ class OmniMediaAI {
                                     <option value="image">🖼️ Image</option>
                                     <option value="video">🎥 Video</option>
                                     <option value="text">📝 Text</option>
+                                    <option value="audio">🎧 Audio</option>
                                 </select>
                             </div>
                             <div class="form-group">
@@ -184,15 +188,25 @@ class OmniMediaAI {
         
         try {
             this.ws = new WebSocket(wsUrl);
+            this.ws.binaryType = 'arraybuffer';
             
             this.ws.onopen = () => {
                 console.log('🟢 WebSocket connected');
                 this.isConnected = true;
                 this.reconnectAttempts = 0;
                 this.updateConnectionStatus(true);
+
+                // Resume a running task: the server replays what was sent while we were away
+                if (this.currentTask && this.taskActive) {
+                    this.subscribe();
+                }
             };
 
             this.ws.onmessage = (event) => {
+                if (event.data instanceof ArrayBuffer) {
+                    this.handleBinaryFrame(event.data);
+                    return;
+                }
                 const data = JSON.parse(event.data);
                 this.handleWebSocketMessage(data);
             };
@@ -215,6 +229,21 @@ class OmniMediaAI {
         }
     }
 
+    subscribe() {
+        this.ws.send(JSON.stringify({
+            action: 'subscribe',
+            task_id: this.currentTask,
+            last_seq: this.lastSeq
+        }));
+    }
+
+    acceptEvent(taskId, seq) {
+        // Drop events for other tasks and duplicates from a replay
+        if (taskId !== this.currentTask || seq <= this.lastSeq) return false;
+        this.lastSeq = seq;
+        return true;
+    }
+
     attemptReconnect() {
         if (this.reconnectAttempts < this.maxReconnectAttempts) {
             this.reconnectAttempts++;
@@ -308,13 +337,18 @@ class OmniMediaAI {
             
             if (response.ok) {
                 this.currentTask = result.task_id;
+                this.lastSeq = 0;
+                this.taskActive = true;
+
+                // A near-duplicate prompt was answered from an earlier result
+                if (result.status === 'completed') {
+                    await this.showReusedResult(result);
+                    return;
+                }
                 
-                // Subscribe to task updates via WebSocket
+                // Subscribe to task updates via WebSocket, including any sent before subscribing
                 if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-                    this.ws.send(JSON.stringify({
-                        action: 'subscribe',
-                        task_id: this.currentTask
-                    }));
+                    this.subscribe();
                 }
 
                 // Show streaming indicator
@@ -332,7 +366,51 @@ class OmniMediaAI {
         }
     }
 
+    async showReusedResult(result) {
+        const response = await fetch(`/api/task/${result.task_id}`);
+        const task = await response.json();
+        this.showTaskResult(task, `Reused an earlier result (${Math.round(result.similarity * 100)}% similar)`);
+    }
+
+    async resyncTask(taskId) {
+        // Some events were missed for good; fall back to the task's current state
+        if (taskId !== this.currentTask) return;
+        const response = await fetch(`/api/task/${taskId}`);
+        const task = await response.json();
+        if (task.status === 'completed' && task.media_type !== 'audio') {
+            this.showTaskResult(task, 'Reconnected: loaded the finished result');
+        } else {
+            this.showProgress(task.progress, 'Reconnected: some live updates were missed');
+        }
+    }
+
+    showTaskResult(task, message) {
+        this.showProgress(100, message);
+        this.showStreamingIndicator(false);
+        if (task.media_type === 'text') {
+            this.showTextStream(task.result_data);
+        } else {
+            this.showResult(task.result_data, 'complete');
+        }
+        this.resetGenerateButton();
+
+        this.addToHistory({
+            task_id: task.task_id,
+            prompt: task.prompt,
+            media_type: task.media_type,
+            status: 'completed',
+            timestamp: new Date().toISOString(),
+            result_data: task.result_data
+        });
+    }
+
     handleWebSocketMessage(data) {
+        if (data.type === 'ping') {
+            this.ws.send(JSON.stringify({ action: 'pong' }));
+            return;
+        }
+        if (data.seq !== undefined && !this.acceptEvent(data.task_id, data.seq)) return;
+
         console.log('📨 WebSocket message:', data);
 
         switch (data.type) {
@@ -340,6 +418,10 @@ class OmniMediaAI {
                 console.log('✅ Subscribed to task:', data.task_id);
                 break;
 
+            case 'replay_truncated':
+                this.resyncTask(data.task_id);
+                break;
+
             case 'progress_update':
                 this.handleProgressUpdate(data);
                 break;
@@ -348,6 +430,14 @@ class OmniMediaAI {
                 this.handleTextStream(data);
                 break;
 
+            case 'audio_stream_start':
+                this.handleAudioStreamStart(data);
+                break;
+
+            case 'audio_stream_end':
+                this.handleAudioStreamEnd(data);
+                break;
+
             default:
                 console.log('📝 Unknown message type:', data.type);
         }
@@ -388,8 +478,10 @@ class OmniMediaAI {
 
         const { text, progress, word_count, total_words } = streamData;
 
-        // Update progress
-        this.showProgress(progress, `Generated ${word_count}/${total_words} words...`);
+        // Update progress (live provider streams do not know their length up front)
+        this.showProgress(progress, total_words
+            ? `Generated ${word_count}/${total_words} words...`
+            : `Streaming... ${word_count} tokens received`);
 
         // Stream text in real-time
         this.showTextStream(text);
@@ -411,6 +503,92 @@ class OmniMediaAI {
         }
     }
 
+    handleBinaryFrame(buffer) {
+        // Frame layout: 36-byte task id, 4-byte big-endian sequence number, audio bytes
+        const taskId = new TextDecoder().decode(new Uint8Array(buffer, 0, 36));
+        const seq = new DataView(buffer).getUint32(36);
+        if (!this.acceptEvent(taskId, seq) || !this.audioStream) return;
+
+        const chunk = new Uint8Array(buffer, 40);
+        this.audioStream.chunks.push(chunk);
+        this.audioStream.bytes += chunk.byteLength;
+        this.appendAudioChunk(chunk);
+        this.showProgress(50, `Streaming audio... ${(this.audioStream.bytes / 1024).toFixed(0)} KB received`);
+    }
+
+    handleAudioStreamStart(data) {
+        if (data.task_id !== this.currentTask) return;
+
+        const mimeType = data.data.mime_type;
+        const audio = document.createElement('audio');
+        audio.controls = true;
+        audio.autoplay = true;
+        this.audioStream = { mimeType, chunks: [], bytes: 0, pending: [], sourceBuffer: null, mediaSource: null, audio };
+
+        // Play chunks as they arrive where MediaSource supports the format
+        if (window.MediaSource && MediaSource.isTypeSupported(mimeType)) {
+            const mediaSource = new MediaSource();
+            this.audioStream.mediaSource = mediaSource;
+            audio.src = URL.createObjectURL(mediaSource);
+            mediaSource.addEventListener('sourceopen', () => {
+                const sourceBuffer = mediaSource.addSourceBuffer(mimeType);
+                sourceBuffer.addEventListener('updateend', () => this.flushAudioChunks());
+                this.audioStream.sourceBuffer = sourceBuffer;
+                this.flushAudioChunks();
+            });
+        }
+
+        const outputContent = document.getElementById('outputContent');
+        document.getElementById('outputPlaceholder').style.display = 'none';
+        outputContent.classList.add('active');
+        outputContent.innerHTML = '<div class="media-container"></div>';
+        outputContent.querySelector('.media-container').appendChild(audio);
+        this.showProgress(10, 'Receiving audio stream...');
+    }
+
+    appendAudioChunk(chunk) {
+        if (!this.audioStream.mediaSource) return;
+        this.audioStream.pending.push(chunk);
+        this.flushAudioChunks();
+    }
+
+    flushAudioChunks() {
+        const stream = this.audioStream;
+        if (!stream || !stream.sourceBuffer || stream.sourceBuffer.updating) return;
+        if (stream.pending.length > 0) {
+            stream.sourceBuffer.appendBuffer(stream.pending.shift());
+        } else if (stream.ended && stream.mediaSource.readyState === 'open') {
+            stream.mediaSource.endOfStream();
+        }
+    }
+
+    handleAudioStreamEnd(data) {
+        if (data.task_id !== this.currentTask || !this.audioStream) return;
+
+        const stream = this.audioStream;
+        stream.ended = true;
+        if (stream.mediaSource) {
+            this.flushAudioChunks();
+        } else {
+            // No MediaSource support: play the assembled clip once it is complete
+            stream.audio.src = URL.createObjectURL(new Blob(stream.chunks, { type: stream.mimeType }));
+        }
+
+        const { ttfb_ms, bytes } = data.data;
+        this.showProgress(100, `Audio complete (${(bytes / 1024).toFixed(0)} KB, first audio after ${ttfb_ms} ms)`);
+        this.resetGenerateButton();
+        this.showStreamingIndicator(false);
+
+        this.addToHistory({
+            task_id: data.task_id,
+            prompt: document.getElementById('promptInput').value,
+            media_type: 'audio',
+            status: 'completed',
+            timestamp: new Date().toISOString(),
+            result_data: data.data.artifact
+        });
+    }
+
     showProgress(progress, message) {
         const progressContainer = document.getElementById('progressContainer');
         const progressFill = document.getElementById('progressFill');
@@ -490,6 +668,7 @@ class OmniMediaAI {
     }
 
     resetGenerateButton() {
+        this.taskActive = false;
         const generateBtn = document.getElementById('generateBtn');
         generateBtn.disabled = false;
         generateBtn.textContent = '🚀 Generate Media';
@@ -0,0 +1,33 @@
+"""
+Admin-token check shared by the real-time server and the orchestrator.
+
+Admin endpoints are enabled by setting OMNIMEDIA_ADMIN_TOKEN; callers send the
+token in the ``X-Admin-Token`` header. The comparison runs in constant time so
+response timing does not reveal how much of a guessed token was correct.
+"""
+
+import hmac
+import os
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+ADMIN_TOKEN = os.getenv("OMNIMEDIA_ADMIN_TOKEN")
+
+
+def is_admin(request: Request, token: Optional[str] = None) -> bool:
+    """True when the request carries the configured admin token"""
+    expected = token if token is not None else ADMIN_TOKEN
+    provided = request.headers.get("x-admin-token")
+    if not expected or provided is None:
+        return False
+    return hmac.compare_digest(provided.encode(), expected.encode())
+
+
+def require_admin(request: Request, token: Optional[str] = None):
+    """Reject admin requests unless the admin token is configured and matches"""
+    expected = token if token is not None else ADMIN_TOKEN
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not is_admin(request, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
@@ -0,0 +1,93 @@
+"""
+Local artifact store for generated media.
+
+Artifacts live under OMNIMEDIA_ARTIFACT_DIR (default: the working directory,
+which is where services have always written ``generated_*`` files). Writers
+stream into a temporary file and rename it into place on commit, so readers
+never see a half-written artifact.
+"""
+
+import os
+import shutil
+import uuid
+from typing import Iterator, Optional
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class ArtifactWriter:
+    """Incremental writer; call ``commit`` to publish or ``abort`` to discard"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        self.bytes_written = 0
+        self._file = open(self.tmp_path, "wb")
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self.bytes_written += len(chunk)
+
+    def commit(self) -> str:
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._file.closed:
+            return
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class ArtifactStore:
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.abspath(root or os.getenv("OMNIMEDIA_ARTIFACT_DIR", "."))
+
+    def path(self, name: str) -> str:
+        """Absolute path for ``name``, refusing anything outside the store"""
+        path = os.path.abspath(os.path.join(self.root, name))
+        if path != self.root and not path.startswith(self.root + os.sep):
+            raise ValueError(f"Artifact name escapes the store: {name!r}")
+        return path
+
+    def exists(self, name: str) -> bool:
+        return os.path.isfile(self.path(name))
+
+    def size(self, name: str) -> int:
+        return os.path.getsize(self.path(name))
+
+    def open_writer(self, name: str) -> ArtifactWriter:
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return ArtifactWriter(path)
+
+    def write_bytes(self, name: str, data: bytes) -> str:
+        with self.open_writer(name) as writer:
+            writer.write(data)
+        return writer.path
+
+    def iter_chunks(self, name: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self.path(name), "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def delete(self, name: str):
+        path = self.path(name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
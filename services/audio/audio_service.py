@@ -1,6 +1,91 @@
-// Add from elevenlabs import generate, save
+import os
+import time
+from typing import Optional
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from services.artifacts import ArtifactStore
+from services.metrics import StreamMetrics
+from services.providers import lazy_import, load_async, provider_lifespan
+from services.tracing import TracingMiddleware, tracer_from_env
+
+elevenlabs = lazy_import("elevenlabs")
+
+app = FastAPI(lifespan=provider_lifespan(elevenlabs))
+tracer = tracer_from_env("audio")
+app.add_middleware(TracingMiddleware, tracer=tracer)
+artifacts = ArtifactStore()
+stream_metrics = StreamMetrics()
+
+class AudioRequest(BaseModel):
+    prompt: str
+    task_id: str
+    subtask_id: str
+    audio_type: Optional[str] = "voice"
+    voice_id: Optional[str] = "Rachel"
+
 @app.post("/generate")
 async def generate_audio(request: AudioRequest):
-    audio = generate(text=request.prompt, voice=request.voice_id, api_key=os.getenv('ELEVENLABS_API_KEY'))
-    save(audio, f"generated_{request.subtask_id}.mp3")
-    return {"result": f"Audio saved as generated_{request.subtask_id}.mp3"}
+    await load_async(elevenlabs)
+    with tracer.span("provider.generate", kind="client", provider="elevenlabs", subtask_id=request.subtask_id):
+        audio = elevenlabs.generate(text=request.prompt, voice=request.voice_id, api_key=os.getenv('ELEVENLABS_API_KEY'))
+    filename = f"generated_{request.subtask_id}.mp3"
+    with tracer.span("artifact.persist", path=filename, bytes=len(audio)):
+        artifacts.write_bytes(filename, audio)
+    return {"task_id": request.task_id, "subtask_id": request.subtask_id, "result": f"Audio saved as {filename}", "artifact": filename}
+
+@app.post("/generate/stream")
+async def stream_audio(request: AudioRequest):
+    """Forward audio chunks as ElevenLabs produces them, tee'ing them into the artifact store"""
+    await load_async(elevenlabs)
+    filename = f"generated_{request.subtask_id}.mp3"
+    started = time.perf_counter()
+    chunks = await run_in_threadpool(
+        elevenlabs.generate, text=request.prompt, voice=request.voice_id,
+        api_key=os.getenv('ELEVENLABS_API_KEY'), stream=True,
+    )
+
+    async def body():
+        # Opened here, not in the handler, so a client that goes away before the body starts leaves no .part file
+        writer = artifacts.open_writer(filename)
+        # Explicit start/end rather than ``with``: the span must not be bound to the
+        # context of whichever task ends up iterating this generator
+        span = tracer.start_span("provider.stream", kind="client", attributes={"provider": "elevenlabs", "subtask_id": request.subtask_id})
+        ttfb = None
+        completed = False
+        try:
+            async for chunk in iterate_in_threadpool(iter(chunks)):
+                if not chunk:
+                    continue
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+                    span.set_attribute("ttfb_ms", round(ttfb * 1000, 3))
+                writer.write(chunk)
+                yield chunk
+            writer.commit()
+            completed = True
+        finally:
+            if not completed:
+                writer.abort()
+                span.status = "error"
+            span.set_attribute("bytes", writer.bytes_written)
+            span.end()
+            stream_metrics.record(
+                "elevenlabs",
+                ttfb_ms=ttfb * 1000 if ttfb is not None else None,
+                duration_ms=(time.perf_counter() - started) * 1000,
+                bytes=writer.bytes_written,
+            )
+
+    return StreamingResponse(body(), media_type="audio/mpeg", headers={"X-Artifact": filename})
+
+@app.get("/metrics/stream")
+async def get_stream_metrics():
+    return stream_metrics.snapshot()
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
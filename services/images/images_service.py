@@ -1,27 +1,51 @@
-// ... existing imports ...
-from stability_sdk import client
-import stability_sdk.interfaces.gooseai.generation.generation_pb2 as generation
 import os
+from typing import Optional
 
-app = FastAPI()
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from services.artifacts import ArtifactStore
+from services.providers import lazy_import, load_async, provider_lifespan
+from services.tracing import TracingMiddleware, tracer_from_env
 
-// ... existing model ...
+client = lazy_import("stability_sdk.client")
+generation = lazy_import("stability_sdk.interfaces.gooseai.generation.generation_pb2")
+
+app = FastAPI(lifespan=provider_lifespan(client, generation))
+tracer = tracer_from_env("images")
+app.add_middleware(TracingMiddleware, tracer=tracer)
+artifacts = ArtifactStore()
+
+class ImageRequest(BaseModel):
+    prompt: str
+    task_id: str
+    subtask_id: str
+    style: Optional[str] = "default"
+    resolution: Optional[str] = os.getenv("IMAGE_DEFAULT_RESOLUTION", "1024x1024")
+    quality: Optional[str] = "hd"
 
 @app.post("/generate")
 async def generate_image(request: ImageRequest):
+    await load_async(client, generation)
     stability_api = client.StabilityInference(key=os.getenv('STABILITY_API_KEY'))
-    responses = stability_api.generate(
-        prompt=request.prompt,
-        width=int(request.resolution.split('x')[0]),
-        height=int(request.resolution.split('x')[1]),
-        # Add style, quality params
-    )
-    for resp in responses:
-        for artifact in resp.artifacts:
-            if artifact.type == generation.ARTIFACT_IMAGE:
-                with open(f"generated_{request.subtask_id}.png", "wb") as f:
-                    f.write(artifact.binary)
-                return {"task_id": request.task_id, "subtask_id": request.subtask_id, "result": f"Image saved as generated_{request.subtask_id}.png"}
-    raise HTTPException(status_code=500, detail="Image generation failed")
+    width, height = (int(x) for x in request.resolution.split('x'))
+    with tracer.span("provider.generate", kind="client", provider="stability", subtask_id=request.subtask_id):
+        responses = stability_api.generate(
+            prompt=request.prompt,
+            width=width,
+            height=height,
+            # Add style, quality params
+        )
+        image = next(
+            (artifact.binary for resp in responses for artifact in resp.artifacts if artifact.type == generation.ARTIFACT_IMAGE),
+            None,
+        )
+    if image is None:
+        raise HTTPException(status_code=500, detail="Image generation failed")
+    filename = f"generated_{request.subtask_id}.png"
+    with tracer.span("artifact.persist", path=filename, bytes=len(image)):
+        artifacts.write_bytes(filename, image)
+    return {"task_id": request.task_id, "subtask_id": request.subtask_id, "result": f"Image saved as {filename}", "artifact": filename}
 
-// ... existing health ...
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
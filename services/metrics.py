@@ -0,0 +1,63 @@
+"""
+In-process streaming metrics.
+
+Keeps a bounded window of recent samples per key (provider, model, ...) and
+reports counts and latency percentiles, cheap enough to record on every
+streamed response.
+"""
+
+import threading
+from collections import defaultdict, deque
+from typing import Any, Dict, Iterable, Optional
+
+
+def percentile(values: Iterable[float], pct: float) -> Optional[float]:
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class StreamMetrics:
+    """Per-key windows of named measurements, e.g. ``ttfb_ms`` or ``tokens_per_sec``"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: Dict[str, Dict[str, deque]] = defaultdict(dict)
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, key: str, **measurements: Optional[float]):
+        with self._lock:
+            self._counts[key] += 1
+            series = self._samples[key]
+            for name, value in measurements.items():
+                if value is None:
+                    continue
+                if name not in series:
+                    series[name] = deque(maxlen=self.window)
+                series[name].append(value)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._samples.pop(key, None)
+            self._counts.pop(key, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                key: {
+                    "count": self._counts[key],
+                    **{
+                        name: {
+                            "p50": percentile(values, 50),
+                            "p95": percentile(values, 95),
+                            "p99": percentile(values, 99),
+                            "mean": sum(values) / len(values),
+                        }
+                        for name, values in series.items()
+                    },
+                }
+                for key, series in ((key, self._samples.get(key, {})) for key in self._counts)
+            }
@@ -0,0 +1,128 @@
+"""
+Subtask dispatch from the orchestrator to the media services.
+
+When ``start.py`` mounts a service in the same process it registers the
+service's app here, and subtasks skip the network stack:
+
+- ``direct`` mode calls the ``/generate`` endpoint function with a request
+  model built straight from the payload (no JSON, no ASGI, no TCP)
+- ``asgi`` mode sends the request through ``httpx.ASGITransport``, which keeps
+  the service's middleware but still avoids sockets and uvicorn
+
+Services that are not registered are called over HTTP with one pooled
+``httpx.AsyncClient``. OMNIMEDIA_DISPATCH_MODE picks ``direct`` (default),
+``asgi`` or ``http`` (ignore local registrations).
+"""
+
+import asyncio
+import inspect
+import os
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+from services.orchestrator.utils import SERVICE_URLS
+
+DISPATCH_MODES = ("direct", "asgi", "http")
+
+
+class DispatchError(Exception):
+    def __init__(self, service: str, status_code: int, detail: Any):
+        super().__init__(f"{service} returned {status_code}: {detail}")
+        self.service = service
+        self.status_code = status_code
+        self.detail = detail
+
+
+def find_endpoint(app: FastAPI, path: str = "/generate", method: str = "POST") -> Tuple[Callable, type]:
+    """Return the endpoint function for ``method path`` and the pydantic model it takes"""
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path == path and method in route.methods:
+            for param in inspect.signature(route.endpoint).parameters.values():
+                if inspect.isclass(param.annotation) and issubclass(param.annotation, BaseModel):
+                    return route.endpoint, param.annotation
+            raise ValueError(f"{method} {path} does not take a request model")
+    raise ValueError(f"No {method} {path} route on {app!r}")
+
+
+class ServiceDispatcher:
+    def __init__(self, service_urls: Optional[Dict[str, str]] = None, mode: Optional[str] = None,
+                 http_transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.service_urls = dict(service_urls or SERVICE_URLS)
+        self.mode = (mode or os.getenv("OMNIMEDIA_DISPATCH_MODE", "direct")).lower()
+        if self.mode not in DISPATCH_MODES:
+            raise ValueError(f"Unknown dispatch mode {self.mode!r}; expected one of {', '.join(DISPATCH_MODES)}")
+        self.local_apps: Dict[str, FastAPI] = {}
+        self._endpoints: Dict[str, Tuple[Callable, type]] = {}
+        self._asgi_clients: Dict[str, httpx.AsyncClient] = {}
+        self._http_transport = http_transport
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def register_local(self, service: str, app: FastAPI):
+        """Mark ``service`` as running in this process"""
+        self.local_apps[service] = app
+        self._endpoints[service] = find_endpoint(app)
+
+    def mode_for(self, service: str) -> str:
+        if self.mode == "http" or service not in self.local_apps:
+            return "http"
+        return self.mode
+
+    async def dispatch(self, service: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Run ``/generate`` on ``service`` and return its response body"""
+        mode = self.mode_for(service)
+        if mode == "direct":
+            return await self._dispatch_direct(service, payload)
+        if mode == "asgi":
+            client = self._asgi_client(service)
+        else:
+            client = self._pooled_client()
+        url = "/generate" if mode == "asgi" else f"{self.service_urls[service]}/generate"
+        try:
+            response = await client.post(url, json=payload, headers=headers)
+        except httpx.HTTPError as e:
+            raise DispatchError(service, 503, str(e)) from e
+        if response.status_code >= 400:
+            raise DispatchError(service, response.status_code, response.text)
+        return response.json()
+
+    async def _dispatch_direct(self, service: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        endpoint, model = self._endpoints[service]
+        try:
+            if inspect.iscoroutinefunction(endpoint):
+                return await endpoint(model(**payload))
+            return await asyncio.to_thread(endpoint, model(**payload))
+        except HTTPException as e:
+            raise DispatchError(service, e.status_code, e.detail) from e
+        except Exception as e:
+            raise DispatchError(service, 500, str(e)) from e
+
+    def _asgi_client(self, service: str) -> httpx.AsyncClient:
+        if service not in self._asgi_clients:
+            transport = httpx.ASGITransport(app=self.local_apps[service])
+            self._asgi_clients[service] = httpx.AsyncClient(transport=transport, base_url=f"http://{service}", timeout=None)
+        return self._asgi_clients[service]
+
+    def _pooled_client(self) -> httpx.AsyncClient:
+        # Pooled connections belong to the loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._http_client is None or self._http_loop is not loop:
+            self._http_client = httpx.AsyncClient(
+                transport=self._http_transport,
+                timeout=httpx.Timeout(None, connect=10.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+            self._http_loop = loop
+        return self._http_client
+
+    async def aclose(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+        for client in self._asgi_clients.values():
+            await client.aclose()
+        self._asgi_clients.clear()
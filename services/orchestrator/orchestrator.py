@@ -1,29 +1,103 @@
-// ... existing imports ...
-from celery import Celery
-from fastapi import BackgroundTasks
-import httpx
-
-app = FastAPI()
-celery = Celery('orchestrator', broker='redis://localhost:6379/0')  // Use Redis for queuing
-
-// ... existing tasks dict and models ...
-
-@celery.task
-def process_media(task_id, prompt, output_format, options):
-    # Real orchestration: Call specialized services async
-    async with httpx.AsyncClient() as client:
-        if output_format == 'image':
-            response = client.post('http://localhost:8001/generate', json={'prompt': prompt, ...})  // Call images service
-        # Similarly for video, audio, text
-        # Combine results and update tasks[task_id]
-    tasks[task_id]['status'] = 'completed'
-    tasks[task_id]['result'] = response.json()  // Real result
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from services.admin import require_admin
+from services.artifacts import ArtifactStore
+from services.orchestrator.package import PackageAssembler
+from services.orchestrator.tasks import (completed_subtasks, dispatcher, history, package_entry, process_media,
+                                         record_task, scheduler, tasks, tenants, tracer)
+from services.tenancy import QuotaExceeded
+from services.tracing import TracingMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    history.start()
+    yield
+    await dispatcher.aclose()
+    history.close()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(TracingMiddleware, tracer=tracer)
+package_assembler = PackageAssembler(ArtifactStore())
+
+class MediaRequest(BaseModel):
+    prompt: str
+    output_format: str
+    options: Optional[Dict[str, List[str]]] = {}
 
 @app.post("/generate-media")
-async def generate_media(request: MediaRequest, background_tasks: BackgroundTasks):
+async def generate_media(request: MediaRequest, background_tasks: BackgroundTasks, http_request: Request):
+    tenant = tenants.resolve(http_request.headers.get("x-api-key"))
+    try:
+        scheduler.admit(tenant)
+    except QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
     task_id = str(uuid.uuid4())
-    tasks[task_id] = {"status": "in-progress", "progress": 0}
-    background_tasks.add_task(process_media, task_id, request.prompt, request.output_format, request.options)
+    tasks[task_id] = {"task_id": task_id, "status": "in-progress", "progress": 0, "result": None, "subtasks": {},
+                      "prompt": request.prompt, "output_format": request.output_format,
+                      "owner": tenant.tenant_id, "created_at": time.time()}
+    record_task(tasks[task_id])
+    background_tasks.add_task(process_media, task_id, request.prompt, request.output_format, request.options,
+                              enqueued_at=time.time(), trace_context=tracer.current_context(), tenant=tenant)
     return {"task_id": task_id}
 
-// ... existing endpoints ...
+@app.get("/task-status/{task_id}")
+def task_status(task_id: str):
+    if task_id in tasks:
+        return tasks[task_id]
+    stored = history.get_task(task_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return stored
+
+@app.get("/tasks")
+def list_tasks(request: Request, status: Optional[str] = None, output_format: Optional[str] = None,
+               limit: int = 50, cursor: Optional[str] = None):
+    api_key = request.headers.get("x-api-key")
+    if not api_key:
+        # Callers without a key would all share the anonymous owner and see each other's prompts
+        raise HTTPException(status_code=401, detail="An X-API-Key header is required to list tasks")
+    owner = tenants.resolve(api_key).tenant_id
+    try:
+        items, next_cursor = history.list_tasks(owner, status, output_format, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"tasks": items, "next_cursor": next_cursor}
+
+@app.get("/package/{task_id}")
+async def download_package(task_id: str):
+    """Stream a ZIP of the task's artifacts, adding entries as subtasks finish"""
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    task = tasks[task_id]
+
+    async def entries():
+        async for subtask_id, subtask in completed_subtasks(task_id):
+            yield package_entry(subtask_id, subtask)
+
+    manifest = {"task_id": task_id, "prompt": task["prompt"], "output_format": task["output_format"]}
+    return StreamingResponse(
+        package_assembler.stream(entries(), manifest),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="omnimedia-{task_id}.zip"'},
+    )
+
+@app.get("/usage")
+async def usage(request: Request):
+    tenant = tenants.resolve(request.headers.get("x-api-key"))
+    return {"tenant_id": tenant.tenant_id, **scheduler.usage_for(tenant)}
+
+@app.get("/admin/tenants")
+async def tenant_usage(request: Request):
+    require_admin(request)
+    return {"capacity": scheduler.capacity, "running": scheduler.running, "tenants": scheduler.usage()}
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
@@ -0,0 +1,135 @@
+"""
+Streaming ZIP assembly for ``mixed/package`` outputs.
+
+Entries are written as subtasks complete and each one is streamed from its
+artifact file in fixed-size chunks, so the response starts before the
+package is complete. Memory use is bounded by the chunk size no matter how
+large the artifacts are. Already-compressed media is stored as-is; text and
+the manifest are deflated. ``manifest.json`` is written last, once every
+entry (and failure) is known. Artifacts that cannot be opened on this host
+are recorded in the manifest as ``missing`` instead of being added.
+
+The archive is written for an unseekable stream (sizes and CRCs follow each
+entry in data descriptors) with ZIP64 extensions, so multi-GB packages work.
+"""
+
+import asyncio
+import json
+import os
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional
+
+from services.artifacts import ArtifactStore
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Formats that are already compressed; deflating them again only burns CPU
+STORED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".mp4", ".m4s", ".webm", ".mov", ".mp3", ".aac", ".ogg", ".opus", ".zip"}
+
+
+@dataclass
+class PackageEntry:
+    name: str
+    service: str
+    subtask_id: str
+    artifact: Optional[str] = None  # artifact store name to stream from
+    data: Optional[bytes] = None  # small inline content, e.g. generated text
+    error: Optional[str] = None  # failed subtasks are only recorded in the manifest
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class _ChunkSink:
+    """Write-only, unseekable target for ZipFile whose output is drained as it is produced"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class PackageAssembler:
+    def __init__(self, store: ArtifactStore, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.store = store
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def compression_for(name: str) -> int:
+        return zipfile.ZIP_STORED if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+    async def stream(self, entries: AsyncIterator[PackageEntry], manifest: Optional[Dict[str, Any]] = None) -> AsyncIterator[bytes]:
+        """Yield the ZIP archive for ``entries`` as it is built"""
+        sink = _ChunkSink()
+        archive = zipfile.ZipFile(sink, mode="w")
+        records = []
+        async for entry in entries:
+            record = {"name": entry.name, "service": entry.service, "subtask_id": entry.subtask_id, **entry.metadata}
+            if entry.error is not None:
+                record.update(status="failed", error=entry.error)
+                records.append(record)
+                continue
+            if entry.artifact is None and entry.data is None:
+                record.update(status="skipped")  # nothing local to package, e.g. a provider-hosted URL
+                records.append(record)
+                continue
+            source = None
+            if entry.data is None:
+                # Open before writing the entry header: an artifact that is not on this host (e.g. the
+                # service runs in another container without a shared volume) is left out, not truncated.
+                # ValueError: the name from the service response points outside the artifact store.
+                try:
+                    source = await asyncio.to_thread(open, self.store.path(entry.artifact), "rb")
+                except (OSError, ValueError) as e:
+                    record.update(status="missing", error=f"{type(e).__name__}: {e}")
+                    records.append(record)
+                    continue
+            info = zipfile.ZipInfo(entry.name, date_time=time.localtime()[:6])
+            info.compress_type = self.compression_for(entry.name)
+            error = None
+            with archive.open(info, mode="w", force_zip64=True) as member:
+                if source is None:
+                    member.write(entry.data)
+                else:
+                    try:
+                        async for chunk in self._read_chunks(source):
+                            member.write(chunk)
+                            if data := sink.drain():
+                                yield data
+                    except OSError as e:
+                        # The header is already sent; close the entry with what was read so the archive stays valid
+                        error = f"{type(e).__name__}: {e}"
+            if data := sink.drain():  # remaining data and the entry's data descriptor
+                yield data
+            record.update(status="completed" if error is None else "failed", size=info.file_size, crc32=f"{info.CRC:08x}",
+                          compression="stored" if info.compress_type == zipfile.ZIP_STORED else "deflated")
+            if error is not None:
+                record["error"] = error
+            records.append(record)
+
+        manifest_info = zipfile.ZipInfo("manifest.json", date_time=time.localtime()[:6])
+        manifest_info.compress_type = zipfile.ZIP_DEFLATED
+        archive.writestr(manifest_info, json.dumps({**(manifest or {}), "entries": records}, indent=2))
+        archive.close()
+        yield sink.drain()
+
+    async def _read_chunks(self, f: BinaryIO) -> AsyncIterator[bytes]:
+        # File reads happen off the event loop, one chunk at a time; closes ``f`` when done
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            f.close()
@@ -1 +1,107 @@
-# This file can be used for task management functions
\ No newline at end of file
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from services.orchestrator.dispatch import DispatchError, ServiceDispatcher
+from services.orchestrator.package import PackageEntry
+from services.orchestrator.utils import plan_subtasks
+from services.task_history import TaskHistory
+from services.tenancy import FairScheduler, Tenant, TenantRegistry
+from services.tracing import SpanContext, tracer_from_env
+
+tracer = tracer_from_env("orchestrator")
+dispatcher = ServiceDispatcher()
+
+# In-memory task store, keyed by task_id
+tasks: Dict[str, Dict[str, Any]] = {}
+
+# Tenants (by X-API-Key) share dispatch capacity through a weighted fair queue
+tenants = TenantRegistry.from_env()
+scheduler = FairScheduler.from_env()
+
+# Persistent history of task states for listings (results stay in memory)
+history = TaskHistory.from_env()
+
+def record_task(task: Dict[str, Any]):
+    history.record(task["task_id"], task["owner"], task["prompt"], task["output_format"], task["status"],
+                   task["created_at"], completed_at=task.get("completed_at"),
+                   metadata={"subtasks": {s_id: s["status"] for s_id, s in task["subtasks"].items()}})
+
+# Notified whenever a task's subtasks change, for consumers of partial results
+_task_updates: Dict[str, asyncio.Condition] = {}
+
+def task_updates(task_id: str) -> asyncio.Condition:
+    if task_id not in _task_updates:
+        _task_updates[task_id] = asyncio.Condition()
+    return _task_updates[task_id]
+
+async def notify_task_update(task_id: str, final: bool = False):
+    condition = _task_updates.pop(task_id, None) if final else _task_updates.get(task_id)
+    if condition is not None:
+        async with condition:
+            condition.notify_all()
+
+async def completed_subtasks(task_id: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (subtask_id, subtask) pairs in completion order until the task finishes"""
+    task = tasks[task_id]
+    seen = 0
+    while True:
+        finished = list(task["subtasks"].items())
+        for item in finished[seen:]:
+            yield item
+        seen = len(finished)
+        if task["status"] != "in-progress":
+            return
+        # Only created while the task runs; its final notification removes it
+        condition = task_updates(task_id)
+        async with condition:
+            await condition.wait_for(lambda: len(task["subtasks"]) > seen or task["status"] != "in-progress")
+
+def package_entry(subtask_id: str, subtask: Dict[str, Any]) -> PackageEntry:
+    """Describe how a finished subtask appears in a mixed/package download"""
+    service = subtask["service"]
+    if subtask["status"] != "completed":
+        return PackageEntry(f"{service}/{subtask_id}", service, subtask_id, error=subtask.get("error"))
+    if subtask.get("artifact"):
+        return PackageEntry(f"{service}/{os.path.basename(subtask['artifact'])}", service, subtask_id, artifact=subtask["artifact"])
+    if service == "text":
+        return PackageEntry(f"text/{subtask_id}.txt", service, subtask_id, data=str(subtask["result"]).encode())
+    return PackageEntry(f"{service}/{subtask_id}", service, subtask_id, metadata={"result": subtask.get("result")})
+
+async def dispatch_subtask(task_id: str, service: str, payload: Dict[str, Any]):
+    mode = dispatcher.mode_for(service)
+    with tracer.span(f"dispatch {service}", kind="client", mode=mode, subtask_id=payload["subtask_id"]) as span:
+        try:
+            response = await dispatcher.dispatch(service, payload, headers=tracer.inject())
+            result = {"status": "completed", "result": response.get("result"), "artifact": response.get("artifact")}
+        except DispatchError as e:
+            span.set_error(e)
+            span.set_attribute("http.status_code", e.status_code)
+            result = {"status": "failed", "error": str(e)}
+    task = tasks[task_id]
+    task["subtasks"][payload["subtask_id"]] = {"service": service, **result}
+    task["progress"] = int(len(task["subtasks"]) / task["subtask_count"] * 100)
+    await notify_task_update(task_id)
+
+async def process_media(task_id: str, prompt: str, output_format: str, options: Dict[str, List[str]],
+                        enqueued_at: Optional[float] = None, trace_context: Optional[SpanContext] = None,
+                        tenant: Optional[Tenant] = None):
+    """Fan a media request out to the specialised services and collect the results"""
+    subtasks = plan_subtasks(task_id, prompt, output_format, options)
+    task = tasks[task_id]
+    task["subtask_count"] = len(subtasks)
+    # The tenant's turn in the fair queue covers the whole fan-out, costing one unit per subtask
+    async with scheduler.slot(tenant or tenants.resolve(None), max(1, len(subtasks))):
+        started = time.time()
+        if enqueued_at is not None:
+            tracer.record_span("orchestrator.queue_wait", enqueued_at, started, parent=trace_context, task_id=task_id)
+        with tracer.span("orchestrator.process_media", parent=trace_context, task_id=task_id, output_format=output_format):
+            await asyncio.gather(*(dispatch_subtask(task_id, service, payload) for service, payload in subtasks))
+    results = task["subtasks"].values()
+    task["status"] = "failed" if not subtasks or any(r["status"] == "failed" for r in results) else "completed"
+    task["progress"] = 100
+    task["result"] = {r_id: r.get("result") for r_id, r in task["subtasks"].items() if r["status"] == "completed"}
+    task["completed_at"] = time.time()
+    record_task(task)
+    await notify_task_update(task_id, final=True)
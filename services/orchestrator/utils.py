@@ -1 +1,36 @@
-# This file can be used for utility functions
\ No newline at end of file
+import os
+from typing import Any, Dict, List, Tuple
+
+SERVICE_URLS = {
+    "images": os.getenv("IMAGES_SERVICE_URL", "http://localhost:8001"),
+    "videos": os.getenv("VIDEOS_SERVICE_URL", "http://localhost:8002"),
+    "audio": os.getenv("AUDIO_SERVICE_URL", "http://localhost:8003"),
+    "text": os.getenv("TEXT_SERVICE_URL", "http://localhost:8004"),
+}
+
+# Which services each output format fans out to
+FORMAT_SERVICES = {
+    "image": ["images"],
+    "video": ["videos"],
+    "audio": ["audio"],
+    "text": ["text"],
+    "mixed/package": ["images", "videos", "audio", "text"],
+}
+
+def first_option(options: Dict[str, List[str]], key: str, default: str) -> str:
+    values = (options or {}).get(key) or []
+    return values[0] if values else default
+
+def plan_subtasks(task_id: str, prompt: str, output_format: str, options: Dict[str, List[str]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Split a media request into (service, payload) subtasks"""
+    style = first_option(options, "style", "default")
+    quality = first_option(options, "quality", "hd")
+    subtasks = []
+    for service in FORMAT_SERVICES.get(output_format, []):
+        payload = {"prompt": prompt, "task_id": task_id, "subtask_id": f"{task_id}-{service}"}
+        if service in ("images", "videos"):
+            payload["quality"] = quality
+        if service == "images":
+            payload["style"] = style
+        subtasks.append((service, payload))
+    return subtasks
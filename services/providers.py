@@ -0,0 +1,101 @@
+"""
+Lazy loading for provider SDKs.
+
+Provider SDKs (stability_sdk with protobuf/gRPC, openai, replicate,
+elevenlabs) are expensive to import, so services reference them through
+``lazy_import`` proxies that import on first attribute access. Async routes
+``await load_async(...)`` before touching an SDK, so a pending import runs
+in a worker thread instead of blocking the event loop. The
+OMNIMEDIA_PROVIDER_WARMUP setting controls whether a service also loads them
+at start-up:
+
+- ``lazy`` (default): import on first use
+- ``background``: import in a worker thread once the app has started
+- ``eager``: import before the app starts serving
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from types import ModuleType
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access"""
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self) -> ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self.__dict__["_module"] = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        return f"<LazyModule {self._name!r} {'loaded' if self.loaded else 'not loaded'}>"
+
+
+_lazy_modules: Dict[str, LazyModule] = {}
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a shared lazy proxy for ``name``"""
+    if name not in _lazy_modules:
+        _lazy_modules[name] = LazyModule(name)
+    return _lazy_modules[name]
+
+
+def warm_up(modules: Iterable[LazyModule]) -> Dict[str, float]:
+    """Import the given modules now and return the seconds each one took"""
+    timings = {}
+    for module in modules:
+        started = time.perf_counter()
+        try:
+            module.load()
+        except ImportError as e:
+            logger.warning("Provider SDK %s failed to load: %s", module._name, e)
+            continue
+        timings[module._name] = time.perf_counter() - started
+    return timings
+
+
+async def load_async(*modules):
+    """Import any lazy ``modules`` not yet loaded, in a worker thread; anything else is left alone"""
+    for module in modules:
+        if isinstance(module, LazyModule) and not module.loaded:
+            await asyncio.to_thread(module.load)
+
+
+def provider_lifespan(*modules: LazyModule, mode: Optional[str] = None):
+    """Build a FastAPI lifespan that warms up ``modules`` per OMNIMEDIA_PROVIDER_WARMUP"""
+    @asynccontextmanager
+    async def lifespan(app):
+        warmup_mode = (mode or os.getenv("OMNIMEDIA_PROVIDER_WARMUP", "lazy")).lower()
+        background = None
+        if warmup_mode == "eager":
+            await asyncio.to_thread(warm_up, modules)
+        elif warmup_mode == "background":
+            background = asyncio.create_task(asyncio.to_thread(warm_up, modules))
+        yield
+        if background is not None and not background.done():
+            # Imports cannot be interrupted; let the thread finish on its own
+            background.cancel()
+    return lifespan
@@ -0,0 +1,260 @@
+"""
+Latency-aware routing across interchangeable providers.
+
+A ``ProviderRouter`` holds the options that can serve a request (provider,
+model, relative cost and an async callable). For each option it keeps an
+exponentially weighted moving average (EWMA) of latency and of success rate,
+plus a window of recent latencies. A call goes to the option with the lowest
+expected latency (EWMA latency divided by EWMA success rate) among the
+healthy options within the request's cost budget. Options with no samples
+yet are tried first. An option whose success rate has fallen below
+``min_success`` is skipped, except for one probe request every
+``probe_interval`` seconds; one successful probe makes it healthy again.
+
+With hedging on, a call still running after the option's p95 latency gets a
+duplicate on the next-best option, or on the same option if it is the only
+one. The first success wins and the other call is cancelled. A failed call
+falls through to the next option. ``max_cost`` caps the summed cost of
+every attempt made for one request, including hedges and fallbacks.
+
+Streams are not hedged: the caller picks from ``ranked`` and reports the
+outcome with ``record_stream``, so streamed traffic still updates health
+(and consumes probes) like any other call.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional
+
+from services.metrics import percentile
+
+
+class ProviderOption(NamedTuple):
+    provider: str
+    model: str
+    cost: float
+    call: Callable[..., Awaitable[Any]]
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+
+class RouteResult(NamedTuple):
+    result: Any
+    option: ProviderOption
+    latency: float  # seconds from the first attempt until the winning result
+    attempts: int
+    hedged: bool
+
+
+class NoProviderAvailable(Exception):
+    def __init__(self, message: str, errors: Optional[List[BaseException]] = None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+class _OptionStats:
+    __slots__ = ("latency", "success", "samples", "recent", "inflight", "calls", "failures", "hedges",
+                 "hedge_wins", "last_probe", "streams", "ttft")
+
+    def __init__(self, window: int):
+        self.latency = 0.0
+        self.success = 1.0
+        self.samples = 0
+        self.recent: Deque[float] = deque(maxlen=window)
+        self.inflight = 0
+        self.calls = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.last_probe = float("-inf")
+        self.streams = 0
+        self.ttft: Optional[float] = None
+
+
+class ProviderRouter:
+    def __init__(self, options: List[ProviderOption], alpha: float = 0.2, min_success: float = 0.5,
+                 probe_interval: float = 30.0, hedge: bool = True, hedge_percentile: float = 95,
+                 hedge_min_samples: int = 20, window: int = 200, clock: Callable[[], float] = time.monotonic):
+        if not options:
+            raise ValueError("ProviderRouter needs at least one option")
+        self.options = list(options)
+        self.alpha = alpha
+        self.min_success = min_success
+        self.probe_interval = probe_interval
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.clock = clock
+        self._stats: Dict[str, _OptionStats] = {option.key: _OptionStats(window) for option in self.options}
+
+    @classmethod
+    def from_env(cls, options: List[ProviderOption]) -> "ProviderRouter":
+        return cls(
+            options,
+            hedge=os.getenv("OMNIMEDIA_ROUTER_HEDGE", "1").lower() not in ("0", "false", "no"),
+            hedge_percentile=float(os.getenv("OMNIMEDIA_ROUTER_HEDGE_PERCENTILE", "95")),
+            min_success=float(os.getenv("OMNIMEDIA_ROUTER_MIN_SUCCESS", "0.5")),
+        )
+
+    def _expected_latency(self, option: ProviderOption) -> float:
+        stats = self._stats[option.key]
+        if not stats.samples:
+            return float("inf") if stats.failures else 0.0  # unmeasured: try it
+        return stats.latency / max(stats.success, 0.05)
+
+    def ranked(self, max_cost: Optional[float] = None) -> List[ProviderOption]:
+        """Options within budget, best first; unhealthy ones only when due a probe or nothing else is left"""
+        affordable = [o for o in self.options if max_cost is None or o.cost <= max_cost]
+        order = sorted(affordable, key=lambda o: (self._expected_latency(o), o.cost))
+        healthy = [o for o in order if self._stats[o.key].success >= self.min_success]
+        if len(healthy) == len(order):
+            return order
+        now = self.clock()
+        for option in order:
+            stats = self._stats[option.key]
+            if stats.success < self.min_success and now - stats.last_probe >= self.probe_interval:
+                stats.last_probe = now
+                return [option] + [o for o in order if o is not option]
+        if healthy:
+            return healthy
+        return sorted(order, key=lambda o: -self._stats[o.key].success)
+
+    def hedge_delay(self, option: ProviderOption) -> Optional[float]:
+        """How long to wait on ``option`` before sending a duplicate, or None if there is too little data"""
+        recent = self._stats[option.key].recent
+        if not self.hedge or len(recent) < self.hedge_min_samples:
+            return None
+        return percentile(recent, self.hedge_percentile)
+
+    def _record(self, option: ProviderOption, latency: Optional[float]):
+        stats = self._stats[option.key]
+        if latency is None:
+            stats.failures += 1
+            stats.success += self.alpha * (0.0 - stats.success)
+            return
+        stats.latency = latency if not stats.samples else stats.latency + self.alpha * (latency - stats.latency)
+        self._record_success(stats)
+        stats.samples += 1
+        stats.recent.append(latency)
+
+    def _record_success(self, stats: _OptionStats):
+        # A success restores an unhealthy option straight away rather than after several more probes
+        stats.success = max(stats.success + self.alpha * (1.0 - stats.success), self.min_success)
+
+    def record_stream(self, option: ProviderOption, ttft: Optional[float]):
+        """Record a stream served outside ``call``: its time to first token, or None if it failed.
+
+        Streams count toward the option's health, but their time to first token is kept apart
+        from the whole-response latency that ``call`` ranks by.
+        """
+        stats = self._stats[option.key]
+        stats.calls += 1
+        stats.streams += 1
+        if ttft is None:
+            self._record(option, None)
+            return
+        self._record_success(stats)
+        stats.ttft = ttft if stats.ttft is None else stats.ttft + self.alpha * (ttft - stats.ttft)
+
+    def _record_cancelled(self, option: ProviderOption, elapsed: float):
+        # The call would have taken at least ``elapsed``; only let that pull the average up
+        stats = self._stats[option.key]
+        if stats.samples and elapsed > stats.latency:
+            stats.latency += self.alpha * (elapsed - stats.latency)
+
+    async def call(self, *args, max_cost: Optional[float] = None, **kwargs) -> RouteResult:
+        """Run ``option.call(*args, **kwargs)`` on the best option, hedging and falling back as configured"""
+        queue = self.ranked(max_cost)
+        if not queue:
+            raise NoProviderAvailable(f"No provider within a cost budget of {max_cost}")
+        pending: Dict[asyncio.Future, tuple] = {}
+        errors: List[BaseException] = []
+        spent = 0.0
+        attempts = 0
+        hedged = False
+
+        def affordable(option: ProviderOption) -> bool:
+            return max_cost is None or spent + option.cost <= max_cost
+
+        def launch(option: ProviderOption, hedge: bool = False):
+            nonlocal spent, attempts
+            spent += option.cost
+            attempts += 1
+            stats = self._stats[option.key]
+            stats.calls += 1
+            stats.inflight += 1
+            stats.hedges += hedge
+            pending[asyncio.ensure_future(option.call(*args, **kwargs))] = (option, self.clock(), hedge)
+
+        started = self.clock()
+        current = queue.pop(0)
+        launch(current)
+        current_launched = started
+        try:
+            while pending:
+                timeout = None
+                if not hedged and len(pending) == 1:
+                    delay = self.hedge_delay(current)
+                    if delay is not None:
+                        timeout = max(0.0, current_launched + delay - self.clock())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    target = next((o for o in queue + [current] if affordable(o)), None)
+                    if target is not None:
+                        if target is not current:
+                            queue.remove(target)
+                        launch(target, hedge=True)
+                    continue
+                for future in done:
+                    option, launched, hedge = pending.pop(future)
+                    self._stats[option.key].inflight -= 1
+                    error = future.exception()
+                    if error is None:
+                        now = self.clock()
+                        self._record(option, now - launched)
+                        self._stats[option.key].hedge_wins += hedge
+                        return RouteResult(future.result(), option, now - started, attempts, hedged)
+                    self._record(option, None)
+                    errors.append(error)
+                if not pending:
+                    fallback = next((o for o in queue if affordable(o)), None)
+                    if fallback is None:
+                        break
+                    queue.remove(fallback)
+                    current, current_launched = fallback, self.clock()
+                    launch(current)
+            raise NoProviderAvailable(f"All providers failed: {errors[-1]!r}", errors)
+        finally:
+            now = self.clock()
+            for future, (option, launched, _) in pending.items():
+                future.cancel()
+                self._stats[option.key].inflight -= 1
+                self._record_cancelled(option, now - launched)
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = {}
+        for option in self.options:
+            stats = self._stats[option.key]
+            recent = [latency * 1000 for latency in stats.recent]
+            snapshot[option.key] = {
+                "provider": option.provider,
+                "model": option.model,
+                "cost": option.cost,
+                "healthy": stats.success >= self.min_success,
+                "ewma_latency_ms": round(stats.latency * 1000, 3) if stats.samples else None,
+                "success_rate": round(stats.success, 4),
+                "inflight": stats.inflight,
+                "calls": stats.calls,
+                "failures": stats.failures,
+                "hedges": stats.hedges,
+                "hedge_wins": stats.hedge_wins,
+                "streams": stats.streams,
+                "ewma_ttft_ms": round(stats.ttft * 1000, 3) if stats.ttft is not None else None,
+                "latency_ms": {"p50": percentile(recent, 50), "p95": percentile(recent, 95), "p99": percentile(recent, 99)},
+            }
+        return snapshot
@@ -0,0 +1,237 @@
+"""
+Persistent task history in embedded SQLite.
+
+Task state changes are recorded with ``TaskHistory.record``, which only
+stores the row in an in-memory pending map (later changes to the same task
+replace earlier ones). A writer thread flushes the pending rows in a single
+transaction every ``flush_interval`` seconds, or as soon as ``batch_size``
+rows are waiting, so request handlers never touch the database.
+
+The database runs in WAL mode, so listings read concurrently with the
+writer. Every index ends in ``(created_at, task_id)``, which lets listings
+filtered by owner, status or media type walk one index newest-first and
+paginate by keyset (the cursor is the last row's sort key) instead of
+OFFSET, keeping deep pages as cheap as the first.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS_OWNER = "anonymous"
+MAX_PAGE_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    media_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    completed_at REAL,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_created ON tasks (created_at, task_id);
+CREATE INDEX IF NOT EXISTS tasks_owner ON tasks (owner, created_at, task_id);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, created_at, task_id);
+CREATE INDEX IF NOT EXISTS tasks_media_type ON tasks (media_type, created_at, task_id);
+"""
+
+UPSERT = """
+INSERT INTO tasks (task_id, owner, prompt, media_type, status, created_at, updated_at, completed_at, metadata)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (task_id) DO UPDATE SET
+    status = excluded.status, updated_at = excluded.updated_at,
+    completed_at = excluded.completed_at, metadata = excluded.metadata
+"""
+
+COLUMNS = ("task_id", "owner", "prompt", "media_type", "status", "created_at", "updated_at", "completed_at", "metadata")
+
+
+def owner_from_api_key(api_key: Optional[str]) -> str:
+    """Stable owner id for an API key; the key itself is never stored"""
+    if not api_key:
+        return ANONYMOUS_OWNER
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def encode_cursor(created_at: float, task_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, task_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(created_at), str(task_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class TaskHistory:
+    def __init__(self, path: str, batch_size: int = 1000, flush_interval: float = 0.2):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, tuple] = {}
+        self._cond = threading.Condition()
+        self._recorded = 0  # sequence number of the latest record() call
+        self._written = 0  # sequence number covered by the latest committed batch
+        self._flush_requested = False
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+        self._readers = threading.local()
+        self._reader_conns: List[sqlite3.Connection] = []  # every thread's reader, so close() can close them
+        self._readers_lock = threading.Lock()
+        self.stats = {"batches": 0, "rows": 0, "errors": 0}
+
+    @classmethod
+    def from_env(cls, default_path: str = "task_history.db") -> "TaskHistory":
+        return cls(
+            os.getenv("OMNIMEDIA_TASK_DB", default_path),
+            batch_size=int(os.getenv("OMNIMEDIA_TASK_DB_BATCH_SIZE", "1000")),
+            flush_interval=float(os.getenv("OMNIMEDIA_TASK_DB_FLUSH_MS", "200")) / 1000,
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; a crash loses at most the last batches
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def start(self):
+        if self._thread is not None:
+            return
+        conn = self._connect()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, args=(conn,), name="task-history-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, task_id: str, owner: str, prompt: str, media_type: str, status: str, created_at: float,
+               completed_at: Optional[float] = None, metadata: Optional[Dict[str, Any]] = None):
+        """Queue the current state of a task; returns immediately"""
+        row = (task_id, owner, prompt, media_type, status, created_at, time.time(), completed_at,
+               json.dumps(metadata, default=str) if metadata else None)
+        with self._cond:
+            self._pending[task_id] = row
+            self._recorded += 1
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything recorded so far is committed"""
+        with self._cond:
+            target = self._recorded
+            if self._thread is None:
+                return self._written >= target
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._written >= target, timeout)
+
+    def close(self):
+        with self._readers_lock:
+            readers, self._reader_conns = self._reader_conns, []
+            self._readers = threading.local()
+        for conn in readers:
+            conn.close()
+        if self._thread is None:
+            return
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, conn: sqlite3.Connection):
+        try:
+            while True:
+                with self._cond:
+                    while not self._pending and not self._closing:
+                        self._cond.wait()
+                    # Linger so bursts of updates share one transaction
+                    deadline = time.monotonic() + self.flush_interval
+                    while len(self._pending) < self.batch_size and not (self._closing or self._flush_requested):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    batch, self._pending = self._pending, {}
+                    sequence = self._recorded
+                    self._flush_requested = False
+                    closing = self._closing
+                if batch:
+                    self._write(conn, list(batch.values()))
+                with self._cond:
+                    self._written = sequence
+                    self._cond.notify_all()
+                    if closing and not self._pending:
+                        return
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, rows: List[tuple]):
+        try:
+            conn.execute("BEGIN")
+            conn.executemany(UPSERT, rows)
+            conn.execute("COMMIT")
+            self.stats["batches"] += 1
+            self.stats["rows"] += len(rows)
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self.stats["errors"] += 1
+            logger.error("Dropped %d task history rows: %s", len(rows), e)
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            with self._readers_lock:
+                self._readers.conn = conn
+                self._reader_conns.append(conn)
+        return conn
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._reader().execute(f"SELECT {', '.join(COLUMNS)} FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    @staticmethod
+    def _to_dict(row: tuple) -> Dict[str, Any]:
+        item = dict(zip(COLUMNS, row))
+        item["metadata"] = json.loads(item["metadata"]) if item["metadata"] else {}
+        return item
+
+    def list_tasks(self, owner: Optional[str] = None, status: Optional[str] = None, media_type: Optional[str] = None,
+                   limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Newest-first page of tasks and the cursor for the next page (None on the last page)"""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        clauses, params = [], []
+        for column, value in (("owner", owner), ("status", status), ("media_type", media_type)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if cursor is not None:
+            clauses.append("(created_at, task_id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # Walk the most selective filter's index; the planner has no statistics to choose by
+        index = "tasks_owner" if owner else "tasks_media_type" if media_type else "tasks_status" if status else "tasks_created"
+        rows = self._reader().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM tasks INDEXED BY {index} {where} "
+            "ORDER BY created_at DESC, task_id DESC LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+        items = [self._to_dict(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(items[-1]["created_at"], items[-1]["task_id"]) if len(rows) > limit else None
+        return items, next_cursor
@@ -0,0 +1,322 @@
+"""
+Tenant quotas and weighted fair queuing for generation work.
+
+Tenants are identified by API key. Keys listed in ``OMNIMEDIA_TENANTS``
+(JSON, ``{"<api key>": {"tenant_id": "acme", "weight": 2, ...}}``) get their
+configured quotas. Any other key is its own tenant, named by a digest of the
+key, with the quotas from ``OMNIMEDIA_TENANT_DEFAULTS``; requests without a
+key share the ``anonymous`` tenant. Unconfigured tenants are also members of
+the ``unconfigured`` pool (``OMNIMEDIA_UNCONFIGURED_QUOTA``), an aggregate
+rate limit over all of them, so minting new keys does not buy more
+throughput while each key still queues on its own.
+
+``FairScheduler.admit`` enforces the per-tenant request rate (token bucket),
+the pool rate and the queue depth when a request arrives. Admitted work then
+waits in ``FairScheduler.slot`` for one of ``capacity`` global slots. Waiting
+work is ordered by start-time fair queuing: each item is tagged with a
+virtual start time ``max(V, tenant's last finish tag)`` and finish tag
+``start + cost / weight``, and free slots go to the smallest start tag among
+tenants that are under their own concurrency limit. A tenant that floods the
+queue only pushes its own tags further out, so other tenants keep a bounded
+wait. Only backlogged tenants are kept in the dispatch heap. The state of
+tenants with nothing queued or running is dropped every ``prune_every``
+completions, and least recently used idle state is dropped whenever more
+than ``max_tenants`` are tracked. Usage counters of configured tenants are
+kept; those of pool members go with their state.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from services.metrics import StreamMetrics
+from services.task_history import owner_from_api_key
+
+
+@dataclass(frozen=True)
+class QuotaPool:
+    """An aggregate request rate shared by a group of tenants"""
+    name: str
+    rate_per_minute: float = 600.0
+    burst: int = 100
+
+
+@dataclass(frozen=True)
+class Tenant:
+    tenant_id: str
+    weight: float = 1.0  # share of capacity relative to other backlogged tenants
+    max_concurrency: int = 4
+    rate_per_minute: float = 60.0
+    burst: int = 10
+    max_queued: int = 100
+    pool: Optional[QuotaPool] = None
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, tenant_id: str, reason: str, retry_after: float):
+        super().__init__(f"Tenant {tenant_id} exceeded its {reason} quota")
+        self.tenant_id = tenant_id
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TenantRegistry:
+    def __init__(self, tenants: Optional[Dict[str, Tenant]] = None, defaults: Optional[Dict[str, Any]] = None,
+                 unconfigured_pool: Optional[QuotaPool] = None):
+        self._by_key = dict(tenants or {})
+        self.defaults = defaults or {}
+        self.unconfigured_pool = unconfigured_pool or QuotaPool("unconfigured")
+
+    @classmethod
+    def from_env(cls) -> "TenantRegistry":
+        names = {f.name for f in fields(Tenant)} - {"pool"}
+        defaults = json.loads(os.getenv("OMNIMEDIA_TENANT_DEFAULTS", "{}"))
+        tenants = {}
+        for api_key, config in json.loads(os.getenv("OMNIMEDIA_TENANTS", "{}")).items():
+            config = {**defaults, **config}
+            tenants[api_key] = Tenant(**{k: v for k, v in config.items() if k in names})
+        pool = QuotaPool("unconfigured", **json.loads(os.getenv("OMNIMEDIA_UNCONFIGURED_QUOTA", "{}")))
+        return cls(tenants, {k: v for k, v in defaults.items() if k in names and k != "tenant_id"}, pool)
+
+    def resolve(self, api_key: Optional[str]) -> Tenant:
+        """The configured tenant for ``api_key``, else a tenant of its own in the unconfigured pool"""
+        tenant = self._by_key.get(api_key) if api_key else None
+        if tenant is None:
+            tenant = Tenant(owner_from_api_key(api_key), pool=self.unconfigured_pool, **self.defaults)
+        return tenant
+
+
+class TokenBucket:
+    def __init__(self, rate_per_sec: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_sec
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def try_acquire(self, amount: float = 1.0) -> float:
+        """Take ``amount`` tokens; returns 0 on success, else seconds until they are available"""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def refund(self, amount: float = 1.0):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def full(self) -> bool:
+        return self.tokens + (self.clock() - self.updated) * self.rate >= self.capacity
+
+
+class _Waiter:
+    __slots__ = ("start_tag", "cost", "enqueued_at", "future")
+
+    def __init__(self, start_tag: float, cost: float, enqueued_at: float, future: asyncio.Future):
+        self.start_tag = start_tag
+        self.cost = cost
+        self.enqueued_at = enqueued_at
+        self.future = future
+
+
+class _TenantState:
+    def __init__(self, tenant: Tenant, clock: Callable[[], float]):
+        self.tenant = tenant
+        self.bucket = TokenBucket(tenant.rate_per_minute / 60, tenant.burst, clock)
+        self.waiting: Deque[_Waiter] = deque()
+        self.running = 0
+        self.last_finish_tag = 0.0
+        self.scheduled = False  # has an entry in FairScheduler._ready
+
+
+def _new_counters() -> Dict[str, Any]:
+    return {"admitted": 0, "rejected_rate": 0, "rejected_pool": 0, "rejected_queue": 0, "started": 0,
+            "completed": 0, "cost_units": 0.0, "busy_seconds": 0.0}
+
+
+class FairScheduler:
+    def __init__(self, capacity: int = 16, clock: Callable[[], float] = time.monotonic, prune_every: int = 256,
+                 max_tenants: int = 10_000):
+        self.capacity = capacity
+        self.clock = clock
+        self.running = 0
+        self.prune_every = prune_every
+        self.max_tenants = max_tenants
+        self._virtual_time = 0.0
+        self._tenants: "OrderedDict[str, _TenantState]" = OrderedDict()  # least recently used first
+        self._pools: Dict[str, TokenBucket] = {}
+        # Backlogged tenants under their concurrency limit, keyed by the start tag of their oldest waiter
+        self._ready: List[Tuple[float, int, _TenantState]] = []
+        self._sequence = itertools.count()
+        self._releases = 0
+        # Usage outlives the scheduling state of idle tenants, which is dropped by _prune
+        self._configs: Dict[str, Tenant] = {}
+        self._counters: Dict[str, Dict[str, Any]] = {}
+        self.metrics = StreamMetrics()
+
+    def _state(self, tenant: Tenant) -> _TenantState:
+        state = self._tenants.get(tenant.tenant_id)
+        if state is None:
+            if len(self._tenants) >= self.max_tenants:
+                self._evict_idle()
+            state = self._tenants[tenant.tenant_id] = _TenantState(tenant, self.clock)
+            self._counters.setdefault(tenant.tenant_id, _new_counters())
+        else:
+            self._tenants.move_to_end(tenant.tenant_id)
+            if state.tenant != tenant:  # quotas changed; keep queue and usage
+                state.tenant = tenant
+                state.bucket = TokenBucket(tenant.rate_per_minute / 60, tenant.burst, self.clock)
+                self._schedule(state)
+        self._configs[tenant.tenant_id] = tenant
+        return state
+
+    def _pool_bucket(self, pool: QuotaPool) -> TokenBucket:
+        bucket = self._pools.get(pool.name)
+        if bucket is None or (bucket.rate, bucket.capacity) != (pool.rate_per_minute / 60, max(1.0, pool.burst)):
+            bucket = self._pools[pool.name] = TokenBucket(pool.rate_per_minute / 60, pool.burst, self.clock)
+        return bucket
+
+    def admit(self, tenant: Tenant):
+        """Apply the tenant's rate and queue-depth quotas to a new request, raising QuotaExceeded"""
+        state = self._state(tenant)
+        counters = self._counters[tenant.tenant_id]
+        if len(state.waiting) >= tenant.max_queued:
+            counters["rejected_queue"] += 1
+            raise QuotaExceeded(tenant.tenant_id, "queue", retry_after=1.0)
+        retry_after = state.bucket.try_acquire()
+        if retry_after:
+            counters["rejected_rate"] += 1
+            raise QuotaExceeded(tenant.tenant_id, "rate", retry_after=retry_after)
+        if tenant.pool is not None:
+            # Checked second, so a tenant that is over its own rate cannot drain the pool for the others
+            retry_after = self._pool_bucket(tenant.pool).try_acquire()
+            if retry_after:
+                state.bucket.refund()
+                counters["rejected_pool"] += 1
+                raise QuotaExceeded(tenant.tenant_id, f"{tenant.pool.name} pool rate", retry_after=retry_after)
+        counters["admitted"] += 1
+
+    @asynccontextmanager
+    async def slot(self, tenant: Tenant, cost: float = 1.0):
+        """Wait for a fair share of capacity; yields the time spent queued (seconds)"""
+        state = self._state(tenant)
+        counters = self._counters[tenant.tenant_id]
+        start_tag = max(self._virtual_time, state.last_finish_tag)
+        state.last_finish_tag = start_tag + cost / tenant.weight
+        waiter = _Waiter(start_tag, cost, self.clock(), asyncio.get_running_loop().create_future())
+        state.waiting.append(waiter)
+        self._schedule(state)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(state)  # granted just as the waiter was cancelled
+            elif waiter in state.waiting:
+                state.waiting.remove(waiter)
+            raise
+        started = self.clock()
+        queue_wait = started - waiter.enqueued_at
+        counters["started"] += 1
+        counters["cost_units"] += cost
+        try:
+            yield queue_wait
+        finally:
+            run_time = self.clock() - started
+            counters["completed"] += 1
+            counters["busy_seconds"] += run_time
+            self.metrics.record(tenant.tenant_id, queue_wait_ms=queue_wait * 1000, run_ms=run_time * 1000)
+            self._release(state)
+
+    def _schedule(self, state: _TenantState):
+        if not state.scheduled and state.waiting and state.running < state.tenant.max_concurrency:
+            state.scheduled = True
+            heapq.heappush(self._ready, (state.waiting[0].start_tag, next(self._sequence), state))
+
+    def _release(self, state: _TenantState):
+        state.running -= 1
+        self.running -= 1
+        self._schedule(state)
+        self._dispatch()
+        self._releases += 1
+        if self._releases % self.prune_every == 0:
+            self._prune()
+
+    def _dispatch(self):
+        while self.running < self.capacity and self._ready:
+            start_tag, _, state = heapq.heappop(self._ready)
+            state.scheduled = False
+            while state.waiting and state.waiting[0].future.cancelled():
+                state.waiting.popleft()
+            if not state.waiting or state.running >= state.tenant.max_concurrency:
+                continue
+            if state.waiting[0].start_tag != start_tag:  # the head was cancelled since it was queued
+                self._schedule(state)
+                continue
+            waiter = state.waiting.popleft()
+            self._virtual_time = max(self._virtual_time, waiter.start_tag)
+            state.running += 1
+            self.running += 1
+            waiter.future.set_result(None)
+            self._schedule(state)
+
+    def _prune(self):
+        """Drop the scheduling state of tenants with nothing queued or running and a full token bucket"""
+        if not self.running and not self._ready:
+            # Idle: nobody is owed service, so every tenant may start afresh at the current virtual time
+            self._virtual_time = max([self._virtual_time] + [s.last_finish_tag for s in self._tenants.values()])
+        for tenant_id, state in list(self._tenants.items()):
+            if self._idle(state) and state.last_finish_tag <= self._virtual_time and state.bucket.full():
+                self._drop(tenant_id)
+
+    def _evict_idle(self):
+        """Drop least recently used idle tenants to make room for one more under ``max_tenants``"""
+        for tenant_id, state in list(self._tenants.items()):
+            if len(self._tenants) < self.max_tenants:
+                return
+            if self._idle(state):
+                self._drop(tenant_id)
+
+    @staticmethod
+    def _idle(state: _TenantState) -> bool:
+        return not state.waiting and not state.running and not state.scheduled
+
+    def _drop(self, tenant_id: str):
+        state = self._tenants.pop(tenant_id)
+        if state.tenant.pool is not None:
+            # Pool members are ad hoc keys; keeping their usage would grow without bound
+            self._counters.pop(tenant_id, None)
+            self._configs.pop(tenant_id, None)
+            self.metrics.discard(tenant_id)
+
+    def usage(self) -> Dict[str, Any]:
+        """Per-tenant counters, current load and queue-wait/run-time percentiles"""
+        latencies = self.metrics.snapshot()
+        usage = {}
+        for tenant_id, counters in self._counters.items():
+            tenant, state = self._configs[tenant_id], self._tenants.get(tenant_id)
+            usage[tenant_id] = {
+                "weight": tenant.weight,
+                "max_concurrency": tenant.max_concurrency,
+                "running": state.running if state else 0,
+                "queued": len(state.waiting) if state else 0,
+                **{k: round(v, 3) if isinstance(v, float) else v for k, v in counters.items()},
+                **{k: v for k, v in latencies.get(tenant_id, {}).items() if k != "count"},
+            }
+        return usage
+
+    def usage_for(self, tenant: Tenant) -> Dict[str, Any]:
+        return self.usage().get(tenant.tenant_id, {})
+
+    @classmethod
+    def from_env(cls, default_capacity: int = 16) -> "FairScheduler":
+        return cls(int(os.getenv("OMNIMEDIA_MAX_CONCURRENT_GENERATIONS", str(default_capacity))))
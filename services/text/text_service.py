@@ -1,6 +1,181 @@
-// Add from openai import OpenAI
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from services.metrics import StreamMetrics
+from services.providers import lazy_import, load_async, provider_lifespan
+from services.routing import NoProviderAvailable, ProviderOption, ProviderRouter
+from services.tracing import TracingMiddleware, tracer_from_env
+
+openai = lazy_import("openai")
+
+provider_warmup = provider_lifespan(openai)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with provider_warmup(app):
+        yield
+        for client in list(clients.values()):
+            await client.close()
+        clients.clear()
+
+app = FastAPI(lifespan=lifespan)
+tracer = tracer_from_env("text")
+app.add_middleware(TracingMiddleware, tracer=tracer)
+stream_metrics = StreamMetrics()
+
+TEXT_MODEL = os.getenv("TEXT_MODEL", "gpt-4")
+
+class TextRequest(BaseModel):
+    prompt: str
+    task_id: str
+    subtask_id: str
+    max_tokens: int = int(os.getenv("TEXT_MAX_TOKENS", "1000"))
+    temperature: float = float(os.getenv("TEXT_DEFAULT_TEMPERATURE", "0.7"))
+    max_cost: Optional[float] = None
+
+def async_openai_client(config: Optional[Dict[str, Any]] = None):
+    # OPENAI_BASE_URL also points the client at compatible gateways or local stubs
+    config = config or {}
+    return openai.AsyncOpenAI(
+        api_key=os.getenv(config.get("api_key_env", "OPENAI_API_KEY")),
+        base_url=config.get("base_url") or os.getenv('OPENAI_BASE_URL'),
+    )
+
+clients: Dict[str, Any] = {}  # one client, and so one connection pool, per option key
+
+async def client_for(key: str, config: Dict[str, Any]):
+    await load_async(openai)
+    client = clients.get(key)
+    if client is None:
+        client = clients[key] = async_openai_client(config)
+    return client
+
+def provider_option(config: Dict[str, Any]) -> ProviderOption:
+    """A chat completion option on any OpenAI-compatible endpoint"""
+    provider, model = config.get("provider", "openai"), config.get("model", TEXT_MODEL)
+
+    async def complete(request: TextRequest) -> str:
+        client = await client_for(option.key, config)
+        with tracer.span("provider.generate", kind="client", provider=provider, model=model, subtask_id=request.subtask_id):
+            response = await client.chat.completions.create(model=model, messages=[{"role": "user", "content": request.prompt}], max_tokens=request.max_tokens, temperature=request.temperature)
+        return response.choices[0].message.content
+
+    option = ProviderOption(provider, model, float(config.get("cost", 1.0)), complete)
+    return option
+
+# TEXT_PROVIDERS lists the interchangeable options as JSON, e.g.
+# [{"provider": "openai", "model": "gpt-4", "cost": 30},
+#  {"provider": "anthropic", "model": "claude-3-haiku-20240307", "cost": 1,
+#   "base_url": "https://api.anthropic.com/v1/", "api_key_env": "ANTHROPIC_API_KEY"}]
+provider_configs = json.loads(os.getenv("TEXT_PROVIDERS", "null")) or [{"provider": "openai", "model": TEXT_MODEL}]
+router = ProviderRouter.from_env([provider_option(config) for config in provider_configs])
+configs_by_key = {option.key: config for option, config in zip(router.options, provider_configs)}
+
+def sse_event(data) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
 @app.post("/generate")
 async def generate_text(request: TextRequest):
-    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-    response = client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": request.prompt}], max_tokens=request.max_tokens, temperature=request.temperature)
-    return {"result": response.choices[0].message.content}
+    try:
+        routed = await router.call(request, max_cost=request.max_cost)
+    except NoProviderAvailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {
+        "task_id": request.task_id,
+        "subtask_id": request.subtask_id,
+        "result": routed.result,
+        "provider": routed.option.provider,
+        "model": routed.option.model,
+        "hedged": routed.hedged,
+    }
+
+@app.post("/generate/stream")
+async def stream_text(request: TextRequest):
+    """Pass provider tokens through as server-sent events while they are generated"""
+    started = time.perf_counter()
+    # Streams are routed to the best option but not hedged; a failure to start falls through to the next one
+    ranked = router.ranked(request.max_cost)
+    if not ranked:
+        raise HTTPException(status_code=503, detail=f"No provider within a cost budget of {request.max_cost}")
+    errors = []
+    for option in ranked:
+        try:
+            client = await client_for(option.key, configs_by_key[option.key])
+            stream = await client.chat.completions.create(
+                model=option.model,
+                messages=[{"role": "user", "content": request.prompt}],
+                max_tokens=request.max_tokens,
+                temperature=request.temperature,
+                stream=True,
+            )
+            break
+        except Exception as e:
+            router.record_stream(option, None)
+            errors.append(e)
+    else:
+        raise HTTPException(status_code=503, detail=f"All providers failed: {errors[-1]!r}")
+
+    async def events():
+        span = tracer.start_span("provider.stream", kind="client", attributes={"provider": option.provider, "model": option.model, "subtask_id": request.subtask_id})
+        ttft = None
+        tokens = 0
+        completed = failed = False
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if not token:
+                    continue
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                tokens += 1
+                yield sse_event({"token": token, "index": tokens - 1})
+            completed = True
+        except Exception:
+            failed = True  # the provider broke off; a client disconnect is not the provider's fault
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            generating = elapsed - ttft if ttft is not None else 0
+            stats = {
+                "model": option.model,
+                "tokens": tokens,
+                "ttft_ms": round(ttft * 1000, 3) if ttft is not None else None,
+                "tokens_per_sec": round(tokens / generating, 2) if generating > 0 else None,
+                "duration_ms": round(elapsed * 1000, 3),
+            }
+            for key, value in stats.items():
+                span.set_attribute(key, value)
+            if not completed:
+                span.status = "error"
+            span.end()
+            stream_metrics.record(option.model, ttft_ms=stats["ttft_ms"], tokens_per_sec=stats["tokens_per_sec"], duration_ms=stats["duration_ms"])
+            if completed:
+                router.record_stream(option, ttft if ttft is not None else elapsed)
+            elif failed:
+                router.record_stream(option, None)
+            await stream.close()
+        yield sse_event({"done": True, **stats})
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/metrics/stream")
+async def get_stream_metrics():
+    return stream_metrics.snapshot()
+
+@app.get("/metrics/routing")
+async def get_routing_metrics():
+    return router.stats()
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
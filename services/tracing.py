@@ -0,0 +1,275 @@
+"""
+Request tracing shared by the orchestrator and media services.
+
+Trace context travels between services in the W3C ``traceparent`` header.
+Spans are kept in a context variable so nested ``tracer.span(...)`` blocks
+and outgoing httpx calls pick up their parent automatically. Sampling is
+decided once at the root of a trace and followed by every downstream span.
+"""
+
+import json
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("omnimedia_current_span", default=None)
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @classmethod
+    def from_traceparent(cls, header: Optional[str]) -> Optional["SpanContext"]:
+        if not header:
+            return None
+        match = _TRACEPARENT_RE.match(header.strip().lower())
+        if not match:
+            return None
+        version, trace_id, span_id, flags = match.groups()
+        if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+            return None
+        return cls(trace_id, span_id, bool(int(flags, 16) & 0x01))
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, context: SpanContext, parent_id: Optional[str],
+                 kind: str = "internal", attributes: Optional[Dict[str, Any]] = None, start_time: Optional[float] = None):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes) if attributes else {}
+        self.start_time = start_time if start_time is not None else time.time()
+        self.end_time: Optional[float] = None
+        self.status = "ok"
+
+    @property
+    def recording(self) -> bool:
+        return self.context.sampled
+
+    def set_attribute(self, key: str, value: Any):
+        if self.recording:
+            self.attributes[key] = value
+
+    def set_error(self, error: BaseException):
+        self.status = "error"
+        self.set_attribute("error", f"{type(error).__name__}: {error}")
+
+    def end(self, end_time: Optional[float] = None):
+        if self.end_time is not None:
+            return
+        self.end_time = end_time if end_time is not None else time.time()
+        if self.recording:
+            self.tracer.exporter.export([self])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "service": self.tracer.service_name,
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": round(((self.end_time or time.time()) - self.start_time) * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """Base exporter; subclasses ship finished spans somewhere"""
+
+    def export(self, spans: Iterable[Span]):
+        raise NotImplementedError
+
+    def shutdown(self):
+        pass
+
+
+class NoopSpanExporter(SpanExporter):
+    def export(self, spans: Iterable[Span]):
+        pass
+
+
+class ConsoleSpanExporter(SpanExporter):
+    """Write one JSON object per span to a stream (stdout by default)"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def export(self, spans: Iterable[Span]):
+        lines = "".join(json.dumps(span.to_dict()) + "\n" for span in spans)
+        with self._lock:
+            self.stream.write(lines)
+            self.stream.flush()
+
+
+class FileSpanExporter(SpanExporter):
+    """Append spans as JSON lines to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1)
+
+    def export(self, spans: Iterable[Span]):
+        lines = "".join(json.dumps(span.to_dict()) + "\n" for span in spans)
+        with self._lock:
+            self._file.write(lines)
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    def __init__(self, service_name: str, exporter: Optional[SpanExporter] = None, sample_rate: float = 1.0):
+        self.service_name = service_name
+        self.exporter = exporter or NoopSpanExporter()
+        self.sample_rate = sample_rate if exporter is not None else 0.0
+
+    def _new_context(self, parent: Optional[SpanContext]) -> SpanContext:
+        if parent is not None:
+            return SpanContext(parent.trace_id, secrets.token_hex(8), parent.sampled)
+        sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        return SpanContext(secrets.token_hex(16), secrets.token_hex(8), sampled)
+
+    def start_span(self, name: str, parent: Optional[SpanContext] = None, kind: str = "internal",
+                   attributes: Optional[Dict[str, Any]] = None, start_time: Optional[float] = None) -> Span:
+        """Start a span; the parent defaults to the current span. Callers must end it."""
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current is not None else None
+        context = self._new_context(parent)
+        return Span(self, name, context, parent.span_id if parent else None, kind,
+                    attributes if context.sampled else None, start_time)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", parent: Optional[SpanContext] = None, **attributes):
+        """Run a block inside a child span of the current one"""
+        span = self.start_span(name, parent=parent, kind=kind, attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def record_span(self, name: str, start_time: float, end_time: float,
+                    parent: Optional[SpanContext] = None, **attributes) -> Span:
+        """Record a span after the fact, e.g. time spent waiting in a queue"""
+        span = self.start_span(name, parent=parent, attributes=attributes, start_time=start_time)
+        span.end(end_time)
+        return span
+
+    @staticmethod
+    def current_context() -> Optional[SpanContext]:
+        span = _current_span.get()
+        return span.context if span is not None else None
+
+    def inject(self, headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Add the current trace context to outgoing request headers"""
+        headers = dict(headers or {})
+        context = self.current_context()
+        if context is not None:
+            headers[TRACEPARENT_HEADER] = context.to_traceparent()
+        return headers
+
+    @staticmethod
+    def extract(headers: Iterable[Tuple[bytes, bytes]]) -> Optional[SpanContext]:
+        """Read the trace context from raw ASGI headers"""
+        for key, value in headers:
+            if key.lower() == TRACEPARENT_HEADER.encode():
+                return SpanContext.from_traceparent(value.decode("latin-1"))
+        return None
+
+    def shutdown(self):
+        self.exporter.shutdown()
+
+
+class TracingMiddleware:
+    """ASGI middleware that opens a server span per request.
+
+    The span ends when the response body is complete, so background tasks
+    scheduled by the handler become children of the request without
+    inflating its duration.
+    """
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        parent = Tracer.extract(scope.get("headers", []))
+        span = self.tracer.start_span(
+            f"{scope['method']} {scope['path']}",
+            parent=parent,
+            kind="server",
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+        )
+        token = _current_span.set(span)
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.status = "error"
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                span.end()
+
+        try:
+            await self.app(scope, receive, traced_send)
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+
+def tracer_from_env(service_name: str) -> Tracer:
+    """Build a tracer from OMNIMEDIA_TRACE_* settings.
+
+    OMNIMEDIA_TRACE_EXPORTER is ``none`` (default), ``console`` or ``file``;
+    OMNIMEDIA_TRACE_FILE sets the file path and OMNIMEDIA_TRACE_SAMPLE_RATE
+    the fraction of new traces that are recorded.
+    """
+    exporter_name = os.getenv("OMNIMEDIA_TRACE_EXPORTER", "none").lower()
+    sample_rate = float(os.getenv("OMNIMEDIA_TRACE_SAMPLE_RATE", "0.1"))
+    if exporter_name == "console":
+        exporter: Optional[SpanExporter] = ConsoleSpanExporter()
+    elif exporter_name == "file":
+        exporter = FileSpanExporter(os.getenv("OMNIMEDIA_TRACE_FILE", "traces.jsonl"))
+    else:
+        exporter = None
+    return Tracer(service_name, exporter, sample_rate)
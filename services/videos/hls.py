@@ -0,0 +1,231 @@
+"""
+Background HLS (fMP4) segmenting for finished videos.
+
+Each job runs one local ffmpeg process that encodes every rendition in a
+single pass and writes ``hls/<name>/master.m3u8`` plus one event playlist
+per rendition into the artifact store. Playlists are updated as segments
+complete, so a job is playable as soon as each rendition has its first
+segment; clients do not wait for the whole encode. A semaphore bounds how
+many ffmpeg processes run at once, and only the newest ``max_jobs`` jobs
+keep their status (running jobs are never dropped).
+"""
+
+import asyncio
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from services.artifacts import ArtifactStore
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+
+@dataclass(frozen=True)
+class Rendition:
+    name: str
+    height: int
+    video_bitrate: int  # kbit/s
+
+
+DEFAULT_RENDITIONS = [
+    Rendition("360p", 360, 800),
+    Rendition("720p", 720, 2800),
+    Rendition("1080p", 1080, 5000),
+]
+
+
+def renditions_from_env() -> List[Rendition]:
+    """Parse VIDEO_HLS_RENDITIONS, e.g. ``360:800,720:2800`` (height:kbit/s)"""
+    configured = os.getenv("VIDEO_HLS_RENDITIONS")
+    if not configured:
+        return list(DEFAULT_RENDITIONS)
+    renditions = []
+    for item in configured.split(","):
+        height, bitrate = item.strip().split(":")
+        renditions.append(Rendition(f"{height}p", int(height), int(bitrate)))
+    return renditions
+
+
+@dataclass
+class HLSJob:
+    name: str
+    status: str = "queued"  # queued -> segmenting -> completed | failed
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    playable_at: Optional[float] = None
+    completed_at: Optional[float] = None
+    playable: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    finished: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def to_dict(self) -> Dict:
+        def since_submit(ts):
+            return round((ts - self.submitted_at) * 1000, 1) if ts else None
+        return {
+            "name": self.name,
+            "status": self.status,
+            "error": self.error,
+            "playable": self.playable.is_set(),
+            "queue_wait_ms": since_submit(self.started_at),
+            "time_to_playable_ms": since_submit(self.playable_at),
+            "time_to_complete_ms": since_submit(self.completed_at),
+        }
+
+
+class HLSSegmenter:
+    def __init__(self, store: ArtifactStore, max_workers: int = 2, renditions: Optional[List[Rendition]] = None,
+                 segment_seconds: int = 2, ffmpeg: str = FFMPEG_BINARY, poll_interval: float = 0.1,
+                 max_jobs: int = 1000):
+        self.store = store
+        self.renditions = sorted(renditions or DEFAULT_RENDITIONS, key=lambda r: r.height)
+        self.segment_seconds = segment_seconds
+        self.ffmpeg = ffmpeg
+        self.poll_interval = poll_interval
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.jobs: Dict[str, HLSJob] = {}  # oldest first
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks = set()
+
+    @property
+    def available(self) -> bool:
+        """Whether the ffmpeg executable can be found"""
+        return shutil.which(self.ffmpeg) is not None
+
+    @staticmethod
+    def output_dir(name: str) -> str:
+        return f"hls/{name}"
+
+    def master_playlist(self, name: str) -> str:
+        return f"{self.output_dir(name)}/master.m3u8"
+
+    def submit(self, name: str, source: str) -> HLSJob:
+        """Queue ``source`` (an artifact name) for segmenting"""
+        if self._slots is None:
+            # Created on first use so it binds to the serving event loop
+            self._slots = asyncio.Semaphore(self.max_workers)
+        job = HLSJob(name)
+        self.jobs.pop(name, None)
+        self.jobs[name] = job
+        self._forget_finished()
+        task = asyncio.create_task(self._run(job, source))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def _forget_finished(self):
+        """Drop the oldest finished jobs beyond ``max_jobs``; their files stay in the artifact store"""
+        excess = len(self.jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for name in [name for name, job in self.jobs.items() if job.finished.is_set()][:excess]:
+            del self.jobs[name]
+
+    async def wait_until_playable(self, name: str, timeout: Optional[float] = None) -> HLSJob:
+        job = self.jobs[name]
+        waiters = [asyncio.ensure_future(job.playable.wait()), asyncio.ensure_future(job.finished.wait())]
+        try:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        return job
+
+    def build_command(self, source_path: str, output_dir: str) -> List[str]:
+        count = len(self.renditions)
+        splits = "".join(f"[s{i}]" for i in range(count))
+        scales = ";".join(f"[s{i}]scale=-2:{r.height}[v{i}]" for i, r in enumerate(self.renditions))
+        command = [
+            self.ffmpeg, "-v", "error", "-y", "-i", source_path,
+            "-filter_complex", f"[0:v]split={count}{splits};{scales}",
+        ]
+        for i, rendition in enumerate(self.renditions):
+            command += [
+                "-map", f"[v{i}]", f"-c:v:{i}", "libx264",
+                f"-b:v:{i}", f"{rendition.video_bitrate}k",
+                f"-maxrate:v:{i}", f"{int(rendition.video_bitrate * 1.07)}k",
+                f"-bufsize:v:{i}", f"{int(rendition.video_bitrate * 1.5)}k",
+            ]
+        command += [
+            "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            # Keyframe on every segment boundary so renditions switch cleanly
+            "-sc_threshold", "0", "-force_key_frames", f"expr:gte(t,n_forced*{self.segment_seconds})",
+            # Generated clips carry no audio track
+            "-an",
+            "-f", "hls", "-hls_time", str(self.segment_seconds), "-hls_playlist_type", "event",
+            "-hls_segment_type", "fmp4", "-hls_flags", "independent_segments+temp_file",
+            "-hls_fmp4_init_filename", "init.mp4",
+            "-hls_segment_filename", os.path.join(output_dir, "%v", "seg_%05d.m4s"),
+            "-master_pl_name", "master.m3u8",
+            "-var_stream_map", " ".join(f"v:{i},name:{r.name}" for i, r in enumerate(self.renditions)),
+            os.path.join(output_dir, "%v", "index.m3u8"),
+        ]
+        return command
+
+    def _is_playable(self, output_dir: str) -> bool:
+        if not os.path.exists(os.path.join(output_dir, "master.m3u8")):
+            return False
+        for rendition in self.renditions:
+            try:
+                with open(os.path.join(output_dir, rendition.name, "index.m3u8")) as f:
+                    if "#EXTINF" not in f.read():
+                        return False
+            except FileNotFoundError:
+                return False
+        return True
+
+    async def _run(self, job: HLSJob, source: str):
+        try:
+            async with self._slots:
+                job.started_at = time.time()
+                job.status = "segmenting"
+                await self._segment(job, source)
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e) or type(e).__name__
+        finally:
+            job.completed_at = time.time()
+            job.finished.set()
+
+    async def _segment(self, job: HLSJob, source: str):
+        output_dir = self.store.path(self.output_dir(job.name))
+        self.store.delete(self.output_dir(job.name))
+        for rendition in self.renditions:
+            os.makedirs(os.path.join(output_dir, rendition.name), exist_ok=True)
+
+        process = await asyncio.create_subprocess_exec(
+            *self.build_command(self.store.path(source), output_dir),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+        try:
+            while process.returncode is None:
+                if not job.playable.is_set() and self._is_playable(output_dir):
+                    job.playable_at = time.time()
+                    job.playable.set()
+                try:
+                    await asyncio.wait_for(process.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            process.kill()
+            raise
+        stderr = await stderr_task
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with {process.returncode}: {stderr.decode(errors='replace')[-500:]}")
+        if not job.playable.is_set():
+            job.playable_at = time.time()
+            job.playable.set()
+
+    async def aclose(self):
+        for task in list(self._tasks):
+            task.cancel()
+        for task in list(self._tasks):
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
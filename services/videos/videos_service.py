@@ -1,5 +1,110 @@
-// Add import replicate
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+from services.artifacts import ArtifactStore
+from services.providers import lazy_import, load_async, provider_lifespan
+from services.tracing import TracingMiddleware, tracer_from_env
+from services.videos.hls import HLSSegmenter, renditions_from_env
+
+replicate = lazy_import("replicate")
+
+artifacts = ArtifactStore()
+segmenter = HLSSegmenter(
+    artifacts,
+    max_workers=int(os.getenv("VIDEO_HLS_WORKERS", "2")),
+    renditions=renditions_from_env(),
+    segment_seconds=int(os.getenv("VIDEO_HLS_SEGMENT_SECONDS", "2")),
+    max_jobs=int(os.getenv("VIDEO_HLS_MAX_JOBS", "1000")),
+)
+# Without ffmpeg every job would fail, so no "hls" URL is advertised
+HLS_ENABLED = os.getenv("VIDEO_HLS_ENABLED", "true").lower() == "true" and segmenter.available
+HLS_PLAYABLE_TIMEOUT = float(os.getenv("VIDEO_HLS_PLAYABLE_TIMEOUT", "30"))
+
+provider_warmup = provider_lifespan(replicate)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with provider_warmup(app):
+        yield
+        await segmenter.aclose()
+
+app = FastAPI(lifespan=lifespan)
+tracer = tracer_from_env("videos")
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
+VIDEO_MODEL = "stability-ai/stable-video-diffusion:3f0457e4619daac51203dedb472816fd4af51f31453268b24c8331ebde546"
+
+HLS_CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+}
+
+class VideoRequest(BaseModel):
+    prompt: str
+    task_id: str
+    subtask_id: str
+    duration: int = int(os.getenv("VIDEO_DEFAULT_DURATION", "5"))
+    fps: int = int(os.getenv("VIDEO_DEFAULT_FPS", "24"))
+    quality: Optional[str] = "hd"
+
+async def download_artifact(url: str, name: str):
+    """Stream a provider-hosted file into the artifact store"""
+    with tracer.span("artifact.persist", url=url, path=name) as span:
+        async with httpx.AsyncClient(timeout=httpx.Timeout(None, connect=10.0), follow_redirects=True) as client:
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+                with artifacts.open_writer(name) as writer:
+                    async for chunk in response.aiter_bytes():
+                        writer.write(chunk)
+        span.set_attribute("bytes", writer.bytes_written)
+
 @app.post("/generate")
 async def generate_video(request: VideoRequest):
-    output = replicate.run("stability-ai/stable-video-diffusion:3f0457e4619daac51203dedb472816fd4af51f31453268b24c8331ebde546", input={"prompt": request.prompt, "duration": request.duration})
-    return {"result": output}  // Save or return video URL
+    await load_async(replicate)
+    with tracer.span("provider.generate", kind="client", provider="replicate", subtask_id=request.subtask_id):
+        output = replicate.run(VIDEO_MODEL, input={"prompt": request.prompt, "duration": request.duration})
+    video_url = str(output[0] if isinstance(output, list) else output)
+    filename = f"generated_{request.subtask_id}.mp4"
+    await download_artifact(video_url, filename)
+    response = {"task_id": request.task_id, "subtask_id": request.subtask_id, "result": output, "artifact": filename}
+    if HLS_ENABLED:
+        # Segment in the background; the playlist URL is usable as soon as the first segment exists
+        segmenter.submit(request.subtask_id, filename)
+        response["hls"] = f"/hls/{request.subtask_id}/master.m3u8"
+    return response
+
+@app.get("/hls/{name}")
+async def hls_status(name: str):
+    if name not in segmenter.jobs:
+        raise HTTPException(status_code=404, detail="No HLS job for this video")
+    return segmenter.jobs[name].to_dict()
+
+@app.get("/hls/{name}/{path:path}")
+async def hls_file(name: str, path: str):
+    """Serve playlists and segments, holding the first request until the stream is playable"""
+    job = segmenter.jobs.get(name)
+    if job is not None and not job.playable.is_set():
+        await segmenter.wait_until_playable(name, timeout=HLS_PLAYABLE_TIMEOUT)
+        if job.status == "failed":
+            raise HTTPException(status_code=500, detail=f"Segmenting failed: {job.error}")
+    try:
+        artifact = f"{segmenter.output_dir(name)}/{path}"
+        if not artifacts.exists(artifact):
+            raise HTTPException(status_code=404, detail="Not found")
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Not found")
+    extension = os.path.splitext(path)[1]
+    # Event playlists grow while segmenting, so they must not be cached
+    headers = {"Cache-Control": "no-cache"} if extension == ".m3u8" else {"Cache-Control": "public, max-age=31536000, immutable"}
+    return FileResponse(artifacts.path(artifact), media_type=HLS_CONTENT_TYPES.get(extension, "application/octet-stream"), headers=headers)
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
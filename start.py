@@ -1,5 +1,51 @@
+import importlib
+import os
+from contextlib import AsyncExitStack, asynccontextmanager
+
 from fastapi import FastAPI
-app = FastAPI()
-from services.orchestrator.orchestrator import app as orch_app
-app.mount("/orchestrator", orch_app)
-# Similarly mount others: /images, /videos, etc.
+import uvicorn
+
+# Mount path -> module exposing the service's FastAPI `app`
+SERVICE_MODULES = {
+    "orchestrator": "services.orchestrator.orchestrator",
+    "images": "services.images.images_service",
+    "videos": "services.videos.videos_service",
+    "audio": "services.audio.audio_service",
+    "text": "services.text.text_service",
+}
+
+def enabled_services():
+    """Services listed in OMNIMEDIA_SERVICES (comma-separated), or all of them"""
+    configured = os.getenv("OMNIMEDIA_SERVICES", "").strip()
+    if not configured or configured == "all":
+        return list(SERVICE_MODULES)
+    names = [name.strip() for name in configured.split(",") if name.strip()]
+    unknown = set(names) - set(SERVICE_MODULES)
+    if unknown:
+        raise ValueError(f"Unknown services in OMNIMEDIA_SERVICES: {', '.join(sorted(unknown))}")
+    return names
+
+# Only import the services this process serves, so disabled ones cost nothing at start-up
+mounted = {name: importlib.import_module(SERVICE_MODULES[name]).app for name in enabled_services()}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Mounted apps do not get lifespan events of their own, so run them here
+    async with AsyncExitStack() as stack:
+        for service_app in mounted.values():
+            await stack.enter_async_context(service_app.router.lifespan_context(service_app))
+        yield
+
+app = FastAPI(lifespan=lifespan)
+for name, service_app in mounted.items():
+    app.mount(f"/{name}", service_app)
+
+# Let the orchestrator call co-located services without going through HTTP
+if "orchestrator" in mounted:
+    from services.orchestrator.tasks import dispatcher
+    for name, service_app in mounted.items():
+        if name != "orchestrator":
+            dispatcher.register_local(name, service_app)
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+# The real-time app is run from its own directory, so make its modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "omnimedia-realtime"))
+
+import importlib
+import pytest
+
+REALTIME_DIR = sys.path[0]
+
+# Keep task history databases created by app lifespans out of the working tree
+os.environ.setdefault("OMNIMEDIA_TASK_DB", os.path.join(tempfile.mkdtemp(), "task_history.db"))
+
+@pytest.fixture
+def realtime_app(monkeypatch):
+    """The real-time app module, imported from its own directory (it mounts ./static)"""
+    monkeypatch.chdir(REALTIME_DIR)
+    return importlib.import_module("app")
@@ -13,4 +13,59 @@ def test_generate_audio():
         "voice_id": "test-voice-id"
     })
     assert response.status_code == 200
-    assert response.json()["result"] == "Audio generated successfully"
\ No newline at end of file
+    assert response.json()["result"] == "Audio generated successfully"
+
+class FakeElevenLabs:
+    def generate(self, text, voice, api_key, stream=False):
+        assert stream
+        return iter([b"ID3", b"", b"frame-1", b"frame-2"])
+
+def test_stream_audio(tmp_path, monkeypatch):
+    from services.audio import audio_service
+    from services.artifacts import ArtifactStore
+
+    monkeypatch.setattr(audio_service, "elevenlabs", FakeElevenLabs())
+    monkeypatch.setattr(audio_service, "artifacts", ArtifactStore(str(tmp_path)))
+
+    with client.stream("POST", "/generate/stream", json={
+        "prompt": "Test prompt",
+        "task_id": "test-task-id",
+        "subtask_id": "audio-002",
+    }) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "audio/mpeg"
+        assert response.headers["x-artifact"] == "generated_audio-002.mp3"
+        body = b"".join(response.iter_bytes())
+
+    assert body == b"ID3frame-1frame-2"
+    assert (tmp_path / "generated_audio-002.mp3").read_bytes() == body
+    assert not list(tmp_path.glob("*.part"))
+    metrics = client.get("/metrics/stream").json()["elevenlabs"]
+    assert metrics["count"] >= 1
+    assert metrics["ttfb_ms"]["p50"] >= 0
+
+def test_stream_audio_not_started_leaves_no_partial_file(tmp_path, monkeypatch):
+    import asyncio
+    from services.audio import audio_service
+    from services.artifacts import ArtifactStore
+
+    monkeypatch.setattr(audio_service, "elevenlabs", FakeElevenLabs())
+    monkeypatch.setattr(audio_service, "artifacts", ArtifactStore(str(tmp_path)))
+    request = audio_service.AudioRequest(prompt="p", task_id="t", subtask_id="audio-003")
+    response = asyncio.run(audio_service.stream_audio(request))  # client disconnects before the body is sent
+    assert response.headers["x-artifact"] == "generated_audio-003.mp3"
+    assert not list(tmp_path.iterdir())
+
+def test_realtime_audio_relay_marks_task_failed_on_any_error(realtime_app, monkeypatch):
+    import asyncio
+    from datetime import datetime
+
+    def broken_client(*args, **kwargs):
+        raise ValueError("unexpected")
+
+    monkeypatch.setattr(realtime_app.httpx, "AsyncClient", broken_client)
+    task = realtime_app.MediaTask(task_id="audio-task", prompt="p", media_type="audio",
+                                  status=realtime_app.GenerationStatus.QUEUED, progress=0, created_at=datetime.now())
+    monkeypatch.setitem(realtime_app.active_tasks, task.task_id, task)
+    asyncio.run(realtime_app.RealTimeAudioGenerator.generate_stream("p", task.task_id))
+    assert task.status == realtime_app.GenerationStatus.FAILED
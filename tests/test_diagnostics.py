@@ -0,0 +1,45 @@
+import asyncio
+import threading
+import time
+
+from diagnostics import LoopLagMonitor, SamplingProfiler
+
+def blocking_call():
+    time.sleep(0.3)
+
+def test_loop_lag_monitor_captures_blocking_stack():
+    async def run():
+        monitor = LoopLagMonitor(interval=0.02, stall_threshold=0.1)
+        monitor.start()
+        await asyncio.sleep(0.1)
+        blocking_call()
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+        return monitor.snapshot()
+
+    snapshot = asyncio.run(run())
+    assert snapshot["stall_count"] >= 1
+    stall = max(snapshot["stalls"], key=lambda s: s["duration_ms"])
+    assert stall["duration_ms"] >= 200
+    assert any(frame.endswith(":blocking_call") for frame in stall["stack"])
+
+def busy_worker(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_sampling_profiler_collapsed_output():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_worker, args=(stop,), name="busy")
+    worker.start()
+    try:
+        counts = SamplingProfiler().profile(0.2, hz=100)
+    finally:
+        stop.set()
+        worker.join()
+
+    output = SamplingProfiler.format_collapsed(counts)
+    busy_lines = [line for line in output.splitlines() if line.startswith("busy;")]
+    assert busy_lines
+    stack, count = busy_lines[0].rsplit(" ", 1)
+    assert "busy_worker" in stack
+    assert int(count) > 0
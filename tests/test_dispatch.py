@@ -0,0 +1,74 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from services.orchestrator.dispatch import DispatchError, ServiceDispatcher
+
+class StubRequest(BaseModel):
+    prompt: str
+    task_id: str
+    subtask_id: str
+
+stub_app = FastAPI()
+received = []
+
+@stub_app.post("/generate")
+async def generate(request: StubRequest):
+    received.append(request)
+    if request.prompt == "fail":
+        raise HTTPException(status_code=422, detail="bad prompt")
+    return {"task_id": request.task_id, "subtask_id": request.subtask_id, "result": f"stub:{request.prompt}"}
+
+PAYLOAD = {"prompt": "hello", "task_id": "t1", "subtask_id": "t1-images"}
+
+@pytest.mark.parametrize("mode", ["direct", "asgi"])
+def test_local_dispatch(mode):
+    dispatcher = ServiceDispatcher(mode=mode)
+    dispatcher.register_local("images", stub_app)
+    assert dispatcher.mode_for("images") == mode
+
+    async def run():
+        try:
+            ok = await dispatcher.dispatch("images", PAYLOAD)
+            with pytest.raises(DispatchError) as error:
+                await dispatcher.dispatch("images", {**PAYLOAD, "prompt": "fail"})
+            return ok, error.value
+        finally:
+            await dispatcher.aclose()
+
+    ok, error = asyncio.run(run())
+    assert ok["result"] == "stub:hello"
+    assert error.status_code == 422
+
+def test_direct_dispatch_passes_model_without_serialization():
+    dispatcher = ServiceDispatcher(mode="direct")
+    dispatcher.register_local("images", stub_app)
+    received.clear()
+    asyncio.run(dispatcher.dispatch("images", PAYLOAD))
+    assert isinstance(received[0], StubRequest)
+
+def test_remote_services_use_pooled_http():
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(200, json={"result": "remote"})
+
+    dispatcher = ServiceDispatcher({"videos": "http://videos:8002"}, mode="direct", http_transport=httpx.MockTransport(handler))
+    dispatcher.register_local("images", stub_app)
+    assert dispatcher.mode_for("videos") == "http"
+
+    async def run():
+        results = [await dispatcher.dispatch("videos", PAYLOAD, headers={"traceparent": "x"}) for _ in range(2)]
+        client = dispatcher._http_client
+        await dispatcher.aclose()
+        return results, client
+
+    results, client = asyncio.run(run())
+    assert [r["result"] for r in results] == ["remote", "remote"]
+    assert str(requests[0].url) == "http://videos:8002/generate"
+    assert requests[0].headers["traceparent"] == "x"
+    assert client is not None
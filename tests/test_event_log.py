@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from event_log import TaskEventLog
+
+def test_ring_buffer_caps_and_snapshots():
+    log = TaskEventLog(max_events=4, max_bytes=100, max_tasks=2)
+    for i in range(10):
+        log.add("a", log.next_seq("a"), f"progress {i}", key="progress_update")
+    events, truncated = log.since("a", 0)
+    assert [e.seq for e in events] == [10] and not truncated  # superseded, not dropped
+
+    for i in range(6):
+        log.add("a", log.next_seq("a"), b"x" * 10)
+    events, truncated = log.since("a", 0)
+    assert [e.seq for e in events] == [13, 14, 15, 16] and truncated
+    assert log.since("a", 12) == (events, False)
+    assert log.since("a", 16) == ([], False)
+
+    log.add("a", log.next_seq("a"), b"y" * 90)
+    assert [e.seq for e in log.since("a", 16)[0]] == [17] and log.stats()["bytes"] <= 100
+
+    log.add("b", log.next_seq("b"), "b")
+    log.add("c", log.next_seq("c"), "c")
+    assert log.stats()["tasks"] == 2 and log.since("a", 3) == ([], True)
+
+def test_sequence_numbers_survive_eviction():
+    log = TaskEventLog(max_tasks=1, max_retired_tasks=1)
+    for _ in range(3):
+        log.add("a", log.next_seq("a"), "a")
+    log.add("b", log.next_seq("b"), "b")  # evicts a's buffer
+    assert log.latest_seq("a") == 3
+    log.add("a", log.next_seq("a"), "a again")
+    events, truncated = log.since("a", 3)
+    assert [e.seq for e in events] == [4] and not truncated  # nothing was missed
+    assert log.since("a", 2) == (events, True)  # seq 3 was dropped with the old buffer
+
+    # Beyond max_retired_tasks a task's counter is forgotten; new buffers then start above it
+    log.add("c", log.next_seq("c"), "c")
+    log.add("d", log.next_seq("d"), "d")
+    log.add("a", log.next_seq("a"), "a once more")
+    events, truncated = log.since("a", 4)
+    assert [e.seq for e in events] == [5] and not truncated
+    assert log.since("a", 3) == (events, True)
+    assert log.since("a", 0) == (events, False)  # a new subscriber has nothing to resume
+
+class FakeSocket:
+    def __init__(self):
+        self.sent, self.closed = [], False
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+    async def close(self, code=1000):
+        self.closed = True
+
+def test_heartbeat_reaps_silent_sockets(realtime_app):
+    manager = realtime_app.WebSocketManager(TaskEventLog())
+    alive, half_open = FakeSocket(), FakeSocket()
+
+    async def run():
+        await manager.connect(alive)
+        await manager.connect(half_open)
+        await manager.subscribe_to_task(half_open, "task")
+        heartbeat = asyncio.create_task(manager.heartbeat(interval=0.01, timeout=0.05))
+        for _ in range(15):
+            await asyncio.sleep(0.01)
+            manager.touch(alive)  # answers pings
+        heartbeat.cancel()
+
+    asyncio.run(run())
+    assert manager.active_connections == [alive] and not alive.closed
+    assert half_open.closed and "task" not in manager.task_subscribers
+    assert any(message["type"] == "ping" for message in alive.sent)
+
+class StalledSocket(FakeSocket):
+    async def send_json(self, data):
+        await asyncio.sleep(3600)  # half-open: the send never completes
+
+    async def send_text(self, data):
+        await asyncio.sleep(3600)
+
+def test_stalled_socket_does_not_block_others(realtime_app):
+    manager = realtime_app.WebSocketManager(TaskEventLog(), send_timeout=0.05)
+    alive, stalled = FakeSocket(), StalledSocket()
+
+    async def run():
+        for websocket in (stalled, alive):
+            await manager.connect(websocket)
+            await manager.subscribe_to_task(websocket, "task")
+        started = asyncio.get_running_loop().time()
+        await manager.broadcast_to_all({"type": "notice"})
+        await manager.broadcast_task_update("task", {"type": "status"})
+        return asyncio.get_running_loop().time() - started
+
+    assert asyncio.run(run()) < 0.5
+    assert [m["type"] for m in alive.sent] == ["notice", "status"] and manager.active_connections == [alive]
+    assert stalled.closed and manager.task_subscribers["task"] == [alive]
+
+def test_resubscribe_replays_missed_events(realtime_app):
+    manager = realtime_app.websocket_manager
+    task_id = "11111111-2222-3333-4444-555555555555"
+    update = {"task_id": task_id, "type": "audio_stream_start", "data": {}}
+
+    asyncio.run(manager.broadcast_task_update(task_id, update))
+    asyncio.run(manager.broadcast_task_bytes(task_id, b"chunk-1"))
+    asyncio.run(manager.broadcast_task_bytes(task_id, b"chunk-2"))
+
+    with TestClient(realtime_app.app) as client:
+        with client.websocket_connect("/ws") as ws:
+            ws.send_json({"action": "subscribe", "task_id": task_id, "last_seq": 1})
+            confirmed = ws.receive_json()
+            assert confirmed["type"] == "subscription_confirmed" and confirmed["latest_seq"] == 3
+            frames = [ws.receive_bytes(), ws.receive_bytes()]
+            header = realtime_app.BINARY_FRAME_HEADER
+            assert [header.unpack(f[:header.size])[1] for f in frames] == [2, 3]
+            assert frames[1][header.size:] == b"chunk-2"
+
+            ws.send_json({"action": "subscribe", "task_id": "unknown-task", "last_seq": 5})
+            assert ws.receive_json()["type"] == "subscription_confirmed"
+            assert ws.receive_json() == {"type": "replay_truncated", "task_id": "unknown-task"}
+
+    assert json.loads(manager.event_log.since(task_id, 0)[0][0].payload)["seq"] == 1
@@ -19,4 +19,17 @@ def test_generate_media():
 
 def test_task_status():
     response = client.get("/task-status/test-task-id")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_admin_tenants_requires_matching_token(monkeypatch):
+    import services.admin
+
+    monkeypatch.setattr(services.admin, "ADMIN_TOKEN", None)
+    assert client.get("/admin/tenants", headers={"x-admin-token": ""}).status_code == 403
+
+    monkeypatch.setattr(services.admin, "ADMIN_TOKEN", "s3cret")
+    assert client.get("/admin/tenants").status_code == 401
+    assert client.get("/admin/tenants", headers={"x-admin-token": "s3cre"}).status_code == 401
+    response = client.get("/admin/tenants", headers={"x-admin-token": "s3cret"})
+    assert response.status_code == 200
+    assert "tenants" in response.json()
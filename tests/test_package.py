@@ -0,0 +1,147 @@
+import asyncio
+import io
+import json
+import tracemalloc
+import zipfile
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from services.artifacts import ArtifactStore
+from services.orchestrator.package import PackageAssembler, PackageEntry
+
+def test_package_streams_entries_as_they_complete(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.write_bytes("generated_img.png", b"\x89PNG" + b"\x00" * 5000)
+    assembler = PackageAssembler(store, chunk_size=1024)
+
+    async def run():
+        queue = asyncio.Queue()
+
+        async def entries():
+            while (entry := await queue.get()) is not None:
+                yield entry
+
+        stream = assembler.stream(entries(), {"task_id": "t1"})
+        await queue.put(PackageEntry("images/generated_img.png", "images", "t1-images", artifact="generated_img.png"))
+        first = await stream.__anext__()  # bytes flow before the other subtasks finish
+        await queue.put(PackageEntry("text/t1-text.txt", "text", "t1-text", data=b"hello " * 100))
+        await queue.put(PackageEntry("audio/t1-audio", "audio", "t1-audio", error="provider timeout"))
+        await queue.put(None)
+        return first + b"".join([chunk async for chunk in stream])
+
+    data = asyncio.run(run())
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["images/generated_img.png", "text/t1-text.txt", "manifest.json"]
+    assert archive.getinfo("images/generated_img.png").compress_type == zipfile.ZIP_STORED
+    assert archive.getinfo("text/t1-text.txt").compress_type == zipfile.ZIP_DEFLATED
+    assert archive.read("text/t1-text.txt") == b"hello " * 100
+
+    manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["task_id"] == "t1"
+    statuses = {entry["subtask_id"]: entry["status"] for entry in manifest["entries"]}
+    assert statuses == {"t1-images": "completed", "t1-text": "completed", "t1-audio": "failed"}
+
+def test_package_endpoint(tmp_path, monkeypatch):
+    from services.orchestrator import orchestrator, tasks as orchestrator_tasks
+    from services.orchestrator.dispatch import ServiceDispatcher
+
+    store = ArtifactStore(str(tmp_path))
+
+    class StubRequest(BaseModel):
+        prompt: str
+        task_id: str
+        subtask_id: str
+
+    images = FastAPI()
+
+    @images.post("/generate")
+    async def generate_image(request: StubRequest):
+        name = f"generated_{request.subtask_id}.png"
+        store.write_bytes(name, b"png-bytes")
+        return {"result": f"Image saved as {name}", "artifact": name}
+
+    dispatcher = ServiceDispatcher(mode="direct")
+    dispatcher.register_local("images", images)
+    monkeypatch.setattr(orchestrator_tasks, "dispatcher", dispatcher)
+    monkeypatch.setattr(orchestrator, "package_assembler", PackageAssembler(store))
+
+    client = TestClient(orchestrator.app)
+    task_id = client.post("/generate-media", json={"prompt": "sunset", "output_format": "image"}).json()["task_id"]
+    response = client.get(f"/package/{task_id}")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.read(f"images/generated_{task_id}-images.png") == b"png-bytes"
+    assert json.loads(archive.read("manifest.json"))["prompt"] == "sunset"
+    assert client.get("/package/unknown").status_code == 404
+
+def test_package_memory_is_bounded_by_chunk_size(tmp_path):
+    # Sparse files: multi-GB artifacts without using the disk space
+    sizes = {"videos/clip.mp4": 2_300_000_000, "audio/track.mp3": 2_300_000_000}
+    store = ArtifactStore(str(tmp_path))
+    for name, size in sizes.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.truncate(size)
+
+    chunk_size = 1024 * 1024
+    assembler = PackageAssembler(store, chunk_size=chunk_size)
+
+    async def entries():
+        for name in sizes:
+            yield PackageEntry(name, name.split("/")[0], name, artifact=name)
+
+    async def consume():
+        total = 0
+        async for chunk in assembler.stream(entries()):
+            total += len(chunk)
+        return total
+
+    tracemalloc.start()
+    try:
+        total = asyncio.run(consume())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert total > sum(sizes.values())  # stored, plus headers and a ZIP64 central directory
+    assert peak < 8 * chunk_size
+
+def test_package_records_missing_artifacts_and_stays_valid(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.write_bytes("generated_img.png", b"png-bytes")
+    assembler = PackageAssembler(store)
+
+    async def entries():
+        # The video was written by a service on another host; the orchestrator cannot read it
+        yield PackageEntry("videos/generated_vid.mp4", "videos", "t1-videos", artifact="generated_vid.mp4")
+        yield PackageEntry("audio/escape.mp3", "audio", "t1-audio", artifact="../../etc/passwd")
+        yield PackageEntry("images/generated_img.png", "images", "t1-images", artifact="generated_img.png")
+
+    async def consume():
+        return b"".join([chunk async for chunk in assembler.stream(entries())])
+
+    archive = zipfile.ZipFile(io.BytesIO(asyncio.run(consume())))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["images/generated_img.png", "manifest.json"]
+    entries_by_id = {e["subtask_id"]: e for e in json.loads(archive.read("manifest.json"))["entries"]}
+    assert entries_by_id["t1-videos"]["status"] == "missing" and "FileNotFoundError" in entries_by_id["t1-videos"]["error"]
+    assert entries_by_id["t1-audio"]["status"] == "missing" and "ValueError" in entries_by_id["t1-audio"]["error"]
+    assert entries_by_id["t1-images"]["status"] == "completed"
+
+def test_completed_subtasks_of_finished_task_keeps_no_condition():
+    from services.orchestrator import tasks as orchestrator_tasks
+
+    orchestrator_tasks.tasks["done-task"] = {"status": "completed", "subtasks": {"s1": {"status": "completed"}}}
+    try:
+        async def consume():
+            return [item async for item in orchestrator_tasks.completed_subtasks("done-task")]
+
+        assert [s_id for s_id, _ in asyncio.run(consume())] == ["s1"]
+        assert "done-task" not in orchestrator_tasks._task_updates
+    finally:
+        del orchestrator_tasks.tasks["done-task"]
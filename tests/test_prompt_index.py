@@ -0,0 +1,99 @@
+import asyncio
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+import prompt_index
+from prompt_index import PromptIndex, similarity, word_hashes
+
+IMAGE_HD = ("image", "realistic", "hd")
+PROMPT = "A majestic red dragon flying over snowy mountains at sunset"
+
+def test_normalized_variants_match():
+    index = PromptIndex()
+    index.add(PROMPT, "task-1", IMAGE_HD)
+    for variant in [
+        "a majestic red dragon flying over snowy mountains at sunset",
+        "  A  MAJESTIC red dragon\tflying over snowy mountains at SUNSET ",
+        "A majestic red dragon, flying over snowy mountains at sunset.",
+        "A red majestic dragon flying over snowy mountains at sunset!",  # neighbouring modifiers swapped
+    ]:
+        assert index.lookup(variant, IMAGE_HD, threshold=0.9) == ("task-1", 1.0)
+
+def test_punctuation_and_swapped_neighbours_score_as_equal():
+    def score(a, b):
+        return similarity(word_hashes(a), word_hashes(b))
+
+    assert score("a red dragon over a castle", "a red dragon over a castle.") == 1.0
+    assert score("a red dragon over a castle", "A red dragon, over a castle!") == 1.0
+    assert score("a big red dragon", "a red big dragon") == 1.0
+    assert score("dog bites man", "man bites dog") == 1 / 3  # the same words, but two moved across the sentence
+    assert score("a big red dragon", "a very big red dragon") == 4 / 5
+
+def test_different_prompts_are_not_reused():
+    index = PromptIndex()
+    for source, other in [("red dragon", "blue dragon"), ("old man", "old woman"), ("cat", "dog"),
+                          ("dog bites man", "man bites dog")]:
+        index.add(source, source, IMAGE_HD)
+        assert index.lookup(other, IMAGE_HD, threshold=0.9) is None
+        assert index.lookup(other, IMAGE_HD, threshold=0.0) in (None, (source, similarity(word_hashes(source), word_hashes(other))))
+
+def test_signatures_are_stable_across_processes():
+    code = "from prompt_index import PromptIndex; print(PromptIndex().signature(%r).hex())" % PROMPT
+    outputs = {
+        subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=os.path.dirname(prompt_index.__file__),
+                       env={**os.environ, "PYTHONHASHSEED": seed}).stdout.strip()
+        for seed in ("0", "29", "196")
+    }
+    assert outputs == {PromptIndex().signature(PROMPT).hex()}
+
+def test_partition_and_threshold():
+    index = PromptIndex()
+    index.add(PROMPT, "task-1", IMAGE_HD)
+    assert index.lookup(PROMPT, ("image", "realistic", "4k")) is None
+    assert index.lookup(PROMPT, ("video", "realistic", "hd")) is None
+    assert index.lookup("a cat asleep on a sofa", IMAGE_HD, threshold=0.5) is None
+
+    edited = PROMPT.replace("red", "blue")  # one of ten words changes
+    assert index.lookup(edited, IMAGE_HD, threshold=0.9) is None
+    assert index.lookup(edited, IMAGE_HD, threshold=0.5) == ("task-1", 9 / 11)
+
+def test_eviction_bounds_entries():
+    index = PromptIndex(max_entries=100)
+    for i in range(250):
+        index.add(f"prompt number {i} with some shared words", f"task-{i}", IMAGE_HD)
+    assert len(index) == 100
+    evicted = index.lookup("prompt number 3 with some shared words", IMAGE_HD, threshold=0.0)
+    assert evicted is None or evicted[0] != "task-3"
+    assert index.lookup("prompt number 249 with some shared words", IMAGE_HD, threshold=1.0) == ("task-249", 1.0)
+
+    for entry_id in range(150, 250):
+        index.remove(entry_id)
+    assert len(index) == 0
+    assert index.stats()["buckets"] == 0
+
+def test_generate_reuses_near_duplicate(realtime_app):
+    source = realtime_app.MediaTask(
+        task_id="source-task", prompt=PROMPT, media_type="image",
+        status=realtime_app.GenerationStatus.QUEUED, progress=0, created_at=datetime.now(), metadata={},
+    )
+    realtime_app.active_tasks[source.task_id] = source
+
+    async def finish():
+        source.status = realtime_app.GenerationStatus.COMPLETED
+        source.result_data = "data:image/svg+xml;base64,AAAA"
+    asyncio.run(realtime_app.run_generation(source, finish(), IMAGE_HD))
+
+    body = {"prompt": " " + PROMPT.upper(), "media_type": "image", "style": "realistic", "quality": "hd",
+            "reuse_similar": True}
+    with TestClient(realtime_app.app) as client:
+        reused = client.post("/api/generate", json=body).json()
+        assert reused["status"] == "completed" and reused["reused_from"] == "source-task"
+        assert realtime_app.active_tasks[reused["task_id"]].result_data == source.result_data
+
+        # Without opting in the prompt is generated again
+        fresh = client.post("/api/generate", json={**body, "reuse_similar": False}).json()
+        assert fresh["status"] == "queued"
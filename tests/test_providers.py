@@ -0,0 +1,56 @@
+import asyncio
+import subprocess
+import sys
+
+from benchmarks.import_time import parse_importtime
+from services.providers import LazyModule, provider_lifespan
+
+PROVIDER_SDKS = ["stability_sdk", "openai", "replicate", "elevenlabs"]
+
+def test_lazy_module_imports_on_first_use():
+    sys.modules.pop("tabnanny", None)
+    module = LazyModule("tabnanny")
+    assert not module.loaded
+    assert "tabnanny" not in sys.modules
+    assert callable(module.check)
+    assert module.loaded
+    assert "tabnanny" in sys.modules
+
+def test_eager_warm_up_loads_before_serving():
+    sys.modules.pop("tabnanny", None)
+    module = LazyModule("tabnanny")
+
+    async def run():
+        async with provider_lifespan(module, mode="eager")(None):
+            return module.loaded
+
+    assert asyncio.run(run())
+
+def test_start_does_not_import_provider_sdks():
+    code = f"import start, sys; print([m for m in {PROVIDER_SDKS!r} if m in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+def test_parse_importtime():
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     _abc\n"
+        "import time:       300 |        420 |   abc\n"
+        "import time:      1000 |       1420 | start\n"
+    )
+    records = parse_importtime(output)
+    assert [(r.module, r.depth) for r in records] == [("_abc", 2), ("abc", 1), ("start", 0)]
+    assert records[-1].cumulative_us == 1420
+
+def test_load_async_imports_off_the_event_loop():
+    import threading
+    from services.providers import load_async
+
+    sys.modules.pop("tabnanny", None)
+    module = LazyModule("tabnanny")
+    loaded_on = []
+    original_load = module.load
+    module.__dict__["load"] = lambda: loaded_on.append(threading.current_thread()) or original_load()
+
+    asyncio.run(load_async(module, object()))  # non-lazy modules are ignored
+    assert module.loaded and loaded_on and loaded_on[0] is not threading.main_thread()
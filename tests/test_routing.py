@@ -0,0 +1,120 @@
+import asyncio
+import itertools
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.metrics import percentile
+from services.routing import NoProviderAvailable, ProviderOption, ProviderRouter
+
+def stub(name: str, latency, cost: float = 1.0, fail_rate: float = 0.0, seed: int = 0):
+    """Provider option whose calls sleep for ``latency(rng)`` seconds and fail with probability ``fail_rate``"""
+    rng = random.Random(seed)
+    calls = {"started": 0, "finished": 0, "cancelled": 0}
+
+    async def call(prompt):
+        calls["started"] += 1
+        try:
+            await asyncio.sleep(latency(rng))
+        except asyncio.CancelledError:
+            calls["cancelled"] += 1
+            raise
+        calls["finished"] += 1
+        if rng.random() < fail_rate:
+            raise RuntimeError(f"{name} failed")
+        return f"{name}: {prompt}"
+
+    return ProviderOption(name, "stub", cost, call), calls
+
+def run(router: ProviderRouter, requests: int, **kwargs):
+    async def main():
+        results = []
+        for i in range(requests):
+            results.append(await router.call(f"prompt {i}", **kwargs))
+        return results
+    return asyncio.run(main())
+
+def test_routes_to_fastest_healthy_option_within_budget():
+    slow, _ = stub("slow", lambda rng: 0.02)
+    fast, _ = stub("fast", lambda rng: 0.002, cost=5)
+    flaky, _ = stub("flaky", lambda rng: 0.001, fail_rate=1.0)
+    router = ProviderRouter([slow, fast, flaky], hedge=False, probe_interval=60)
+
+    results = run(router, 30)
+    assert all(r.result.endswith(f"prompt {i}") for i, r in enumerate(results))
+    assert [r.option.provider for r in results[-20:]] == ["fast"] * 20
+    stats = router.stats()
+    assert stats["flaky:stub"]["calls"] == 1 and stats["flaky:stub"]["failures"] == 1  # failed over, then avoided
+
+    budgeted = run(router, 5, max_cost=1)
+    assert {r.option.provider for r in budgeted} == {"slow"}
+    with pytest.raises(NoProviderAvailable):
+        run(router, 1, max_cost=0.5)
+
+def test_hedging_cuts_tail_latency_and_cancels_loser():
+    def tail_latencies(hedge: bool):
+        counter = itertools.count()
+        option, calls = stub("tail", lambda rng: 0.2 if next(counter) % 10 == 9 else 0.002)  # every tenth call stalls
+        router = ProviderRouter([option], hedge=hedge, hedge_percentile=80)
+        latencies = [r.latency for r in run(router, 150)]
+        return percentile(latencies[50:], 99), router, calls
+
+    unhedged_p99, _, _ = tail_latencies(hedge=False)
+    hedged_p99, router, calls = tail_latencies(hedge=True)
+    assert hedged_p99 < unhedged_p99 / 3
+    stats = router.stats()["tail:stub"]
+    assert stats["hedges"] > 0 and stats["hedge_wins"] > 0 and stats["inflight"] == 0
+    assert calls["cancelled"] > 0 and calls["started"] == calls["finished"] + calls["cancelled"]
+
+def test_text_service_uses_router(monkeypatch):
+    from services.text import text_service
+
+    fast, _ = stub("fast", lambda rng: 0.001)
+    monkeypatch.setattr(text_service, "router", ProviderRouter([fast]))
+    client = TestClient(text_service.app)
+    body = {"prompt": "hi", "task_id": "t", "subtask_id": "text-001"}
+    response = client.post("/generate", json=body)
+    assert response.status_code == 200
+    assert response.json()["provider"] == "fast" and response.json()["result"].startswith("fast")
+    assert client.post("/generate", json={**body, "max_cost": 0.1}).status_code == 503
+    assert client.get("/metrics/routing").json()["fast:stub"]["calls"] == 1
+
+def test_unhealthy_option_is_probed_and_recovers():
+    now = [0.0]
+    state = {"down": False}
+
+    async def primary_call(prompt):
+        if state["down"]:
+            raise RuntimeError("outage")
+        return "primary"
+
+    primary = ProviderOption("primary", "stub", 1.0, primary_call)
+    backup, _ = stub("backup", lambda rng: 0.01)
+    router = ProviderRouter([primary, backup], hedge=False, probe_interval=30, clock=lambda: now[0])
+    run(router, 3)
+
+    state["down"] = True
+    results = run(router, 10)
+    assert all(r.result.startswith("backup") for r in results)  # every failure falls through
+    assert not router.stats()["primary:stub"]["healthy"]
+    calls = router.stats()["primary:stub"]["calls"]
+    run(router, 5)
+    assert router.stats()["primary:stub"]["calls"] == calls  # skipped until the next probe
+
+    state["down"] = False
+    now[0] = 31.0
+    assert run(router, 1)[0].option.provider == "primary"
+    assert router.stats()["primary:stub"]["healthy"]
+
+def test_stream_outcomes_update_health():
+    primary, _ = stub("primary", lambda rng: 0.001)
+    backup, _ = stub("backup", lambda rng: 0.001)
+    router = ProviderRouter([primary, backup], probe_interval=0)
+    for _ in range(4):
+        router.record_stream(primary, None)
+    assert not router.stats()["primary:stub"]["healthy"] and router.stats()["primary:stub"]["streams"] == 4
+
+    router.record_stream(primary, 0.25)  # a probe stream that got its first token
+    stats = router.stats()["primary:stub"]
+    assert stats["healthy"] and stats["ewma_ttft_ms"] == 250.0 and stats["ewma_latency_ms"] is None
@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.task_history import TaskHistory, owner_from_api_key
+
+def test_batched_writes_and_keyset_pagination(tmp_path):
+    history = TaskHistory(str(tmp_path / "tasks.db"), batch_size=50, flush_interval=0.05)
+    history.start()
+    try:
+        for i in range(120):
+            history.record(f"task-{i:03d}", "alice" if i % 2 else "bob", f"prompt {i}", "image" if i % 3 else "video",
+                           "queued", created_at=1000.0 + i // 4)  # several tasks share a timestamp
+        for i in range(0, 120, 10):
+            history.record(f"task-{i:03d}", "bob", f"prompt {i}", "image" if i % 3 else "video", "completed",
+                           created_at=1000.0 + i // 4, completed_at=2000.0, metadata={"style": "anime"})
+        assert history.flush(timeout=5)
+        assert history.stats["rows"] <= 120 + 12 and history.stats["errors"] == 0
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = history.list_tasks(owner="bob", limit=7, cursor=cursor)
+            seen += page
+            if cursor is None:
+                break
+        assert len(seen) == 60 and len({t["task_id"] for t in seen}) == 60
+        assert [(t["created_at"], t["task_id"]) for t in seen] == sorted(
+            ((t["created_at"], t["task_id"]) for t in seen), reverse=True)
+
+        completed, _ = history.list_tasks(owner="bob", status="completed", limit=100)
+        assert len(completed) == 12 and all(t["metadata"] == {"style": "anime"} for t in completed)
+        videos, _ = history.list_tasks(owner="bob", status="completed", media_type="video", limit=100)
+        assert {t["task_id"] for t in videos} == {f"task-{i:03d}" for i in range(0, 120, 30)}
+        assert history.get_task("task-010")["status"] == "completed"
+        with pytest.raises(ValueError):
+            history.list_tasks(cursor="not-a-cursor")
+        reader = history._reader()
+    finally:
+        history.close()
+    with pytest.raises(sqlite3.ProgrammingError):  # close() also closes the readers' connections
+        reader.execute("SELECT 1")
+
+def test_realtime_task_listing(realtime_app, tmp_path, monkeypatch):
+    monkeypatch.setattr(realtime_app, "task_history", TaskHistory(str(tmp_path / "tasks.db"), flush_interval=0.01))
+    with TestClient(realtime_app.app) as client:
+        for prompt in ("first", "second", "third"):
+            response = client.post("/api/generate", json={"prompt": prompt, "media_type": "text"},
+                                   headers={"X-API-Key": "key-a"})
+            assert response.status_code == 200
+        client.post("/api/generate", json={"prompt": "other", "media_type": "text"}, headers={"X-API-Key": "key-b"})
+        realtime_app.task_history.flush(timeout=5)
+
+        page = client.get("/api/tasks", params={"limit": 2}, headers={"X-API-Key": "key-a"}).json()
+        assert [t["prompt"] for t in page["tasks"]] == ["third", "second"]
+        rest = client.get("/api/tasks", params={"limit": 2, "cursor": page["next_cursor"]},
+                          headers={"X-API-Key": "key-a"}).json()
+        assert [t["prompt"] for t in rest["tasks"]] == ["first"] and rest["next_cursor"] is None
+
+        assert client.get("/api/tasks", params={"cursor": "bogus"}, headers={"X-API-Key": "key-a"}).status_code == 400
+        assert client.get("/api/tasks").status_code == 401  # anonymous tasks are not listable
+        other_owner = {"owner": owner_from_api_key("key-b")}
+        assert client.get("/api/tasks", params=other_owner, headers={"X-API-Key": "key-a"}).status_code == 403
@@ -0,0 +1,46 @@
+import json
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+def make_task(realtime_app, **fields):
+    return realtime_app.MediaTask(
+        task_id="status-task", prompt="a lighthouse", media_type="text",
+        status=realtime_app.GenerationStatus.STREAMING, progress=40, created_at=datetime(2024, 5, 1, 12, 30),
+        metadata={"style": "default"}, **fields,
+    )
+
+def test_serialized_form_is_cached_per_version(realtime_app):
+    task = make_task(realtime_app, result_data="x" * 100_000)
+    body, etag = task.to_json()
+    assert task.to_json()[0] is body  # unchanged: no re-encoding
+    assert json.loads(body) == {
+        "task_id": "status-task", "prompt": "a lighthouse", "media_type": "text", "status": "streaming",
+        "progress": 40, "created_at": "2024-05-01T12:30:00", "completed_at": None, "result_data": "x" * 100_000,
+        "stream_url": None, "metadata": {"style": "default"}, "owner": "anonymous",
+    }
+
+    task.progress = 60
+    assert task.to_json()[1] != etag
+    etag = task.to_json()[1]
+    task.update_metadata(queue_wait_ms=1.5)
+    body, new_etag = task.to_json()
+    assert new_etag != etag and json.loads(body)["metadata"] == {"style": "default", "queue_wait_ms": 1.5}
+    assert not hasattr(task, "__dict__")
+
+def test_task_status_etag(realtime_app, monkeypatch):
+    task = make_task(realtime_app)
+    monkeypatch.setitem(realtime_app.active_tasks, task.task_id, task)
+    client = TestClient(realtime_app.app)
+
+    first = client.get(f"/api/task/{task.task_id}")
+    assert first.status_code == 200 and first.json()["status"] == "streaming"
+    etag = first.headers["etag"]
+    unchanged = client.get(f"/api/task/{task.task_id}", headers={"If-None-Match": f'W/{etag}, "other"'})
+    assert unchanged.status_code == 304 and unchanged.content == b"" and unchanged.headers["etag"] == etag
+
+    task.status = realtime_app.GenerationStatus.COMPLETED
+    changed = client.get(f"/api/task/{task.task_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json()["status"] == "completed"
+    assert changed.headers["etag"] != etag
+    assert client.get("/api/task/unknown-task", headers={"If-None-Match": etag}).status_code == 404
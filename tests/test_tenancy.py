@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.tenancy import FairScheduler, QuotaExceeded, QuotaPool, Tenant, TenantRegistry, TokenBucket
+
+def run_jobs(scheduler: FairScheduler, jobs):
+    """Run (tenant, delay) jobs, each holding its slot briefly; returns tenant ids in start order"""
+    order, running = [], {}
+
+    async def job(tenant: Tenant, delay: float):
+        await asyncio.sleep(delay)
+        async with scheduler.slot(tenant):
+            order.append(tenant.tenant_id)
+            running[tenant.tenant_id] = running.get(tenant.tenant_id, 0) + 1
+            assert running[tenant.tenant_id] <= tenant.max_concurrency
+            await asyncio.sleep(0.002)
+            running[tenant.tenant_id] -= 1
+
+    async def main():
+        await asyncio.gather(*(job(tenant, delay) for tenant, delay in jobs))
+
+    asyncio.run(main())
+    return order
+
+def test_noisy_neighbor_does_not_starve_others():
+    noisy, quiet = Tenant("noisy", max_concurrency=4), Tenant("quiet")
+    scheduler = FairScheduler(capacity=2)
+    order = run_jobs(scheduler, [(noisy, 0)] * 60 + [(quiet, 0.01)] * 3)
+    # Arriving after 60 queued noisy jobs, each quiet job is next in line instead of waiting for them all
+    first_quiet = order.index("quiet")
+    assert order[first_quiet:first_quiet + 8].count("quiet") == 3
+    usage = scheduler.usage()
+    assert usage["quiet"]["queue_wait_ms"]["p99"] < usage["noisy"]["queue_wait_ms"]["p99"] / 5
+    assert usage["noisy"]["completed"] == 60 and usage["noisy"]["running"] == 0
+
+def test_weights_and_concurrency_limits():
+    heavy, light = Tenant("heavy", weight=2.0), Tenant("light", max_concurrency=1)
+    order = run_jobs(FairScheduler(capacity=3), [(heavy, 0)] * 40 + [(light, 0)] * 40)
+    assert 18 <= order[:30].count("heavy") <= 22
+
+def test_rate_and_queue_quotas():
+    now = [0.0]
+    bucket = TokenBucket(rate_per_sec=1.0, burst=2, clock=lambda: now[0])
+    assert bucket.try_acquire() == 0 and bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 1.0
+    now[0] = 1.0
+    assert bucket.try_acquire() == 0
+
+    scheduler = FairScheduler(capacity=1)
+    tenant = Tenant("t", rate_per_minute=60, burst=1)
+    scheduler.admit(tenant)
+    with pytest.raises(QuotaExceeded) as exc:
+        scheduler.admit(tenant)
+    assert exc.value.reason == "rate" and 0 < exc.value.retry_after <= 1
+    assert scheduler.usage()["t"]["rejected_rate"] == 1
+
+def test_registry_from_env(monkeypatch):
+    monkeypatch.setenv("OMNIMEDIA_TENANTS", '{"key-acme": {"tenant_id": "acme", "weight": 3}}')
+    monkeypatch.setenv("OMNIMEDIA_TENANT_DEFAULTS", '{"max_concurrency": 2}')
+    monkeypatch.setenv("OMNIMEDIA_UNCONFIGURED_QUOTA", '{"rate_per_minute": 120}')
+    registry = TenantRegistry.from_env()
+    assert registry.resolve("key-acme") == Tenant("acme", weight=3, max_concurrency=2)
+    other = registry.resolve("key-other")
+    assert other.max_concurrency == 2 and other.tenant_id not in ("key-other", "anonymous")
+    # Each unconfigured key is its own tenant, but all of them share the pool's aggregate rate
+    another = registry.resolve("key-another")
+    assert another.tenant_id != other.tenant_id and another.pool == other.pool == QuotaPool("unconfigured", 120)
+    assert registry.resolve("key-acme").pool is None
+    assert registry.resolve(None).tenant_id == "anonymous"
+
+def test_unconfigured_keys_queue_fairly_and_share_a_pool_rate():
+    registry = TenantRegistry(unconfigured_pool=QuotaPool("unconfigured", rate_per_minute=60, burst=3))
+    heavy, light = registry.resolve("heavy-key"), registry.resolve("light-key")
+    order = run_jobs(FairScheduler(capacity=2), [(heavy, 0)] * 60 + [(light, 0.01)] * 3)
+    first_light = order.index(light.tenant_id)
+    assert order[first_light:first_light + 8].count(light.tenant_id) == 3
+
+    now = [0.0]
+    scheduler = FairScheduler(clock=lambda: now[0])
+    for i in range(3):
+        scheduler.admit(registry.resolve(f"minted-{i}"))
+    minted = registry.resolve("minted-3")
+    with pytest.raises(QuotaExceeded) as exc:
+        scheduler.admit(minted)
+    assert "pool" in exc.value.reason and 0 < exc.value.retry_after <= 1
+    now[0] = 1.0
+    scheduler.admit(minted)  # its own bucket was not charged for the rejected request
+    usage = scheduler.usage()[minted.tenant_id]
+    assert usage["rejected_pool"] == 1 and usage["admitted"] == 1
+
+def test_idle_per_key_state_is_capped():
+    registry = TenantRegistry(unconfigured_pool=QuotaPool("unconfigured", rate_per_minute=6000, burst=1000))
+    scheduler = FairScheduler(max_tenants=5)
+    for i in range(20):
+        scheduler.admit(registry.resolve(f"key-{i}"))
+    assert len(scheduler._tenants) == 5 and len(scheduler.usage()) == 5
+    assert registry.resolve("key-19").tenant_id in scheduler.usage()
+
+def test_idle_tenant_state_is_dropped():
+    scheduler = FairScheduler(capacity=2, prune_every=1)
+    tenants = [Tenant(f"tenant-{i}") for i in range(50)]
+    run_jobs(scheduler, [(tenant, 0) for tenant in tenants] * 2)
+    assert scheduler._tenants == {} and scheduler._ready == []
+    usage = scheduler.usage()
+    assert len(usage) == 50 and all(u["completed"] == 2 and u["running"] == 0 for u in usage.values())
+
+def test_realtime_rate_limit(realtime_app, monkeypatch):
+    monkeypatch.setattr(realtime_app, "tenants", TenantRegistry(defaults={"rate_per_minute": 1, "burst": 2}))
+    monkeypatch.setattr(realtime_app, "scheduler", FairScheduler(capacity=4))
+    with TestClient(realtime_app.app) as client:
+        headers = {"X-API-Key": "rate-limited"}
+        for _ in range(2):
+            assert client.post("/api/generate", json={"prompt": "p", "media_type": "text"}, headers=headers).status_code == 200
+        rejected = client.post("/api/generate", json={"prompt": "p", "media_type": "text"}, headers=headers)
+        assert rejected.status_code == 429 and int(rejected.headers["retry-after"]) >= 1
+        # A request that is refused as invalid does not use up quota
+        unsupported = client.post("/api/generate", json={"prompt": "p", "media_type": "hologram"}, headers=headers)
+        assert unsupported.status_code == 400
+        usage = client.get("/api/usage", headers=headers).json()
+        assert usage["admitted"] == 2 and usage["rejected_rate"] == 1
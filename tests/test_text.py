@@ -13,4 +13,81 @@ def test_generate_text():
         "temperature": 0.7
     })
     assert response.status_code == 200
-    assert response.json()["result"] == "Text generated successfully"
\ No newline at end of file
+    assert response.json()["result"] == "Text generated successfully"
+
+def openai_stub_app(tokens):
+    """Local stand-in for the chat completions API that streams OpenAI-style SSE"""
+    import json
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+
+    stub = FastAPI()
+
+    @stub.post("/v1/chat/completions")
+    async def completions():
+        async def events():
+            for token in tokens:
+                chunk = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": "gpt-4",
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return stub
+
+def test_stream_text(monkeypatch):
+    import json
+    import httpx
+    openai = pytest.importorskip("openai")
+    from services.text import text_service
+
+    stub = openai_stub_app(["Hello", ",", " world"])
+    monkeypatch.setattr(text_service, "clients", {})
+    monkeypatch.setattr(text_service, "async_openai_client", lambda config=None: openai.AsyncOpenAI(
+        api_key="test", base_url="http://stub/v1",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=stub)),
+    ))
+
+    with client.stream("POST", "/generate/stream", json={
+        "prompt": "Test prompt",
+        "task_id": "test-task-id",
+        "subtask_id": "text-002",
+    }) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [line[len("data: "):] for line in response.iter_lines() if line.startswith("data: ")]
+
+    assert events[-1] == "[DONE]"
+    payloads = [json.loads(event) for event in events[:-1]]
+    assert "".join(p["token"] for p in payloads if "token" in p) == "Hello, world"
+    summary = payloads[-1]
+    assert summary["done"] and summary["tokens"] == 3
+    assert summary["ttft_ms"] is not None
+    assert client.get("/metrics/stream").json()["gpt-4"]["count"] >= 1
+    routing = client.get("/metrics/routing").json()["openai:gpt-4"]
+    assert routing["streams"] >= 1 and routing["ewma_ttft_ms"] is not None
+    assert list(text_service.clients) == ["openai:gpt-4"]  # reused by later calls, not rebuilt per request
+
+@pytest.mark.parametrize("line", ["data: {not json", 'data: {"text": "no token field"}'])
+def test_realtime_text_relay_reports_malformed_events(realtime_app, monkeypatch, line):
+    import asyncio
+    import json
+    from datetime import datetime
+    import httpx
+
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, text=line + "\n\n"))
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(realtime_app.httpx, "AsyncClient", lambda **kwargs: real_client(transport=transport))
+    task = realtime_app.MediaTask(task_id="text-task", prompt="p", media_type="text",
+                                  status=realtime_app.GenerationStatus.QUEUED, progress=0, created_at=datetime.now())
+    monkeypatch.setitem(realtime_app.active_tasks, task.task_id, task)
+    asyncio.run(realtime_app.RealTimeTextGenerator.stream_from_service("p", task.task_id))
+
+    assert task.status == realtime_app.GenerationStatus.FAILED
+    events, _ = realtime_app.websocket_manager.event_log.since(task.task_id, 0)
+    assert json.loads(events[-1].payload)["data"]["stage"] == "failed"  # the client is told, not left waiting
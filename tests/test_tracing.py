@@ -0,0 +1,65 @@
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.tracing import SpanContext, SpanExporter, Tracer, TracingMiddleware
+
+class MemoryExporter(SpanExporter):
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(span.to_dict() for span in spans)
+
+def test_traceparent_round_trip():
+    header = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    context = SpanContext.from_traceparent(header)
+    assert context.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert context.sampled
+    assert context.to_traceparent() == header
+    assert SpanContext.from_traceparent("not-a-traceparent") is None
+    assert SpanContext.from_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+
+def test_trace_propagates_across_services():
+    exporter = MemoryExporter()
+    downstream_tracer = Tracer("images", exporter)
+    upstream_tracer = Tracer("orchestrator", exporter)
+
+    downstream = FastAPI()
+    downstream.add_middleware(TracingMiddleware, tracer=downstream_tracer)
+
+    @downstream.post("/generate")
+    async def generate():
+        with downstream_tracer.span("provider.generate"):
+            pass
+        return {"result": "ok"}
+
+    upstream = FastAPI()
+    upstream.add_middleware(TracingMiddleware, tracer=upstream_tracer)
+
+    @upstream.post("/generate-media")
+    async def generate_media():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=downstream), base_url="http://images") as client:
+            with upstream_tracer.span("dispatch images", kind="client"):
+                await client.post("/generate", headers=upstream_tracer.inject())
+        return {"ok": True}
+
+    assert TestClient(upstream).post("/generate-media").status_code == 200
+
+    spans = {span["name"]: span for span in exporter.spans}
+    root = spans["POST /generate-media"]
+    assert root["parent_id"] is None
+    assert {span["trace_id"] for span in exporter.spans} == {root["trace_id"]}
+    assert spans["dispatch images"]["parent_id"] == root["span_id"]
+    assert spans["POST /generate"]["parent_id"] == spans["dispatch images"]["span_id"]
+    assert spans["provider.generate"]["parent_id"] == spans["POST /generate"]["span_id"]
+
+def test_unsampled_traces_are_not_exported():
+    exporter = MemoryExporter()
+    tracer = Tracer("text", exporter, sample_rate=0.0)
+    with tracer.span("outer"):
+        headers = tracer.inject()
+        with tracer.span("inner"):
+            pass
+    assert exporter.spans == []
+    assert headers["traceparent"].endswith("-00")
@@ -14,4 +14,75 @@ def test_generate_video():
         "quality": "hd"
     })
     assert response.status_code == 200
-    assert response.json()["result"] == "Video generated successfully"
\ No newline at end of file
+    assert response.json()["result"] == "Video generated successfully"
+
+def find_ffmpeg():
+    import os
+    import shutil
+    return os.getenv("FFMPEG_BINARY") or shutil.which("ffmpeg")
+
+def test_hls_segmenting_is_playable_before_completion(tmp_path):
+    import asyncio
+    import subprocess
+    from services.artifacts import ArtifactStore
+    from services.videos.hls import HLSSegmenter, Rendition
+
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        pytest.skip("ffmpeg is not installed")
+    subprocess.run([ffmpeg, "-v", "error", "-f", "lavfi", "-i", "testsrc=duration=8:size=640x360:rate=24",
+                    "-c:v", "libx264", "-pix_fmt", "yuv420p", str(tmp_path / "source.mp4")], check=True)
+
+    store = ArtifactStore(str(tmp_path))
+    segmenter = HLSSegmenter(store, max_workers=1, ffmpeg=ffmpeg, poll_interval=0.02,
+                             renditions=[Rendition("180p", 180, 300), Rendition("360p", 360, 800)])
+
+    async def run():
+        job = segmenter.submit("vid-001", "source.mp4")
+        await segmenter.wait_until_playable("vid-001", timeout=60)
+        playable_status = job.status
+        await job.finished.wait()
+        return job, playable_status
+
+    job, playable_status = asyncio.run(run())
+    assert job.status == "completed", job.error
+    assert playable_status in ("segmenting", "completed")
+    assert job.playable_at <= job.completed_at
+
+    master = (tmp_path / "hls/vid-001/master.m3u8").read_text()
+    assert "180p/index.m3u8" in master and "360p/index.m3u8" in master
+    playlist = (tmp_path / "hls/vid-001/360p/index.m3u8").read_text()
+    assert "#EXT-X-MAP" in playlist and "#EXT-X-ENDLIST" in playlist
+    assert len(list((tmp_path / "hls/vid-001/360p").glob("seg_*.m4s"))) == 4
+
+def test_hls_route_serves_from_artifact_store(tmp_path, monkeypatch):
+    from services.artifacts import ArtifactStore
+    from services.videos import videos_service
+
+    store = ArtifactStore(str(tmp_path))
+    store.write_bytes("hls/vid-002/master.m3u8", b"#EXTM3U\n")
+    monkeypatch.setattr(videos_service, "artifacts", store)
+
+    response = client.get("/hls/vid-002/master.m3u8")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apple.mpegurl"
+    assert response.headers["cache-control"] == "no-cache"
+    assert client.get("/hls/vid-002/missing.m4s").status_code == 404
+    assert client.get("/hls/vid-002/..%2F..%2Fsecret").status_code == 404
+
+def test_hls_job_status_is_bounded(tmp_path):
+    import asyncio
+    from services.artifacts import ArtifactStore
+    from services.videos.hls import HLSSegmenter
+
+    segmenter = HLSSegmenter(ArtifactStore(str(tmp_path)), ffmpeg=str(tmp_path / "no-ffmpeg"), max_jobs=3)
+    assert not segmenter.available
+
+    async def run():
+        for i in range(10):
+            job = segmenter.submit(f"vid-{i}", "source.mp4")
+            await job.finished.wait()  # fails at once without an ffmpeg binary
+
+    asyncio.run(run())
+    assert list(segmenter.jobs) == ["vid-7", "vid-8", "vid-9"]
+    assert segmenter.jobs["vid-9"].status == "failed"